@@ -51,6 +51,18 @@ def get_metadata():
     return target_db.metadata
 
 
+def include_object(object, name, type_, reflected, compare_to):
+    # Índice de búsqueda de texto completo: lo mantienen triggers creados a mano
+    # en la migración add_full_text_search, no está en los modelos
+    if type_ == 'column' and name == 'search_vector':
+        return False
+    if type_ == 'index' and name and name.endswith('_search_vector'):
+        return False
+    if type_ == 'table' and name and '_fts' in name:
+        return False
+    return True
+
+
 def run_migrations_offline():
     """Run migrations in 'offline' mode.
 
@@ -93,6 +105,8 @@ def run_migrations_online():
     conf_args = current_app.extensions['migrate'].configure_args
     if conf_args.get("process_revision_directives") is None:
         conf_args["process_revision_directives"] = process_revision_directives
+    if conf_args.get("include_object") is None:
+        conf_args["include_object"] = include_object
 
     connectable = get_engine()
 
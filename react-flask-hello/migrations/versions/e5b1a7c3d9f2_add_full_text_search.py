@@ -0,0 +1,122 @@
+"""add full text search (tsvector + unaccent + GIN) for products and saints
+
+Revision ID: e5b1a7c3d9f2
+Revises: c7d2f8a1e94b
+Create Date: 2026-10-18 12:20:05.914420
+
+"""
+from alembic import op
+import sqlalchemy as sa
+from sqlalchemy.dialects import postgresql
+
+
+# revision identifiers, used by Alembic.
+revision = 'e5b1a7c3d9f2'
+down_revision = 'c7d2f8a1e94b'
+branch_labels = None
+depends_on = None
+
+
+def upgrade():
+    # Solo PostgreSQL. En SQLite (desarrollo) el índice FTS5 lo crea search_service al primer uso
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    # Configuración en español que ignora tildes: "jose" encuentra "José"
+    op.execute("CREATE EXTENSION IF NOT EXISTS unaccent")
+    op.execute("""
+        DO $$
+        BEGIN
+            IF NOT EXISTS (SELECT 1 FROM pg_ts_config WHERE cfgname = 'es_unaccent') THEN
+                CREATE TEXT SEARCH CONFIGURATION es_unaccent (COPY = spanish);
+                ALTER TEXT SEARCH CONFIGURATION es_unaccent
+                    ALTER MAPPING FOR hword, hword_part, word WITH unaccent, spanish_stem;
+            END IF;
+        END
+        $$
+    """)
+
+    op.add_column('products', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+    op.add_column('saints', sa.Column('search_vector', postgresql.TSVECTOR(), nullable=True))
+
+    # Pesos: A nombre, B categoría/patronazgo, C material/origen/resumen, D descripción/biografía
+    op.execute("""
+        CREATE OR REPLACE FUNCTION products_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('es_unaccent', coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('es_unaccent',
+                    coalesce((SELECT name FROM categories WHERE id = NEW.category_id), '') || ' ' ||
+                    coalesce(NEW.subcategory, '')), 'B') ||
+                setweight(to_tsvector('es_unaccent',
+                    coalesce(NEW.material, '') || ' ' || coalesce(NEW.origen, '')), 'C') ||
+                setweight(to_tsvector('es_unaccent', coalesce(NEW.description, '')), 'D');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER products_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, description, subcategory, material, origen, category_id
+        ON products FOR EACH ROW EXECUTE FUNCTION products_search_vector_update()
+    """)
+
+    # Si cambia el nombre de una categoría se recalculan sus productos
+    op.execute("""
+        CREATE OR REPLACE FUNCTION categories_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            UPDATE products SET name = name WHERE category_id = NEW.id;
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER categories_search_vector_trigger
+        AFTER UPDATE OF name ON categories
+        FOR EACH ROW WHEN (OLD.name IS DISTINCT FROM NEW.name)
+        EXECUTE FUNCTION categories_search_vector_update()
+    """)
+
+    op.execute("""
+        CREATE OR REPLACE FUNCTION saints_search_vector_update() RETURNS trigger AS $$
+        BEGIN
+            NEW.search_vector :=
+                setweight(to_tsvector('es_unaccent', coalesce(NEW.name, '')), 'A') ||
+                setweight(to_tsvector('es_unaccent', coalesce(NEW.patronage, '')), 'B') ||
+                setweight(to_tsvector('es_unaccent', coalesce(NEW.summary, '')), 'C') ||
+                setweight(to_tsvector('es_unaccent', coalesce(NEW.biography, '')), 'D');
+            RETURN NEW;
+        END
+        $$ LANGUAGE plpgsql
+    """)
+    op.execute("""
+        CREATE TRIGGER saints_search_vector_trigger
+        BEFORE INSERT OR UPDATE OF name, patronage, summary, biography
+        ON saints FOR EACH ROW EXECUTE FUNCTION saints_search_vector_update()
+    """)
+
+    # Llenar las filas existentes (los triggers calculan el vector)
+    op.execute("UPDATE products SET name = name")
+    op.execute("UPDATE saints SET name = name")
+
+    op.create_index('ix_products_search_vector', 'products', ['search_vector'], unique=False, postgresql_using='gin')
+    op.create_index('ix_saints_search_vector', 'saints', ['search_vector'], unique=False, postgresql_using='gin')
+
+
+def downgrade():
+    if op.get_bind().dialect.name != 'postgresql':
+        return
+
+    op.drop_index('ix_saints_search_vector', table_name='saints')
+    op.drop_index('ix_products_search_vector', table_name='products')
+
+    op.execute("DROP TRIGGER IF EXISTS saints_search_vector_trigger ON saints")
+    op.execute("DROP TRIGGER IF EXISTS categories_search_vector_trigger ON categories")
+    op.execute("DROP TRIGGER IF EXISTS products_search_vector_trigger ON products")
+    op.execute("DROP FUNCTION IF EXISTS saints_search_vector_update()")
+    op.execute("DROP FUNCTION IF EXISTS categories_search_vector_update()")
+    op.execute("DROP FUNCTION IF EXISTS products_search_vector_update()")
+
+    op.drop_column('saints', 'search_vector')
+    op.drop_column('products', 'search_vector')
+    op.execute("DROP TEXT SEARCH CONFIGURATION IF EXISTS es_unaccent")
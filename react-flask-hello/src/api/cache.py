@@ -0,0 +1,281 @@
+"""
+Cachés en memoria del proceso para respuestas de catálogo (búsqueda, listados).
+
+- TTLCache: LRU acotado con expiración por entrada y contadores de hits/misses.
+- catalog_version: contador que sube en cada commit que toca Product, Category, Saint o Review.
+  Las claves de caché incluyen la versión, así un cambio de catálogo invalida todo
+  lo anterior sin recorrer la caché. Otros workers lo ven al vencer el TTL.
+- catalog_table_versions: versión por tabla en la base (compartida entre procesos), sube
+  también con los UPDATE masivos que no pasan por el flush del ORM. Los de inventario
+  (stock, units_sold) se marcan con execution_options(inventory_only=True) y no la suben:
+  solo cuenta cuando un producto se agota o vuelve a estar disponible (mark_catalog_changed).
+- conditional_get: ETag / Last-Modified / Cache-Control para endpoints públicos,
+  con 304 sin ejecutar la vista cuando el cliente ya tiene la versión actual.
+"""
+
+import hashlib
+import logging
+import os
+import threading
+import time
+from collections import OrderedDict
+from datetime import timezone
+from functools import wraps
+from flask import request, make_response
+from sqlalchemy import event, func, select, update, insert
+from sqlalchemy.orm import Session
+from api.models import db, Product, Category, Saint, Review, CatalogTableVersion
+
+logger = logging.getLogger(__name__)
+
+_MISSING = object()
+
+
+class TTLCache:
+    """LRU con TTL, seguro entre hilos"""
+
+    def __init__(self, name, maxsize=512, ttl=60):
+        self.name = name
+        self.maxsize = maxsize
+        self.ttl = ttl
+        self._data = OrderedDict()
+        self._lock = threading.Lock()
+        self.hits = 0
+        self.misses = 0
+        self.evictions = 0
+
+    def get(self, key, default=None):
+        now = time.monotonic()
+        with self._lock:
+            item = self._data.get(key, _MISSING)
+            if item is _MISSING or item[0] < now:
+                if item is not _MISSING:
+                    del self._data[key]
+                self.misses += 1
+                return default
+            self._data.move_to_end(key)
+            self.hits += 1
+            return item[1]
+
+    def set(self, key, value, ttl=None):
+        expires_at = time.monotonic() + (self.ttl if ttl is None else ttl)
+        with self._lock:
+            self._data[key] = (expires_at, value)
+            self._data.move_to_end(key)
+            while len(self._data) > self.maxsize:
+                self._data.popitem(last=False)
+                self.evictions += 1
+
+    def delete(self, key):
+        with self._lock:
+            self._data.pop(key, None)
+
+    def clear(self):
+        with self._lock:
+            self._data.clear()
+
+    def stats(self):
+        with self._lock:
+            lookups = self.hits + self.misses
+            return {
+                'name': self.name,
+                'size': len(self._data),
+                'maxsize': self.maxsize,
+                'ttl': self.ttl,
+                'hits': self.hits,
+                'misses': self.misses,
+                'evictions': self.evictions,
+                'hit_rate': round(self.hits / lookups, 3) if lookups else None
+            }
+
+
+class CatalogVersion:
+    """Versión del catálogo en este proceso; sube después de cada commit que lo modifica"""
+
+    def __init__(self):
+        self._value = 0
+        self._lock = threading.Lock()
+
+    @property
+    def value(self):
+        return self._value
+
+    def bump(self):
+        with self._lock:
+            self._value += 1
+            return self._value
+
+
+catalog_version = CatalogVersion()
+
+# Modelos cuyo cambio invalida las respuestas de catálogo cacheadas
+# (las reseñas forman parte de la página de producto)
+CATALOG_MODELS = (Product, Category, Saint, Review)
+CATALOG_TABLES = frozenset(model.__tablename__ for model in CATALOG_MODELS)
+
+# Registro de cachés para exponer estadísticas
+_caches = {}
+
+
+def get_cache(name, maxsize=512, ttl=60):
+    if name not in _caches:
+        _caches[name] = TTLCache(name, maxsize=maxsize, ttl=ttl)
+    return _caches[name]
+
+
+def cache_stats():
+    return {
+        'catalog_version': catalog_version.value,
+        'caches': [cache.stats() for cache in _caches.values()]
+    }
+
+
+# =============================================================================
+# EVENTOS DE SESIÓN: la versión sube solo si la transacción hace commit
+# =============================================================================
+
+def _changed_tables(session):
+    return session.info.setdefault('catalog_changed', set())
+
+
+@event.listens_for(Session, 'after_flush')
+def _mark_catalog_changes(session, flush_context):
+    for obj in list(session.new) + list(session.dirty) + list(session.deleted):
+        if isinstance(obj, CATALOG_MODELS):
+            _changed_tables(session).add(obj.__tablename__)
+
+
+def mark_catalog_changed(session, table_name):
+    """Marca un cambio visible del catálogo hecho con SQL directo (p. ej. un producto agotado)"""
+    _changed_tables(session).add(table_name)
+
+
+@event.listens_for(Session, 'do_orm_execute')
+def _mark_bulk_catalog_changes(orm_execute_state):
+    """INSERT/UPDATE/DELETE ejecutados con session.execute() no pasan por el flush.
+    Los de inventario (inventory_only) no cuentan: cada venta abriría una transacción
+    extra sobre la misma fila de catalog_table_versions."""
+    if orm_execute_state.execution_options.get('inventory_only'):
+        return
+    if orm_execute_state.is_insert or orm_execute_state.is_update or orm_execute_state.is_delete:
+        table = getattr(orm_execute_state.statement, 'table', None)
+        if table is not None and table.name in CATALOG_TABLES:
+            _changed_tables(orm_execute_state.session).add(table.name)
+
+
+def bump_table_versions(bind, table_names):
+    """Sube la versión compartida de las tablas en una transacción corta propia.
+    Se llama después del commit: un ETag nuevo nunca describe datos anteriores."""
+    versions = CatalogTableVersion.__table__
+    try:
+        with bind.begin() as connection:
+            for table_name in sorted(table_names):
+                result = connection.execute(
+                    update(versions)
+                    .where(versions.c.table_name == table_name)
+                    .values(version=versions.c.version + 1)
+                )
+                if result.rowcount == 0:
+                    connection.execute(insert(versions).values(table_name=table_name, version=1))
+    except Exception as e:
+        # Sin la versión compartida los otros workers lo notan por (count, max(updated_at))
+        logger.warning("⚠️ No se pudo subir la versión de %s: %s", sorted(table_names), e)
+
+
+@event.listens_for(Session, 'after_commit')
+def _bump_catalog_version(session):
+    table_names = session.info.pop('catalog_changed', None)
+    if table_names:
+        bump_table_versions(session.get_bind(), table_names)
+        catalog_version.bump()
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_catalog_changes(session, previous_transaction):
+    # Tras deshacer un savepoint la transacción sigue: se conservan las marcas
+    if not session.in_transaction():
+        session.info.pop('catalog_changed', None)
+
+
+# =============================================================================
+# GET CONDICIONAL (ETag / Last-Modified)
+# =============================================================================
+
+# Huella (count, max(updated_at), versión compartida) por tabla; se cachea unos segundos
+# por proceso. Un commit local cambia catalog_version y por lo tanto la clave (efecto inmediato)
+fingerprint_cache = get_cache('catalog_fingerprint', maxsize=64, ttl=int(os.getenv('CATALOG_FINGERPRINT_TTL', '5')))
+
+CATALOG_MAX_AGE = int(os.getenv('CATALOG_MAX_AGE', '60'))
+CATALOG_STALE_WHILE_REVALIDATE = int(os.getenv('CATALOG_STALE_WHILE_REVALIDATE', '300'))
+
+
+def table_fingerprint(model):
+    """(filas, última modificación, versión) de la tabla. La versión cubre lo que
+    max(updated_at) no ve: cambios en filas que no son las más recientes, varios en el
+    mismo segundo, now() de transacciones largas y UPDATE que no tocan updated_at"""
+    key = (catalog_version.value, model.__tablename__)
+    fingerprint = fingerprint_cache.get(key)
+    if fingerprint is None:
+        version = select(CatalogTableVersion.version)\
+            .where(CatalogTableVersion.table_name == model.__tablename__)\
+            .scalar_subquery()
+        fingerprint = tuple(db.session.query(
+            func.count(), func.max(model.updated_at), version
+        ).select_from(model).one())
+        fingerprint_cache.set(key, fingerprint)
+    return fingerprint
+
+
+def conditional_get(*models, max_age=None, stale_while_revalidate=None):
+    """Decorador para GET públicos cuyo contenido depende solo de las tablas indicadas.
+    Responde 304 (sin ejecutar la vista ni serializar) solo si If-None-Match coincide.
+    Last-Modified (max(updated_at)) es informativo: no ve los cambios que solo registra
+    la versión de la tabla, así que If-Modified-Since solo no produce 304."""
+    max_age = CATALOG_MAX_AGE if max_age is None else max_age
+    stale_while_revalidate = CATALOG_STALE_WHILE_REVALIDATE if stale_while_revalidate is None else stale_while_revalidate
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            if request.method not in ('GET', 'HEAD'):
+                return f(*args, **kwargs)
+
+            fingerprints = [table_fingerprint(model) for model in models]
+
+            # La representación depende de la ruta, los parámetros y el estado de las tablas
+            digest = hashlib.sha256(repr((
+                request.path,
+                sorted(request.args.items(multi=True)),
+                [(count, str(updated), version) for count, updated, version in fingerprints]
+            )).encode('utf-8')).hexdigest()[:32]
+
+            updated_values = [updated for _, updated, _ in fingerprints if updated is not None]
+            last_modified = max(updated_values).replace(tzinfo=timezone.utc, microsecond=0) if updated_values else None
+
+            def add_headers(response):
+                response.set_etag(digest)
+                if last_modified:
+                    response.last_modified = last_modified
+                # Con Authorization la respuesta puede depender del usuario (p. ej. ?view=admin)
+                if request.headers.get('Authorization'):
+                    response.headers['Cache-Control'] = f'private, max-age={max_age}'
+                    response.vary.add('Authorization')
+                else:
+                    response.headers['Cache-Control'] = (
+                        f'public, max-age={max_age}, stale-while-revalidate={stale_while_revalidate}'
+                    )
+                return response
+
+            not_modified = False
+            if request.if_none_match:
+                not_modified = request.if_none_match.contains(digest) or request.if_none_match.star_tag
+
+            if not_modified:
+                return add_headers(make_response('', 304))
+
+            response = make_response(f(*args, **kwargs))
+            if response.status_code == 200:
+                add_headers(response)
+            return response
+        return decorated
+    return decorator
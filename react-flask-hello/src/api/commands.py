@@ -84,4 +84,121 @@ def setup_commands(app):
         click.echo('✅ Categorías de prueba creadas')
         
         # Aquí podríamos agregar productos de prueba después
-        click.echo('📦 Ejecuta "flask insert-test-products-full" para agregar productos completos')
\ No newline at end of file
+        click.echo('📦 Ejecuta "flask insert-test-products-full" para agregar productos completos')
+    @app.cli.command("rebuild-sales-rollup")
+    @click.option("--chunk-days", default=31, show_default=True, help="Días por transacción")
+    @with_appcontext
+    def rebuild_sales_rollup(chunk_days):
+        """Reconstruir sales_daily_rollup desde las órdenes completadas"""
+        from api.services.analytics_service import analytics_service
+
+        click.echo(f'🔄 Reconstruyendo rollup de ventas en bloques de {chunk_days} días...')
+
+        def progress(chunk_start, chunk_end):
+            click.echo(f'   ✅ {chunk_start.isoformat()} → {chunk_end.isoformat()}')
+
+        chunks = analytics_service.rebuild_rollup(chunk_days=chunk_days, progress=progress)
+        click.echo(f'✅ Rollup reconstruido ({chunks} bloques)')
+
+    @app.cli.command("recalc-user-stats")
+    @click.option("--chunk-size", default=1000, show_default=True, type=click.IntRange(min=1), help="Usuarios por transacción")
+    @with_appcontext
+    def recalc_user_stats(chunk_size):
+        """Recalcular total_orders, total_spent y last_order_date de todos los usuarios"""
+        from api.services.user_stats_service import user_stats_service
+
+        click.echo(f'🔄 Recalculando estadísticas de usuarios en bloques de {chunk_size}...')
+
+        def progress(first_id, last_id, processed):
+            click.echo(f'   ✅ ids {first_id}-{last_id} ({processed} usuarios procesados)')
+
+        processed, with_orders = user_stats_service.recalculate_all(chunk_size=chunk_size, progress=progress)
+        click.echo(f'✅ {processed} usuarios recalculados ({with_orders} con pedidos)')
+
+    @app.cli.command("release-expired-reservations")
+    @click.option("--limit", default=500, show_default=True, help="Máximo de órdenes por ejecución")
+    @with_appcontext
+    def release_expired_reservations(limit):
+        """Cancelar órdenes PENDING con reserva de stock vencida y devolver las unidades (cron)"""
+        from api.services.stock_service import stock_service
+
+        cancelled = stock_service.release_expired(limit=limit)
+        click.echo(f'✅ {cancelled} órdenes vencidas canceladas, stock liberado')
+
+    @app.cli.command("backfill-units-sold")
+    @with_appcontext
+    def backfill_units_sold():
+        """Recalcular products.units_sold desde las órdenes completadas"""
+        from api.services.analytics_service import analytics_service
+
+        click.echo('🔄 Recalculando unidades vendidas por producto...')
+        updated = analytics_service.rebuild_units_sold()
+        click.echo(f'✅ {updated} productos actualizados')
+
+    @app.cli.command("activity-logs-purge")
+    @click.option("--days", default=None, type=int, help="Días a conservar (por defecto ACTIVITY_LOG_RETENTION_DAYS)")
+    @click.option("--archive", "archive_path", default=None, help="Archivo JSON lines (.gz opcional) donde guardar lo eliminado")
+    @click.option("--batch-size", default=5000, show_default=True, help="Logs por transacción")
+    @click.option("--dry-run", is_flag=True, help="Solo contar los logs que se eliminarían")
+    @with_appcontext
+    def activity_logs_purge(days, archive_path, batch_size, dry_run):
+        """Archivar/eliminar logs de actividad más antiguos que la retención (cron)"""
+        from datetime import datetime, timedelta
+        from api.services.activity_log_service import activity_log_service, ACTIVITY_LOG_RETENTION_DAYS
+
+        days = ACTIVITY_LOG_RETENTION_DAYS if days is None else days
+        before = datetime.utcnow() - timedelta(days=days)
+
+        if dry_run:
+            count = activity_log_service.purge(before, dry_run=True)
+            click.echo(f'ℹ️ {count} logs anteriores a {before.date().isoformat()} se eliminarían')
+            return
+
+        click.echo(f'🔄 Eliminando logs anteriores a {before.date().isoformat()} en bloques de {batch_size}...')
+
+        def progress(last_created_at, purged):
+            click.echo(f'   ✅ hasta {last_created_at.isoformat() if last_created_at else "?"} ({purged} logs)')
+
+        purged = activity_log_service.purge(before, batch_size=batch_size, archive_path=archive_path, progress=progress)
+        archived = f', archivados en {archive_path}' if archive_path and purged else ''
+        click.echo(f'✅ {purged} logs eliminados{archived}')
+
+    @app.cli.command("payments-worker")
+    @click.option("--batch-size", default=10, show_default=True, help="Jobs tomados por tanda")
+    @click.option("--poll-interval", default=2.0, show_default=True, help="Segundos de espera cuando no hay jobs")
+    @click.option("--once", is_flag=True, help="Procesar lo pendiente y salir (cron)")
+    @click.option("--purge-done-days", type=click.IntRange(min=0), default=None,
+                  help="Eliminar jobs terminados con más de N días (0 desactiva; por defecto PAYMENT_JOB_RETENTION_DAYS)")
+    @with_appcontext
+    def payments_worker(batch_size, poll_interval, once, purge_done_days):
+        """Procesar las notificaciones de pago en cola (payment_webhook_jobs)"""
+        import signal
+        import threading
+        from api.services.payment_webhook_service import payment_webhook_service, PAYMENT_JOB_RETENTION_DAYS
+
+        if purge_done_days is None:
+            purge_done_days = PAYMENT_JOB_RETENTION_DAYS
+
+        stop_event = threading.Event()
+
+        def stop(signum, frame):
+            click.echo('🛑 Deteniendo el worker al terminar la tanda actual...')
+            stop_event.set()
+
+        signal.signal(signal.SIGTERM, stop)
+        signal.signal(signal.SIGINT, stop)
+
+        click.echo(f'🔄 Worker de pagos {payment_webhook_service.worker_id} iniciado')
+
+        def progress(claimed, done):
+            click.echo(f'   ✅ {done}/{claimed} jobs procesados')
+
+        done = payment_webhook_service.run_worker(
+            batch_size=batch_size,
+            poll_interval=poll_interval,
+            stop_event=stop_event,
+            once=once,
+            progress=progress,
+            retention_days=purge_done_days
+        )
+        click.echo(f'✅ Worker detenido ({done} jobs procesados)')
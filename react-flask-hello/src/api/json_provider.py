@@ -0,0 +1,101 @@
+"""
+Proveedor JSON de la app: orjson si está instalado, si no el encoder estándar.
+
+Ambos producen la misma salida para los tipos que devuelven los endpoints:
+- datetime / date / time -> ISO 8601 (igual que .isoformat() en los serialize())
+- Enum (OrderStatusEnum, ...) -> su value ('confirmed')
+- UUID -> str, Decimal -> float, set -> lista
+
+Se registra en app.py con: app.json = FastJSONProvider(app)
+"""
+
+import dataclasses
+import decimal
+import enum
+import json
+import uuid
+from datetime import date, datetime, time
+from flask.json.provider import DefaultJSONProvider
+
+try:
+    import orjson
+except ImportError:  # Dependencia opcional
+    orjson = None
+
+
+def _default(obj):
+    """Tipos que ninguno de los dos encoders maneja de forma nativa"""
+    if isinstance(obj, enum.Enum):
+        return obj.value
+    if isinstance(obj, (datetime, date, time)):
+        return obj.isoformat()
+    if isinstance(obj, uuid.UUID):
+        return str(obj)
+    if isinstance(obj, decimal.Decimal):
+        return float(obj)
+    if isinstance(obj, (set, frozenset)):
+        return list(obj)
+    if dataclasses.is_dataclass(obj) and not isinstance(obj, type):
+        return dataclasses.asdict(obj)
+    if hasattr(obj, '__html__'):
+        return str(obj.__html__())
+    raise TypeError(f'Object of type {type(obj).__name__} is not JSON serializable')
+
+
+class FastJSONProvider(DefaultJSONProvider):
+    """Serializa con orjson (en C, escribe bytes directamente) cuando está disponible"""
+
+    default = staticmethod(_default)
+
+    # El estándar escapa todo a ASCII por defecto; orjson siempre escribe UTF-8
+    ensure_ascii = False
+
+    # Las claves salen en el orden de serialize(); ordenarlas duplica el costo del encoding
+    sort_keys = False
+
+    @property
+    def backend(self):
+        return 'orjson' if orjson is not None else 'json'
+
+    def _orjson_options(self, indent=None, sort_keys=None):
+        option = orjson.OPT_NON_STR_KEYS
+        if indent:
+            option |= orjson.OPT_INDENT_2
+        if self.sort_keys if sort_keys is None else sort_keys:
+            option |= orjson.OPT_SORT_KEYS
+        return option
+
+    def dumps_bytes(self, obj, indent=None, sort_keys=None):
+        """JSON como bytes UTF-8 (evita la conversión str -> bytes al responder)"""
+        if orjson is not None:
+            return orjson.dumps(obj, default=_default, option=self._orjson_options(indent, sort_keys))
+        return self.dumps(obj, indent=indent, sort_keys=sort_keys).encode('utf-8')
+
+    def dumps(self, obj, **kwargs):
+        # Con argumentos que orjson no soporta (cls, separators...) se usa el estándar
+        if orjson is not None and set(kwargs) <= {'indent', 'sort_keys'}:
+            return self.dumps_bytes(obj, **kwargs).decode('utf-8')
+
+        kwargs.setdefault('default', _default)
+        kwargs.setdefault('ensure_ascii', self.ensure_ascii)
+        kwargs.setdefault('sort_keys', self.sort_keys)
+        if kwargs.get('indent') is None:
+            kwargs.setdefault('separators', (',', ':'))
+        return json.dumps(obj, **kwargs)
+
+    def loads(self, s, **kwargs):
+        if orjson is not None and not kwargs:
+            return orjson.loads(s)
+        return json.loads(s, **kwargs)
+
+    def response(self, *args, **kwargs):
+        obj = self._prepare_response_obj(args, kwargs)
+
+        indent = None
+        if self.compact is False or (self.compact is None and self._app.debug):
+            indent = 2
+
+        return self._app.response_class(
+            self.dumps_bytes(obj, indent=indent),
+            mimetype=self.mimetype
+        )
@@ -0,0 +1,137 @@
+"""
+Logging de la app: loggers por módulo, sin bloquear el request.
+
+- Los módulos usan logger = logging.getLogger(__name__) ('api.routes', 'api.services...').
+- El logger 'api' escribe en una cola (QueueHandler); un hilo (QueueListener) da formato
+  y escribe en stdout, así el I/O no ocurre en el hilo del request.
+- Formato JSON por línea (LOG_FORMAT=json) con request_id, método y ruta; texto en desarrollo.
+- Cada request tiene un id (X-Request-ID recibido o uno nuevo) que se devuelve en la respuesta.
+- Las líneas DEBUG dentro de un request se muestrean por request (LOG_DEBUG_SAMPLE_RATE):
+  si un request queda muestreado se ven todas sus líneas DEBUG, si no ninguna.
+
+Variables: LOG_LEVEL (INFO en producción, DEBUG en desarrollo), LOG_FORMAT (json|text),
+LOG_DEBUG_SAMPLE_RATE (0.0-1.0, por defecto 1.0 en desarrollo y 0.01 en producción).
+"""
+
+import atexit
+import copy
+import json
+import logging
+import os
+import queue
+import random
+import sys
+import uuid
+from datetime import datetime, timezone
+from logging.handlers import QueueHandler, QueueListener
+from flask import g, has_request_context, request
+
+APP_LOGGER = 'api'
+
+_listener = None
+
+
+class RequestContextFilter(logging.Filter):
+    """Agrega request_id/método/ruta (en el hilo del request) y aplica el muestreo de DEBUG"""
+
+    def filter(self, record):
+        if has_request_context():
+            record.request_id = getattr(g, 'request_id', None)
+            record.method = request.method
+            record.path = request.path
+            if record.levelno < logging.INFO and not getattr(g, 'log_sampled', True):
+                return False
+        else:
+            record.request_id = None
+            record.method = None
+            record.path = None
+        return True
+
+
+class DeferredQueueHandler(QueueHandler):
+    """QueueHandler que en el hilo que loguea solo resuelve lo que no se puede pasar a
+    otro hilo: el mensaje (msg % args, los args pueden cambiar después de loguear) y el
+    traceback. El formato (JSON/texto) lo hace el QueueListener."""
+
+    def prepare(self, record):
+        record = copy.copy(record)
+        record.msg = record.getMessage()
+        record.args = None
+        if record.exc_info:
+            record.exc_text = logging.Formatter().formatException(record.exc_info)
+        record.exc_info = None
+        return record
+
+
+class JsonFormatter(logging.Formatter):
+    """Una línea JSON por registro"""
+
+    def format(self, record):
+        data = {
+            'ts': datetime.fromtimestamp(record.created, tz=timezone.utc).isoformat(timespec='milliseconds'),
+            'level': record.levelname,
+            'logger': record.name,
+            'msg': record.getMessage(),
+        }
+        if getattr(record, 'request_id', None):
+            data['request_id'] = record.request_id
+            data['method'] = record.method
+            data['path'] = record.path
+        if record.exc_text:
+            data['exc'] = record.exc_text
+        return json.dumps(data, ensure_ascii=False, default=str)
+
+
+class TextFormatter(logging.Formatter):
+    """Formato legible para desarrollo"""
+
+    def __init__(self):
+        super().__init__('%(asctime)s %(levelname)-7s %(name)s%(request_tag)s %(message)s', '%H:%M:%S')
+
+    def format(self, record):
+        request_id = getattr(record, 'request_id', None)
+        record.request_tag = f' [{request_id[:8]}]' if request_id else ''
+        return super().format(record)
+
+
+def setup_logging(app, env='production'):
+    """Configura el logger 'api' y los hooks de request id. Llamar una vez al crear la app."""
+    global _listener
+
+    development = env == 'development'
+    level_name = os.getenv('LOG_LEVEL', 'DEBUG' if development else 'INFO').upper()
+    log_format = os.getenv('LOG_FORMAT', 'text' if development else 'json')
+    sample_rate = float(os.getenv('LOG_DEBUG_SAMPLE_RATE', '1.0' if development else '0.01'))
+
+    logger = logging.getLogger(APP_LOGGER)
+    logger.setLevel(getattr(logging, level_name, logging.INFO))
+    logger.propagate = False
+
+    if _listener is None:
+        stream = logging.StreamHandler(sys.stdout)
+        stream.setFormatter(JsonFormatter() if log_format == 'json' else TextFormatter())
+
+        log_queue = queue.SimpleQueue()
+        handler = DeferredQueueHandler(log_queue)
+        handler.addFilter(RequestContextFilter())
+        logger.addHandler(handler)
+
+        _listener = QueueListener(log_queue, stream, respect_handler_level=False)
+        _listener.start()
+        # Al terminar el proceso se vacía la cola
+        atexit.register(_listener.stop)
+
+    @app.before_request
+    def assign_request_id():
+        incoming = request.headers.get('X-Request-ID', '')
+        g.request_id = incoming[:64] if incoming else uuid.uuid4().hex
+        g.log_sampled = sample_rate >= 1.0 or random.random() < sample_rate
+
+    @app.after_request
+    def return_request_id(response):
+        request_id = getattr(g, 'request_id', None)
+        if request_id:
+            response.headers['X-Request-ID'] = request_id
+        return response
+
+    return logger
@@ -1,6 +1,6 @@
 from flask_sqlalchemy import SQLAlchemy
-from sqlalchemy import String, Integer, Float, Boolean, Text, JSON, DateTime, ForeignKey, Enum
-from sqlalchemy.orm import Mapped, mapped_column, relationship
+from sqlalchemy import String, Integer, Float, Boolean, Text, JSON, DateTime, Date, ForeignKey, Enum, Index, text
+from sqlalchemy.orm import Mapped, mapped_column, relationship, selectinload, joinedload, load_only
 from sqlalchemy.sql import func
 import enum
 import uuid
@@ -34,6 +34,9 @@ class OrderStatusEnum(enum.Enum):
     DELIVERED = "delivered"
     CANCELLED = "cancelled"
 
+# Estados que cuentan como venta realizada (analytics, estadísticas de usuario)
+COMPLETED_ORDER_STATUSES = (OrderStatusEnum.CONFIRMED, OrderStatusEnum.DELIVERED)
+
 class LeadStatusEnum(enum.Enum):
     NEW = "new"
     CONTACTED = "contacted"
@@ -248,6 +251,11 @@ class AdminUser(db.Model):
 #modelo AdminUser
 class UserActivityLog(db.Model):
     __tablename__ = 'user_activity_logs'
+    __table_args__ = (
+        # Listado por fecha (keyset) y filtrado por admin; también la retención por fecha
+        Index('ix_user_activity_logs_created_at', 'created_at', 'id'),
+        Index('ix_user_activity_logs_admin_created_at', 'admin_user_id', 'created_at', 'id'),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     admin_user_id: Mapped[str] = mapped_column(String(36), db.ForeignKey('admin_users.id'), nullable=False)
@@ -275,23 +283,6 @@ class UserActivityLog(db.Model):
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
-# función helper para los logs
-def log_admin_activity(admin_user_id, action, description, request=None):
-    """Función helper para registrar actividad de admin"""
-    try:
-        log = UserActivityLog(
-            admin_user_id=admin_user_id,
-            action=action,
-            description=description,
-            ip_address=request.remote_addr if request else None,
-            user_agent=request.headers.get('User-Agent') if request else None
-        )
-        db.session.add(log)
-        db.session.commit()
-    except Exception as e:
-        print(f"Error logging activity: {e}")
-        # No hacemos rollback de la transacción principal por un error en el log
-
 class Category(db.Model):
     __tablename__ = 'categories'
     
@@ -301,6 +292,7 @@ class Category(db.Model):
     image_url: Mapped[str] = mapped_column(String(255), nullable=True)
     
     created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
     
     # Relaciones
     products: Mapped[list["Product"]] = relationship("Product", back_populates="category_rel")
@@ -308,18 +300,52 @@ class Category(db.Model):
     def __repr__(self):
         return f'<Category {self.name}>'
 
-    def serialize(self):
+    @staticmethod
+    def product_counts(in_stock_only=False):
+        """Subconsulta (category_id, product_count) con un solo COUNT agrupado"""
+        query = db.session.query(
+            Product.category_id.label('category_id'),
+            func.count(Product.id).label('product_count')
+        )
+        if in_stock_only:
+            query = query.filter(Product.in_stock == True)
+        return query.group_by(Product.category_id).subquery()
+
+    @staticmethod
+    def with_product_counts(in_stock_only=False):
+        """Query de (Category, product_count) en una sola consulta, sin cargar productos"""
+        counts = Category.product_counts(in_stock_only)
+        return db.session.query(
+            Category,
+            func.coalesce(counts.c.product_count, 0).label('product_count')
+        ).outerjoin(counts, counts.c.category_id == Category.id)
+
+    def count_products(self, in_stock_only=False):
+        query = db.session.query(func.count(Product.id)).filter(Product.category_id == self.id)
+        if in_stock_only:
+            query = query.filter(Product.in_stock == True)
+        return query.scalar() or 0
+
+    def serialize(self, product_count=None):
         return {
             'id': self.id,
             'name': self.name,
             'description': self.description,
             'image_url': self.image_url,
-            'product_count': len(self.products) if self.products else 0,
+            'product_count': self.count_products() if product_count is None else product_count,
             'created_at': self.created_at.isoformat() if self.created_at else None
         }
 
 class Product(db.Model):
     __tablename__ = 'products'
+    __table_args__ = (
+        Index('ix_products_units_sold', 'units_sold', 'id'),
+        # Ordenamientos y filtros de /products/browse
+        Index('ix_products_price', 'price', 'id'),
+        Index('ix_products_created_at', 'created_at', 'id'),
+        Index('ix_products_rating', text('coalesce(rating, 0)'), 'id'),
+        Index('ix_products_category_id', 'category_id'),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     name: Mapped[str] = mapped_column(String(255), nullable=False)
@@ -341,6 +367,7 @@ class Product(db.Model):
     review_count: Mapped[int] = mapped_column(Integer, default=0)
     is_new: Mapped[bool] = mapped_column(Boolean, default=False)
     is_on_sale: Mapped[bool] = mapped_column(Boolean, default=False)
+    units_sold: Mapped[int] = mapped_column(Integer, nullable=False, default=0, server_default='0')  # Solo órdenes completadas
 
     # CAMPOS MULTIMEDIA
     images: Mapped[list] = mapped_column(JSON, nullable=True, default=list) 
@@ -365,8 +392,75 @@ class Product(db.Model):
     def __repr__(self):
         return f'<Product {self.name}>'
 
-    def serialize(self):
-        return {
+    # Campos de serialize() en orden; 'image' (primera imagen) solo se incluye si se pide
+    SERIALIZE_FIELDS = (
+        'id', 'name', 'description', 'price', 'original_price', 'images', 'category', 'category_id',
+        'subcategory', 'sizes', 'features', 'in_stock', 'stock_quantity', 'rating', 'review_count',
+        'is_new', 'is_on_sale', 'created_at', 'videos', 'material', 'cuidados', 'origen',
+        'disponibilidad', 'costo_prenda'
+    )
+
+    # Vistas con nombre para ?view= (admin incluye costo_prenda, solo superadmin)
+    VIEWS = {
+        'card': ('id', 'name', 'price', 'original_price', 'image', 'category', 'category_id', 'sizes',
+                 'in_stock', 'rating', 'review_count', 'is_new', 'is_on_sale'),
+        'cart': ('id', 'name', 'price', 'original_price', 'image', 'sizes', 'in_stock', 'stock_quantity',
+                 'is_on_sale'),
+        'detail': tuple(field for field in SERIALIZE_FIELDS if field != 'costo_prenda') + ('image',),
+        'admin': SERIALIZE_FIELDS + ('image',),
+    }
+
+    # Campos solo para superadmin
+    RESTRICTED_FIELDS = frozenset({'costo_prenda'})
+
+    # Campo -> columnas que necesita (el resto usa la columna del mismo nombre)
+    FIELD_COLUMNS = {
+        'category': ('category_id',),
+        'image': ('images',),
+    }
+
+    @classmethod
+    def resolve_fields(cls, view=None, fields=None):
+        """Campos a serializar según ?view= y/o ?fields= (se combinan).
+        Devuelve None si no se pidió proyección; lanza ValueError si algo no existe."""
+        if not view and not fields:
+            return None
+
+        selected = []
+        if view:
+            if view not in cls.VIEWS:
+                raise ValueError(f'Invalid view. Use one of: {", ".join(cls.VIEWS)}')
+            selected.extend(cls.VIEWS[view])
+
+        if fields:
+            requested = [field.strip() for field in fields.split(',') if field.strip()]
+            unknown = [field for field in requested if field not in cls.SERIALIZE_FIELDS and field != 'image']
+            if unknown:
+                raise ValueError(f'Unknown fields: {", ".join(unknown)}')
+            selected.extend(field for field in requested if field not in selected)
+
+        if 'id' not in selected:
+            selected.insert(0, 'id')
+        return tuple(selected)
+
+    @classmethod
+    def load_options(cls, fields):
+        """Opciones de carga para leer solo las columnas de los campos pedidos"""
+        if fields is None:
+            return [joinedload(cls.category_rel)]
+
+        columns = set()
+        for field in fields:
+            columns.update(cls.FIELD_COLUMNS.get(field, (field,)))
+
+        options = [load_only(*[getattr(cls, column) for column in sorted(columns)])]
+        if 'category' in fields:
+            options.append(joinedload(cls.category_rel).load_only(Category.name))
+        return options
+
+    def serialize(self, fields=None):
+        # Sin proyección: todos los campos menos RESTRICTED_FIELDS (costo_prenda se pide con ?view=admin)
+        data = {
             'id': self.id,
             'name': self.name,
             'description': self.description,
@@ -389,12 +483,28 @@ class Product(db.Model):
             'material': self.material,
             'cuidados': self.cuidados,
             'origen': self.origen,
-            'disponibilidad': self.disponibilidad,
-            'costo_prenda': self.costo_prenda
-        }
+            'disponibilidad': self.disponibilidad
+        } if fields is None else {}
+
+        # Proyección: solo se leen los atributos pedidos (los demás no están cargados)
+        for field in fields or ():
+            if field == 'image':
+                data['image'] = self.images[0] if self.images else None
+            elif field == 'category':
+                data['category'] = self.category_rel.name if self.category_rel else self.category_id
+            elif field == 'created_at':
+                data['created_at'] = self.created_at.isoformat() if self.created_at else None
+            elif field in ('images', 'sizes', 'features', 'videos'):
+                data[field] = getattr(self, field) or []
+            else:
+                data[field] = getattr(self, field)
+        return data
     
 class Order(db.Model):
     __tablename__ = 'orders'
+    __table_args__ = (
+        Index('ix_orders_status_created_at', 'status', 'created_at'),
+    )
     
     id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
     
@@ -429,6 +539,16 @@ class Order(db.Model):
     def __repr__(self):
         return f'<Order {self.id} - {self.customer_email}>'
 
+    @staticmethod
+    def serialize_options():
+        """Opciones de carga para serialize(): items y productos en una consulta extra
+        (selectin) y la dirección en el mismo SELECT, sin importar cuántas órdenes haya.
+        Uso: Order.query.options(*Order.serialize_options())"""
+        return (
+            selectinload(Order.items).joinedload(OrderItem.product),
+            joinedload(Order.user_address)
+        )
+
     def serialize(self):
         return {
             'id': self.id,
@@ -484,6 +604,126 @@ class OrderItem(db.Model):
             'subtotal': self.quantity * self.price
         }
 
+class SalesDailyRollup(db.Model):
+    """Ventas completadas (CONFIRMED/DELIVERED) acumuladas por día y producto.
+    Se mantiene al cambiar el estado de las órdenes (ver order_service)."""
+    __tablename__ = 'sales_daily_rollup'
+    
+    day: Mapped[Date] = mapped_column(Date, primary_key=True)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey('products.id'), primary_key=True)
+    
+    revenue: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)
+    cost: Mapped[float] = mapped_column(Float, nullable=False, default=0.0)  # costo_prenda * unidades
+    units: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<SalesDailyRollup {self.day} - {self.product_id}>'
+
+    def serialize(self):
+        return {
+            'day': self.day.isoformat() if self.day else None,
+            'product_id': self.product_id,
+            'revenue': self.revenue,
+            'cost': self.cost,
+            'units': self.units
+        }
+
+class StockReservation(db.Model):
+    """Unidades descontadas del stock de un producto para una orden.
+    active: orden pendiente de pago (expira en expires_at)
+    committed: la orden se completó, el descuento es definitivo
+    released: la orden se canceló o expiró, las unidades volvieron al stock"""
+    __tablename__ = 'stock_reservations'
+    __table_args__ = (
+        Index('ix_stock_reservations_status_expires_at', 'status', 'expires_at'),
+    )
+    
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    order_id: Mapped[str] = mapped_column(String(36), ForeignKey('orders.id'), nullable=False, index=True)
+    product_id: Mapped[str] = mapped_column(String(36), ForeignKey('products.id'), nullable=False)
+    
+    quantity: Mapped[int] = mapped_column(Integer, nullable=False)
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='active')  # active, committed, released
+    expires_at: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f'<StockReservation {self.order_id} - {self.quantity}x {self.product_id} ({self.status})>'
+
+    def serialize(self):
+        return {
+            'id': self.id,
+            'order_id': self.order_id,
+            'product_id': self.product_id,
+            'quantity': self.quantity,
+            'status': self.status,
+            'expires_at': self.expires_at.isoformat() if self.expires_at else None,
+            'created_at': self.created_at.isoformat() if self.created_at else None
+        }
+
+class PaymentWebhookJob(db.Model):
+    """Notificación de pago recibida por webhook, pendiente de procesar por
+    `flask payments-worker` (consulta del pago a la pasarela y cambio de estado de la orden).
+    pending: en cola (run_after indica cuándo puede intentarse)
+    processing: tomada por un worker (locked_at/locked_by)
+    done: procesada (result guarda el desenlace: approved, order_not_found, ...)
+    failed: agotó los reintentos (last_error guarda el último error)"""
+    __tablename__ = 'payment_webhook_jobs'
+    __table_args__ = (
+        Index('ix_payment_webhook_jobs_status_run_after', 'status', 'run_after'),
+        Index('ix_payment_webhook_jobs_payment_id', 'provider', 'payment_id'),
+    )
+    
+    id: Mapped[str] = mapped_column(String(36), primary_key=True, default=generate_uuid)
+    provider: Mapped[str] = mapped_column(String(30), nullable=False, default='mercadopago')
+    payment_id: Mapped[str] = mapped_column(String(64), nullable=False)
+    notification_type: Mapped[str] = mapped_column(String(50), nullable=True)
+    payload: Mapped[dict] = mapped_column(JSON, nullable=True)  # body + query params recibidos
+    
+    status: Mapped[str] = mapped_column(String(20), nullable=False, default='pending')  # pending, processing, done, failed
+    attempts: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+    run_after: Mapped[DateTime] = mapped_column(DateTime, nullable=False)
+    locked_at: Mapped[DateTime] = mapped_column(DateTime, nullable=True)
+    locked_by: Mapped[str] = mapped_column(String(100), nullable=True)
+    result: Mapped[str] = mapped_column(String(30), nullable=True)
+    last_error: Mapped[str] = mapped_column(Text, nullable=True)
+    
+    created_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now())
+    updated_at: Mapped[DateTime] = mapped_column(DateTime, server_default=func.now(), onupdate=func.now())
+
+    def __repr__(self):
+        return f'<PaymentWebhookJob {self.provider}:{self.payment_id} ({self.status})>'
+
+    def serialize(self):
+        return {
+            'id': self.id,
+            'provider': self.provider,
+            'payment_id': self.payment_id,
+            'notification_type': self.notification_type,
+            'status': self.status,
+            'attempts': self.attempts,
+            'run_after': self.run_after.isoformat() if self.run_after else None,
+            'result': self.result,
+            'last_error': self.last_error,
+            'created_at': self.created_at.isoformat() if self.created_at else None,
+            'updated_at': self.updated_at.isoformat() if self.updated_at else None
+        }
+
+class CatalogTableVersion(db.Model):
+    """Versión compartida (entre procesos) de cada tabla del catálogo. Sube después de
+    cada commit que edita la tabla, también con UPDATE masivos; los de inventario solo
+    cuando un producto se agota o vuelve a estar disponible. Forma parte del ETag y de
+    las claves de caché (ver api/cache.py)."""
+    __tablename__ = 'catalog_table_versions'
+
+    table_name: Mapped[str] = mapped_column(String(64), primary_key=True)
+    version: Mapped[int] = mapped_column(Integer, nullable=False, default=0)
+
+    def __repr__(self):
+        return f'<CatalogTableVersion {self.table_name}={self.version}>'
+
 class PageContent(db.Model):
     __tablename__ = 'page_content'
     
@@ -0,0 +1,164 @@
+"""
+Paginación por keyset (cursor) para los endpoints de listas.
+
+En lugar de OFFSET, cada página continúa desde la última fila de la anterior:
+WHERE (sort_key, id) < (:ultimo_sort_key, :ultimo_id) ORDER BY sort_key DESC, id DESC LIMIT :n
+Así la página 500 cuesta lo mismo que la página 1 (usa el índice del sort_key).
+
+Uso en un endpoint:
+    if wants_keyset():
+        page = keyset_paginate(query, Product.created_at, Product.id)
+        return jsonify({'products': [p.serialize() for p in page.items], **page.meta()})
+"""
+
+import base64
+import json
+from datetime import datetime, date
+from flask import request
+from sqlalchemy import tuple_, text, func, DateTime
+from api.models import db
+
+DEFAULT_PAGE_LIMIT = 20
+MAX_PAGE_LIMIT = 100
+
+
+class InvalidCursorError(ValueError):
+    """El cursor recibido no es válido (manipulado o de otro endpoint)"""
+
+
+def encode_cursor(sort_value, row_id):
+    """Cursor opaco (base64url de JSON) con la posición de la última fila entregada"""
+    if isinstance(sort_value, datetime):
+        value = {'t': 'dt', 'v': sort_value.isoformat()}
+    elif isinstance(sort_value, date):
+        value = {'t': 'd', 'v': sort_value.isoformat()}
+    else:
+        value = {'v': sort_value}
+
+    payload = json.dumps([value, row_id], separators=(',', ':')).encode('utf-8')
+    return base64.urlsafe_b64encode(payload).decode('ascii').rstrip('=')
+
+
+def decode_cursor(cursor):
+    """Devuelve (sort_value, row_id); lanza InvalidCursorError si no se puede leer"""
+    try:
+        padded = cursor + '=' * (-len(cursor) % 4)
+        value, row_id = json.loads(base64.urlsafe_b64decode(padded.encode('ascii')))
+
+        if value.get('t') == 'dt':
+            return datetime.fromisoformat(value['v']), row_id
+        if value.get('t') == 'd':
+            return date.fromisoformat(value['v']), row_id
+        return value['v'], row_id
+    except Exception:
+        raise InvalidCursorError('Invalid cursor')
+
+
+def wants_keyset(args=None):
+    """El cliente pidió paginación por cursor (los clientes antiguos no envían limit ni cursor)"""
+    args = request.args if args is None else args
+    return 'cursor' in args or 'limit' in args
+
+
+def parse_limit(args=None, default_limit=DEFAULT_PAGE_LIMIT, max_limit=MAX_PAGE_LIMIT):
+    args = request.args if args is None else args
+    limit = args.get('limit', default_limit, type=int)
+    if limit is None or limit < 1:
+        limit = default_limit
+    return min(limit, max_limit)
+
+
+class KeysetPage:
+    """Una página de resultados más el cursor para pedir la siguiente"""
+
+    def __init__(self, items, next_cursor, limit, total=None, total_is_estimate=False):
+        self.items = items
+        self.next_cursor = next_cursor
+        self.limit = limit
+        self.total = total
+        self.total_is_estimate = total_is_estimate
+
+    def meta(self):
+        data = {
+            'next_cursor': self.next_cursor,
+            'has_more': self.next_cursor is not None,
+            'limit': self.limit
+        }
+        if self.total is not None:
+            data['total'] = self.total
+            data['total_is_estimate'] = self.total_is_estimate
+        return data
+
+
+def estimate_count(query):
+    """Total estimado con el planner de PostgreSQL (sin recorrer la tabla);
+    en otros motores, o si el plan no se puede obtener, hace COUNT(*)"""
+    if db.session.get_bind().dialect.name == 'postgresql':
+        try:
+            statement = query.order_by(None).statement.compile(
+                dialect=db.session.get_bind().dialect,
+                compile_kwargs={'literal_binds': True}
+            )
+            plan = db.session.execute(text(f'EXPLAIN (FORMAT JSON) {statement}')).scalar()
+            if isinstance(plan, str):
+                plan = json.loads(plan)
+            return int(plan[0]['Plan']['Plan Rows']), True
+        except Exception:
+            pass
+
+    return query.order_by(None).count(), False
+
+
+def _sort_expression(sort_column):
+    """Expresión por la que se ordena y compara. En SQLite los DateTime son texto y
+    SQLAlchemy enlaza los parámetros con microsegundos ('...:49.000000') mientras que
+    CURRENT_TIMESTAMP guarda '...:49'; se normaliza el formato en ambos lados."""
+    if db.session.get_bind().dialect.name == 'sqlite' and isinstance(sort_column.type, DateTime):
+        return func.strftime('%Y-%m-%d %H:%M:%f', sort_column)
+    return sort_column
+
+
+def keyset_paginate(query, sort_column, id_column, descending=True, args=None,
+                    default_limit=DEFAULT_PAGE_LIMIT, max_limit=MAX_PAGE_LIMIT):
+    """Aplica cursor + límite a query ordenando por (sort_column, id_column).
+    sort_column no debe ser NULL (created_at, name...); id_column desempata.
+    Parámetros leídos: cursor, limit (máx. max_limit), include_total=exact|estimate.
+    Lanza InvalidCursorError si el cursor es inválido."""
+    args = request.args if args is None else args
+    limit = parse_limit(args, default_limit, max_limit)
+
+    total = None
+    total_is_estimate = False
+    include_total = args.get('include_total')
+    if include_total == 'estimate':
+        total, total_is_estimate = estimate_count(query)
+    elif include_total in ('exact', 'true', '1'):
+        total = query.order_by(None).count()
+
+    sort_expression = _sort_expression(sort_column)
+
+    cursor = args.get('cursor')
+    if cursor:
+        sort_value, row_id = decode_cursor(cursor)
+        position = tuple_(sort_expression, id_column)
+        after = tuple_(sort_value, row_id)
+        query = query.filter(position < after if descending else position > after)
+
+    if descending:
+        query = query.order_by(None).order_by(sort_expression.desc(), id_column.desc())
+    else:
+        query = query.order_by(None).order_by(sort_expression.asc(), id_column.asc())
+
+    # El valor de ordenamiento se lee de la base para que el cursor coincida exactamente
+    query = query.add_columns(sort_expression.label('keyset_sort_value'))
+
+    # Una fila extra indica si hay página siguiente
+    rows = query.limit(limit + 1).all()
+    items = [row[0] for row in rows[:limit]]
+
+    next_cursor = None
+    if len(rows) > limit:
+        last_item, last_sort_value = rows[limit - 1]
+        next_cursor = encode_cursor(last_sort_value, getattr(last_item, id_column.key))
+
+    return KeysetPage(items, next_cursor, limit, total, total_is_estimate)
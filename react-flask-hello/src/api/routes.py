@@ -3,27 +3,63 @@ This module takes care of starting the API Server, Loading the DB and Adding the
 """
 from flask import Flask, request, jsonify, url_for, Blueprint, send_from_directory 
 from api.models import db, User, AdminUser, Product, Category, Order, OrderItem, PageContent, Banner, ContactLead, Review, UserActivityLog, UserRoleEnum, Saint, ContactMessage 
-from api.utils import generate_sitemap, APIException, generate_token, token_required, admin_required
+from api.utils import generate_sitemap, APIException, generate_token, token_required, admin_required, verify_token_without_request
+from api.utils import auth_required, invalidate_admin_principal
 from flask_cors import CORS
 from datetime import datetime, timedelta
-from api.models import OrderStatusEnum, UserAddress
-from sqlalchemy import func, desc, or_
+from api.models import OrderStatusEnum, UserAddress, generate_uuid
+from sqlalchemy import func, desc, or_, insert
 
 import os
 import uuid
+import logging
 from werkzeug.utils import secure_filename
 from flask import current_app, send_from_directory
 
 from api.services.google_auth import GoogleAuthService
+from api.services.analytics_service import analytics_service
+from api.services.order_service import order_service
+from api.services.user_stats_service import user_stats_service
+from api.services.stock_service import stock_service, InsufficientStockError
+from api.pagination import wants_keyset, keyset_paginate, InvalidCursorError
+from api.services.search_service import search_service
+from api.services.suggest_service import suggest_index
+from api.services.catalog_service import catalog_service, SORT_OPTIONS
+from api.services.product_page_service import product_page_service
+from api.services.activity_log_service import activity_log_writer, activity_log_service, log_admin_activity
+from api.services.payment_webhook_service import payment_webhook_service
+from api.cache import get_cache, cache_stats, conditional_get, table_fingerprint
 from functools import wraps
 from flask_jwt_extended import jwt_required, get_jwt_identity
 
 api = Blueprint('api', __name__)
 
+logger = logging.getLogger(__name__)
+
+# Caché de resultados de búsqueda (LRU + TTL, la clave incluye la huella de las tablas)
+search_cache = get_cache(
+    'search',
+    maxsize=int(os.getenv('SEARCH_CACHE_SIZE', '512')),
+    ttl=int(os.getenv('SEARCH_CACHE_TTL', '60'))
+)
+
+# Caché de la página de producto (la clave incluye la huella de las tablas, igual que el ETag)
+product_page_cache = get_cache(
+    'product_page',
+    maxsize=int(os.getenv('PRODUCT_PAGE_CACHE_SIZE', '1024')),
+    ttl=int(os.getenv('PRODUCT_PAGE_CACHE_TTL', '120'))
+)
+
 # Allow CORS requests to this API
 CORS(api)
 
 
+@api.errorhandler(InvalidCursorError)
+def handle_invalid_cursor(error):
+    """Cursor de paginación manipulado o de otro endpoint: 400 en todos los listados"""
+    return jsonify({'message': 'Invalid cursor'}), 400
+
+
 @api.route('/hello', methods=['POST', 'GET'])
 def handle_hello():
 
@@ -69,14 +105,13 @@ def admin_register():
 @api.route('/admin/login', methods=['POST'])
 def admin_login():
     try:
-        print("🔧 === INICIANDO LOGIN ===")
+        logger.debug("🔧 === INICIANDO LOGIN ===")
         data = request.get_json()
-        print("🔧 DATOS LOGIN:", data)
         
         email = data.get('email')
         password = data.get('password')
         
-        print("🔧 BUSCANDO USUARIO:", email)
+        logger.debug("🔧 BUSCANDO USUARIO: %s", email)
         admin = AdminUser.query.filter_by(email=email).first()
         
         if admin:
@@ -104,9 +139,7 @@ def admin_login():
             return jsonify({'message': 'Invalid credentials'}), 401
         
     except Exception as e:
-        print("🔧 ERROR EN LOGIN:", str(e))
-        import traceback
-        traceback.print_exc()
+        logger.exception("🔧 ERROR EN LOGIN: %s", e)
         return jsonify({'message': str(e)}), 400
     
 # =============================================================================
@@ -118,14 +151,11 @@ def admin_login():
 def get_user_profile(current_user_id, current_user_role):
     """Obtener perfil del usuario autenticado"""
     try:
-        print(f"🔍 DEBUG GET_USER_PROFILE:")
-        print(f"   - current_user_id: {current_user_id}")
-        print(f"   - current_user_role: {current_user_role}")
+        logger.debug("🔍 DEBUG GET_USER_PROFILE: current_user_id: %s; current_user_role: %s", current_user_id, current_user_role)
 
         user = User.query.get(current_user_id)
         
-        print(f"   - Usuario encontrado: {user}")
-        print(f"   - Usuario ID en DB: {user.id if user else 'NO ENCONTRADO'}")
+        logger.debug("🔍 Usuario encontrado: %s; Usuario ID en DB: %s", user, user.id if user else 'NO ENCONTRADO')
 
         if not user:
             return jsonify({'success': False, 'error': 'Usuario no encontrado'}), 404
@@ -136,7 +166,7 @@ def get_user_profile(current_user_id, current_user_role):
         })
         
     except Exception as e:
-        print(f"❌ Error en get_user_profile: {str(e)}")
+        logger.error("❌ Error en get_user_profile: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/profile', methods=['PUT', 'OPTIONS'])
@@ -165,7 +195,7 @@ def update_user_profile(current_user_id, current_user_role):
                 else:
                     user.birthdate = None
             except ValueError as e:
-                print(f"⚠️ Formato de fecha inválido: {data['birthdate']}")
+                logger.warning("⚠️ Formato de fecha inválido: %s", data['birthdate'])
                 return jsonify({
                     'success': False, 
                     'error': 'Formato de fecha inválido. Use YYYY-MM-DD'
@@ -194,7 +224,7 @@ def update_user_profile(current_user_id, current_user_role):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en update_user_profile: {str(e)}")
+        logger.error("❌ Error en update_user_profile: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/orders', methods=['GET', 'OPTIONS'])
@@ -202,7 +232,8 @@ def update_user_profile(current_user_id, current_user_role):
 def get_user_orders(current_user_id, current_user_role):
     """Obtener órdenes del usuario autenticado"""
     try:
-        orders = Order.query.filter_by(user_id=current_user_id)\
+        orders = Order.query.options(*Order.serialize_options())\
+                           .filter_by(user_id=current_user_id)\
                            .order_by(Order.created_at.desc())\
                            .all()
         
@@ -212,7 +243,7 @@ def get_user_orders(current_user_id, current_user_role):
         })
         
     except Exception as e:
-        print(f"❌ Error en get_user_orders: {str(e)}")
+        logger.error("❌ Error en get_user_orders: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/addresses', methods=['GET', 'OPTIONS'])
@@ -230,7 +261,7 @@ def get_user_addresses(current_user_id, current_user_role):
         })
         
     except Exception as e:
-        print(f"❌ Error en get_user_addresses: {str(e)}")
+        logger.error("❌ Error en get_user_addresses: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/addresses', methods=['POST', 'OPTIONS'])
@@ -282,7 +313,7 @@ def add_user_address(current_user_id, current_user_role):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en add_user_address: {str(e)}")
+        logger.error("❌ Error en add_user_address: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/addresses/<address_id>', methods=['PUT', 'OPTIONS'])
@@ -335,7 +366,7 @@ def update_user_address(current_user_id, current_user_role, address_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en update_user_address: {str(e)}")
+        logger.error("❌ Error en update_user_address: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/addresses/<address_id>', methods=['DELETE', 'OPTIONS'])
@@ -357,7 +388,7 @@ def delete_user_address(current_user_id, current_user_role, address_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en delete_user_address: {str(e)}")
+        logger.error("❌ Error en delete_user_address: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 @api.route('/user/addresses/<address_id>/set-primary', methods=['PUT', 'OPTIONS'])
@@ -385,60 +416,16 @@ def set_primary_address(current_user_id, current_user_role, address_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en set_primary_address: {str(e)}")
+        logger.error("❌ Error en set_primary_address: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # =============================================================================
 # ADMIN CLIENT USERS ENDPOINTS (SOLO SUPERADMIN)
 # =============================================================================
 
-def superadmin_required(f):
-    """Decorator para verificar que el usuario es superadmin"""
-    @wraps(f)
-    def decorated_function(*args, **kwargs):
-        try:
-            print("🔧 === SUPERADMIN REQUIRED ===")
-            
-            # Obtener token del header
-            token = request.headers.get('Authorization', '').replace('Bearer ', '')
-            print(f"🔧 Token recibido: {token[:50]}...")
-            
-            if not token:
-                return jsonify({'error': 'Token is required'}), 401
-            
-            # ✅ CAMBIO: Usar el MISMO secret key que generate_token
-            secret_key = os.getenv('FLASK_APP_KEY')  # MISMO que generate_token
-            
-            payload = jwt.decode(token, secret_key, algorithms=['HS256'])
-            print(f"🔧 Payload del token: {payload}")
-            
-            admin_user_id = payload.get('sub')
-            print(f"🔧 Admin User ID from token: {admin_user_id}")
-            
-            if not admin_user_id:
-                return jsonify({'error': 'Invalid token'}), 401
-            
-            # Buscar admin user
-            admin_user = AdminUser.query.get(admin_user_id)
-            print(f"🔧 Admin User encontrado: {admin_user}")
-            
-            if not admin_user or not admin_user.is_active:
-                return jsonify({'error': 'Admin user not found or inactive'}), 401
-            
-            print(f"🔧 Rol del admin: {admin_user.role}")
-            
-            # Verificar que es superadmin
-            if admin_user.role.lower() != 'superadmin':  # ✅ .lower() para mayúsculas
-                print(f"🔧 ❌ Rol no es superadmin: {admin_user.role}")
-                return jsonify({'error': 'Superadmin access required'}), 403
-            
-            print("🔧 ✅ Acceso concedido - Es superadmin")
-            return f(*args, **kwargs)
-            
-        except Exception as e:
-            print(f"🔧 ❌ Error en decorator: {str(e)}")
-            return jsonify({'error': str(e)}), 401
-    return decorated_function
+# Superadmin verificado contra la base (estado y rol actuales, cacheados unos segundos);
+# las vistas no reciben current_user_id / current_user_role
+superadmin_required = auth_required(roles=('superadmin',), verify_admin_user=True, pass_identity=False)
 
 @api.route('/admin/client-users', methods=['GET'])
 @superadmin_required
@@ -452,7 +439,7 @@ def get_client_users():
         marketing_emails = request.args.get('marketing_emails', type=lambda x: x.lower() == 'true')
         segment = request.args.get('segment', 'all')  # ✅ NUEVO FILTRO
         
-        print(f"🔧 Filtros - segment: {segment}")
+        logger.debug("🔧 Filtros - segment: %s", segment)
         
         # Construir query
         query = User.query
@@ -500,7 +487,12 @@ def get_client_users():
                 query = query.filter(User.total_orders.isnot(None)).filter(User.total_orders == 1)
         
         # Ordenar por fecha de creación (más recientes primero)
-        users = query.order_by(User.created_at.desc()).all()
+        page = None
+        if wants_keyset():
+            page = keyset_paginate(query, User.created_at, User.id)
+            users = page.items
+        else:
+            users = query.order_by(User.created_at.desc()).all()
 
         users_data = []
         for user in users:
@@ -509,14 +501,23 @@ def get_client_users():
             user_data['addresses_count'] = len(user.addresses) if user.addresses else 0
             users_data.append(user_data)
         
+        if page:
+            return jsonify({
+                'success': True,
+                'users': users_data,
+                **page.meta()
+            }), 200
+        
         return jsonify({
             'success': True,
             'users': users_data,
             'total': len(users)
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
-        print(f"❌ Error getting client users: {str(e)}")
+        logger.error("❌ Error getting client users: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/admin/client-users/<int:user_id>', methods=['PUT'])
@@ -556,7 +557,7 @@ def update_client_user(user_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating client user: {str(e)}")
+        logger.error("❌ Error updating client user: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/admin/client-users/<int:user_id>/orders', methods=['GET'])
@@ -568,7 +569,10 @@ def get_client_user_orders(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        orders = Order.query.filter_by(user_id=user_id).order_by(Order.created_at.desc()).all()
+        orders = Order.query.options(*Order.serialize_options())\
+                           .filter_by(user_id=user_id)\
+                           .order_by(Order.created_at.desc())\
+                           .all()
         
         return jsonify({
             'success': True,
@@ -577,7 +581,7 @@ def get_client_user_orders(user_id):
         }), 200
         
     except Exception as e:
-        print(f"❌ Error getting user orders: {str(e)}")
+        logger.error("❌ Error getting user orders: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/admin/client-users/stats', methods=['GET'])
@@ -602,7 +606,7 @@ def get_client_users_stats():
         }), 200
         
     except Exception as e:
-        print(f"❌ Error getting user stats: {str(e)}")
+        logger.error("❌ Error getting user stats: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/admin/client-users/export', methods=['GET'])
@@ -610,24 +614,24 @@ def get_client_users_stats():
 def export_client_users():
     """Exportar usuarios clientes a CSV (solo superadmin)"""
     try:
-        print("🔧 === EXPORT CLIENT USERS ===")
+        logger.debug("🔧 === EXPORT CLIENT USERS ===")
         
         # Obtener parámetros de filtro
         marketing_only = request.args.get('marketing_only', 'false').lower() == 'true'
         segment = request.args.get('segment', 'all')  # ✅ NUEVO: filtro por segmento
         
-        print(f"🔧 Filtros - marketing_only: {marketing_only}, segment: '{segment}'")
+        logger.debug("🔧 Filtros - marketing_only: %s, segment: '%s'", marketing_only, segment)
         
         # Construir query
         query = User.query.filter(User.is_active == True)
         
         if marketing_only:
             query = query.filter(User.marketing_emails == True)
-            print("🔧 Exportando solo usuarios con marketing aceptado")
+            logger.debug("🔧 Exportando solo usuarios con marketing aceptado")
         
         # ✅ NUEVO: Aplicar filtro de segmentación para exportación
         if segment != 'all':
-            print(f"🔧 Exportando segmento: {segment}")
+            logger.debug("🔧 Exportando segmento: %s", segment)
             
             if segment == 'vip':
                 query = query.filter(User.total_orders >= 3)
@@ -653,7 +657,7 @@ def export_client_users():
         
         users = query.order_by(User.created_at.desc()).all()
         
-        print(f"🔧 Usuarios a exportar: {len(users)}")
+        logger.debug("🔧 Usuarios a exportar: %s", len(users))
         
         # Crear datos CSV
         csv_data = []
@@ -703,28 +707,9 @@ def export_client_users():
         }), 200
         
     except Exception as e:
-        print(f"❌ Error exporting client users: {str(e)}")
+        logger.error("❌ Error exporting client users: %s", e)
         return jsonify({'error': str(e)}), 400
 
-# =============================================================================
-# FUNCIÓN HELPER PARA LOGS ADMINUSER
-# =============================================================================
-def log_admin_activity(admin_user_id, action, description, request=None):
-    """Función helper para registrar actividad de admin"""
-    try:
-        log = UserActivityLog(
-            admin_user_id=admin_user_id,
-            action=action,
-            description=description,
-            ip_address=request.remote_addr if request else None,
-            user_agent=request.headers.get('User-Agent') if request else None
-        )
-        db.session.add(log)
-        db.session.commit()
-    except Exception as e:
-        print(f"Error logging activity: {e}")
-        # No hacemos rollback de la transacción principal por un error en el log
-
 # =============================================================================
 # ADMIN USER MANAGEMENT ENDPOINTS
 # =============================================================================
@@ -746,7 +731,7 @@ def get_admin_users(current_user_id, current_user_role):
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 10))
         
-        print("🔧 FILTROS:", {
+        logger.debug("🔧 FILTROS: %s", {
             'role': role_filter,
             'is_active': status_filter, 
             'search': search,
@@ -766,7 +751,7 @@ def get_admin_users(current_user_id, current_user_role):
             is_active = status_filter.lower() == 'true'
             query = query.filter_by(is_active=is_active)
         else:
-            print("🔧 SIN FILTRO is_active")
+            logger.debug("🔧 SIN FILTRO is_active")
         
         if search:
             search_term = f"%{search}%"
@@ -778,7 +763,13 @@ def get_admin_users(current_user_id, current_user_role):
                 )
             )
         
-        total_before_pagination = query.count()
+        # Paginación por cursor (clientes nuevos) u OFFSET con page/per_page (compatibilidad)
+        if wants_keyset():
+            keyset_page = keyset_paginate(query, AdminUser.created_at, AdminUser.id)
+            return jsonify({
+                'users': [user.serialize() for user in keyset_page.items],
+                **keyset_page.meta()
+            }), 200
         
         # Paginación
         users = query.order_by(AdminUser.created_at.desc()).paginate(
@@ -786,7 +777,7 @@ def get_admin_users(current_user_id, current_user_role):
         )
         
         for user in users.items:
-            print(f"🔧   - {user.email} (activo: {user.is_active})")
+            logger.debug("🔧   - %s (activo: %s)", user.email, user.is_active)
         
         return jsonify({
             'users': [user.serialize() for user in users.items],
@@ -795,10 +786,10 @@ def get_admin_users(current_user_id, current_user_role):
             'current_page': page
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
-        print("🔧 ERROR EN LISTADO:", str(e))
-        import traceback
-        traceback.print_exc()
+        logger.exception("🔧 ERROR EN LISTADO: %s", e)
         return jsonify({'message': str(e)}), 400
     
 @api.route('/admin/users/<user_id>', methods=['GET'])
@@ -840,7 +831,7 @@ def create_admin_user(current_user_id, current_user_role):
         # Verificar si el email ya existe
         existing_user = AdminUser.query.filter_by(email=data.get('email')).first()
         if existing_user:
-            print("🔧 EMAIL YA EXISTE:", existing_user.email)
+            logger.debug("🔧 EMAIL YA EXISTE: %s", existing_user.email)
             return jsonify({'message': 'Email already registered'}), 400
         
         
@@ -850,10 +841,10 @@ def create_admin_user(current_user_id, current_user_role):
         # Validar que el rol sea válido
         valid_roles = ['superadmin', 'editor', 'content_manager']
         if role_from_request not in valid_roles:
-            print("🔧 ROL INVÁLIDO:", role_from_request)
+            logger.debug("🔧 ROL INVÁLIDO: %s", role_from_request)
             return jsonify({'message': 'Invalid role'}), 400
         
-        print("🔧 ROL VÁLIDO, CREANDO USUARIO...")
+        logger.debug("🔧 ROL VÁLIDO, CREANDO USUARIO...")
         
         # Crear nuevo usuario - USAR STRING DIRECTAMENTE
         new_user = AdminUser(
@@ -876,9 +867,7 @@ def create_admin_user(current_user_id, current_user_role):
         }), 201
         
     except Exception as e:
-        print("🔧 ERROR EN create_admin_user:", str(e))
-        import traceback
-        traceback.print_exc()
+        logger.exception("🔧 ERROR EN create_admin_user: %s", e)
         db.session.rollback()
         return jsonify({'message': str(e)}), 400
     
@@ -936,6 +925,7 @@ def update_admin_user(current_user_id, current_user_role, user_id):
         
         user.updated_at = func.now()
         db.session.commit()
+        invalidate_admin_principal(user_id)
         
         # Registrar actividad
         action = 'user_updated_self' if current_user_id == user_id else 'user_updated'
@@ -982,6 +972,7 @@ def delete_admin_user(current_user_id, current_user_role, user_id):
         
         db.session.delete(user)
         db.session.commit()
+        invalidate_admin_principal(user_id)
         
         return jsonify({
             'message': 'User deleted successfully'
@@ -1010,6 +1001,7 @@ def toggle_user_status(current_user_id, current_user_role, user_id):
         
         user.is_active = not user.is_active
         db.session.commit()
+        invalidate_admin_principal(user_id)
         
         # Registrar actividad
         status = 'activated' if user.is_active else 'deactivated'
@@ -1032,19 +1024,39 @@ def toggle_user_status(current_user_id, current_user_role, user_id):
 @api.route('/admin/activity-logs', methods=['GET'])
 @admin_required
 def get_activity_logs(current_user_id, current_user_role):
-    """Obtener logs de actividad (solo superadmin)"""
+    """Obtener logs de actividad (solo superadmin)
+    Filtros: ?action=a,b &admin_user_id=... &date_from=YYYY-MM-DD &date_to=YYYY-MM-DD (incluido)"""
     try:
         # Solo superadmin puede ver logs
         if current_user_role.lower() != 'superadmin':
             return jsonify({'message': 'Unauthorized'}), 403
         
+        try:
+            filters = activity_log_service.parse_filters(request.args)
+        except ValueError as e:
+            return jsonify({'message': str(e)}), 400
+        
+        # Índices (created_at, id) y (admin_user_id, created_at, id); admins en un SELECT por página
+        query = activity_log_service.query(filters)
+        
         # Parámetros de paginación
         page = int(request.args.get('page', 1))
         per_page = int(request.args.get('per_page', 20))
         
-        # Query con joins para obtener info del usuario
-        logs = UserActivityLog.query.join(AdminUser).order_by(
-            UserActivityLog.created_at.desc()
+        # Paginación por cursor (clientes nuevos) u OFFSET con page/per_page (compatibilidad)
+        if wants_keyset():
+            keyset_page = keyset_paginate(
+                query,
+                UserActivityLog.created_at,
+                UserActivityLog.id
+            )
+            return jsonify({
+                'logs': [log.serialize() for log in keyset_page.items],
+                **keyset_page.meta()
+            }), 200
+        
+        logs = query.order_by(
+            UserActivityLog.created_at.desc(), UserActivityLog.id.desc()
         ).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -1056,6 +1068,8 @@ def get_activity_logs(current_user_id, current_user_role):
             'current_page': page
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
         return jsonify({'message': str(e)}), 400
     
@@ -1080,23 +1094,46 @@ def get_client_user_addresses(user_id):
         }), 200
         
     except Exception as e:
-        print(f"❌ Error getting user addresses: {str(e)}")
+        logger.error("❌ Error getting user addresses: %s", e)
         return jsonify({'error': str(e)}), 400
 
 # =============================================================================
 # PRODUCT ENDPOINTS - CRUD COMPLETO
 # =============================================================================
 
+def requested_product_fields(default_view=None):
+    """Campos pedidos con ?view=card|cart|detail|admin y/o ?fields=a,b (None = todos).
+    default_view se usa si no se envía ninguno de los dos.
+    Lanza ValueError si no existen y PermissionError si incluyen campos de superadmin
+    sin un token de superadmin."""
+    view = request.args.get('view')
+    fields_param = request.args.get('fields')
+    if not view and not fields_param:
+        view = default_view
+    fields = Product.resolve_fields(view, fields_param)
+    if fields and Product.RESTRICTED_FIELDS.intersection(fields):
+        success, _, role, _ = verify_token_without_request(request.headers.get('Authorization', ''))
+        if not success or role != 'superadmin':
+            raise PermissionError('Superadmin access required for the requested fields')
+    return fields
+
+def admin_product_fields(role):
+    """Campos de producto en las respuestas del panel: costo_prenda solo para superadmin"""
+    return Product.VIEWS['admin'] if role == 'superadmin' else None
+
 @api.route('/products', methods=['GET'])
+@conditional_get(Product, Category)
 def get_products():
-    """Obtener todos los productos con filtros opcionales"""
+    """Obtener todos los productos con filtros opcionales (?view= / ?fields= para proyecciones)"""
     try:
+        fields = requested_product_fields()
+        
         # Filtros
         category = request.args.get('category')
         in_stock = request.args.get('in_stock')
         is_on_sale = request.args.get('is_on_sale')
         
-        query = Product.query
+        query = Product.query.options(*Product.load_options(fields))
         
         if category:
             query = query.filter_by(category=category)
@@ -1105,28 +1142,160 @@ def get_products():
         if is_on_sale:
             query = query.filter_by(is_on_sale=True)
         
+        if wants_keyset():
+            page = keyset_paginate(query, Product.created_at, Product.id)
+            return jsonify({
+                'products': [product.serialize(fields) for product in page.items],
+                **page.meta()
+            }), 200
+        
         products = query.all()
         
         return jsonify({
-            'products': [product.serialize() for product in products],
+            'products': [product.serialize(fields) for product in products],
             'total': len(products)
         }), 200
         
+    except InvalidCursorError:
+        raise
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
+@api.route('/products/browse', methods=['GET'])
+@conditional_get(Product, Category)
+def browse_products():
+    """Catálogo con filtros, facets y orden del lado del servidor (público).
+    Filtros: category, subcategory, material, size (varios valores separados por coma),
+    min_price, max_price, min_rating, is_new, in_stock, on_sale.
+    Orden: sort=newest|price_asc|price_desc|rating|best_selling. Paginación: cursor, limit.
+    Por defecto devuelve la vista 'card' (listado); acepta ?view= / ?fields=."""
+    try:
+        sort = request.args.get('sort', 'newest')
+        if sort not in SORT_OPTIONS:
+            return jsonify({'message': f'Invalid sort. Use one of: {", ".join(SORT_OPTIONS)}'}), 400
+
+        fields = requested_product_fields(default_view='card')
+        filters = catalog_service.parse_filters(request.args)
+        sort_column, descending = SORT_OPTIONS[sort]
+
+        page = keyset_paginate(catalog_service.browse_query(filters, fields), sort_column, Product.id,
+                               descending=descending, default_limit=24)
+        facets, total = catalog_service.facets(filters)
+
+        return jsonify({
+            'products': [product.serialize(fields) for product in page.items],
+            'facets': facets,
+            'sort': sort,
+            **page.meta(),
+            'total': total
+        }), 200
+
+    except InvalidCursorError:
+        raise
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
+# Máximo de ids por llamada a /products/batch
+MAX_BATCH_PRODUCT_IDS = 100
+
+@api.route('/products/batch', methods=['GET', 'POST'])
+@conditional_get(Product, Category)
+def get_products_batch():
+    """Varios productos por id en una consulta (refrescar carrito / favoritos).
+    GET ?ids=a,b,c o POST {"ids": [...]} para listas largas. Por defecto devuelve la
+    vista 'cart' (precio, stock, disponibilidad); acepta ?view= / ?fields=.
+    Respuesta en el orden pedido; los ids inexistentes vienen con found=false."""
+    try:
+        if request.method == 'POST':
+            data = request.get_json(silent=True) or {}
+            ids = data.get('ids')
+            if not isinstance(ids, list):
+                return jsonify({'message': 'ids must be a list'}), 400
+            ids = [str(product_id) for product_id in ids]
+        else:
+            ids = [product_id.strip() for product_id in request.args.get('ids', '').split(',')]
+
+        # Sin vacíos ni duplicados, respetando el orden
+        ids = list(dict.fromkeys(product_id for product_id in ids if product_id))
+        if not ids:
+            return jsonify({'message': 'ids is required'}), 400
+        if len(ids) > MAX_BATCH_PRODUCT_IDS:
+            return jsonify({'message': f'A maximum of {MAX_BATCH_PRODUCT_IDS} ids is allowed'}), 400
+
+        fields = requested_product_fields(default_view='cart')
+        found = {
+            product.id: product
+            for product in Product.query.options(*Product.load_options(fields)).filter(Product.id.in_(ids))
+        }
+
+        products = []
+        for product_id in ids:
+            product = found.get(product_id)
+            if product:
+                products.append({**product.serialize(fields), 'found': True})
+            else:
+                products.append({'id': product_id, 'found': False})
+
+        return jsonify({
+            'products': products,
+            'not_found': [product_id for product_id in ids if product_id not in found],
+            'total': len(found)
+        }), 200
+
+    except ValueError as e:
+        return jsonify({'message': str(e)}), 400
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+    except Exception as e:
+        return jsonify({'message': str(e)}), 500
+
 @api.route('/products/<product_id>', methods=['GET'])
+@conditional_get(Product, Category)
 def get_product(product_id):
-    """Obtener un producto específico por ID"""
+    """Obtener un producto específico por ID (?view= / ?fields= para proyecciones)"""
     try:
-        product = Product.query.get(product_id)
+        fields = requested_product_fields()
+        product = Product.query.options(*Product.load_options(fields)).filter_by(id=product_id).first()
         if not product:
             return jsonify({'message': 'Product not found'}), 404
         
         return jsonify({
-            'product': product.serialize()
+            'product': product.serialize(fields)
         }), 200
         
+    except PermissionError as e:
+        return jsonify({'message': str(e)}), 403
+    except Exception as e:
+        return jsonify({'message': str(e)}), 400
+
+@api.route('/products/<product_id>/page', methods=['GET'])
+@conditional_get(Product, Category, Review)
+def get_product_page(product_id):
+    """Página de producto en una sola llamada: detalle, primera página de reseñas
+    aprobadas, histograma de ratings y productos relacionados (público)"""
+    try:
+        review_limit = min(max(request.args.get('reviews_limit', 5, type=int) or 5, 1), 50)
+        related_limit = min(max(request.args.get('related_limit', 8, type=int) or 8, 1), 24)
+
+        # Misma huella que el ETag (@conditional_get): un cuerpo cacheado nunca sale con
+        # un ETag más nuevo que sus datos, tampoco cuando el cambio lo hizo otro worker
+        fingerprints = tuple(table_fingerprint(model) for model in (Product, Category, Review))
+        cache_key = (fingerprints, product_id, review_limit, related_limit)
+        page = product_page_cache.get(cache_key)
+        if page is None:
+            page = product_page_service.build(product_id, review_limit, related_limit)
+            if page is None:
+                return jsonify({'message': 'Product not found'}), 404
+            product_page_cache.set(cache_key, page)
+
+        return jsonify(page), 200
+
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
@@ -1160,7 +1329,8 @@ def create_product(current_user_id, current_user_role):
             cuidados=data.get('cuidados'),
             origen=data.get('origen'),
             disponibilidad=data.get('disponibilidad'),
-            costo_prenda=float(data.get('costo_prenda')) if data.get('costo_prenda') else None,
+            # El costo solo lo define un superadmin (es un campo restringido)
+            costo_prenda=float(data['costo_prenda']) if data.get('costo_prenda') and current_user_role == 'superadmin' else None,
             videos=data.get('videos', [])
         )
         
@@ -1169,7 +1339,7 @@ def create_product(current_user_id, current_user_role):
         
         return jsonify({
             'message': 'Product created successfully',
-            'product': product.serialize()
+            'product': product.serialize(admin_product_fields(current_user_role))
         }), 201
         
     except Exception as e:
@@ -1223,7 +1393,7 @@ def update_product(current_user_id, current_user_role, product_id):
             product.origen = data['origen']
         if 'disponibilidad' in data:
             product.disponibilidad = data['disponibilidad']
-        if 'costo_prenda' in data:
+        if 'costo_prenda' in data and current_user_role == 'superadmin':
             product.costo_prenda = float(data['costo_prenda']) if data['costo_prenda'] else None
         if 'videos' in data:
             product.videos = data['videos']
@@ -1232,14 +1402,12 @@ def update_product(current_user_id, current_user_role, product_id):
         
         return jsonify({
             'message': 'Product updated successfully',
-            'product': product.serialize()
+            'product': product.serialize(admin_product_fields(current_user_role))
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ ERROR al actualizar: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ ERROR al actualizar: %s", e)
         return jsonify({'message': str(e)}), 400
 
 @api.route('/products/<product_id>', methods=['DELETE'])
@@ -1270,17 +1438,21 @@ def get_top_selling_products():
     """Obtiene los productos más vendidos o productos destacados"""
     try:
         limit = request.args.get('limit', 4, type=int)
+        period = request.args.get('period', 'all')  # all, month, week
+        days = request.args.get('days', type=int)
+        
+        # Ventana opcional ("top del mes") desde el rollup diario
+        since = None
+        today = datetime.utcnow().date()
+        if days:
+            since = today - timedelta(days=days - 1)
+        elif period == 'month':
+            since = today.replace(day=1)
+        elif period == 'week':
+            since = today - timedelta(days=today.weekday())
         
-        # Intentar obtener productos más vendidos
-        top_products_query = db.session.query(
-            Product,
-            func.coalesce(func.sum(OrderItem.quantity), 0).label('total_sold')
-        ).outerjoin(OrderItem, Product.id == OrderItem.product_id)\
-         .outerjoin(Order, OrderItem.order_id == Order.id)\
-         .group_by(Product.id)\
-         .order_by(desc('total_sold'), desc(Product.id))\
-         .limit(limit)\
-         .all()
+        # Productos más vendidos: contador units_sold indexado (solo órdenes completadas)
+        top_products_query = analytics_service.get_top_selling(limit=limit, since=since)
         
         # Si no hay productos con ventas, traer productos normales
         if not top_products_query or all(sold == 0 for _, sold in top_products_query):
@@ -1321,9 +1493,7 @@ def get_top_selling_products():
         }), 200
         
     except Exception as e:
-        print(f"Error getting top selling products: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("Error getting top selling products: %s", e)
         
         return jsonify({
             'success': False,
@@ -1337,7 +1507,7 @@ def search_products():
     """Búsqueda inteligente de productos Y santos con sugerencias"""
     try:
         search_term = request.args.get('q', '').strip()
-        limit = int(request.args.get('limit', 10))
+        limit = max(1, min(int(request.args.get('limit', 10)), 50))
         
         if not search_term:
             return jsonify({
@@ -1348,34 +1518,17 @@ def search_products():
                 'total': 0
             }), 200
         
-        # ✅ BÚSQUEDA EN PRODUCTOS (existente)
-        product_search_filter = or_(
-            Product.name.ilike(f'%{search_term}%'),
-            Product.description.ilike(f'%{search_term}%'),
-            Product.subcategory.ilike(f'%{search_term}%'),
-            Product.material.ilike(f'%{search_term}%'),
-            Product.origen.ilike(f'%{search_term}%'),
-            Category.name.ilike(f'%{search_term}%')
-        )
+        # ✅ CACHÉ: términos repetidos ("san", "camiseta") no vuelven a consultar ni serializar.
+        # La clave incluye la huella de las tablas (compartida entre workers, ver api/cache.py)
+        fingerprints = tuple(table_fingerprint(model) for model in (Product, Category, Saint))
+        cache_key = (fingerprints, ' '.join(search_term.lower().split()), limit)
+        cached = search_cache.get(cache_key)
+        if cached is not None:
+            return jsonify({**cached, 'search_term': search_term}), 200
         
-        products = Product.query.join(Category)\
-                               .filter(product_search_filter)\
-                               .filter(Product.in_stock == True)\
-                               .limit(limit)\
-                               .all()
-        
-        # ✅ NUEVO: BÚSQUEDA EN SANTOS
-        saint_search_filter = or_(
-            Saint.name.ilike(f'%{search_term}%'),
-            Saint.summary.ilike(f'%{search_term}%'),
-            Saint.biography.ilike(f'%{search_term}%'),
-            Saint.patronage.ilike(f'%{search_term}%')
-        )
-        
-        saints = Saint.query.filter(saint_search_filter)\
-                           .filter(Saint.is_active == True)\
-                           .limit(5)\
-                           .all()
+        # ✅ BÚSQUEDA DE TEXTO COMPLETO (índice tsvector/FTS5, ordenada por relevancia)
+        products = search_service.search_products(search_term, limit=limit)
+        saints = search_service.search_saints(search_term, limit=5)
         
         # ✅ SUGERENCIAS MEJORADAS
         suggestions = []
@@ -1397,7 +1550,7 @@ def search_products():
         if total_results > 5:
             suggestions.append(f"Ver todos los {total_results} resultados")
         
-        return jsonify({
+        result = {
             'success': True,
             'products': [product.serialize() for product in products],
             'saints': [saint.serialize_short() for saint in saints],  # ✅ NUEVO
@@ -1405,33 +1558,74 @@ def search_products():
             'total_products': len(products),
             'total_saints': len(saints),  # ✅ NUEVO
             'search_term': search_term
+        }
+        search_cache.set(cache_key, result)
+        
+        return jsonify(result), 200
+        
+    except Exception as e:
+        logger.error("❌ Error en búsqueda: %s", e)
+        return jsonify({
+            'success': False,
+            'error': str(e)
+        }), 400
+
+@api.route('/search/suggest', methods=['GET'])
+def search_suggest():
+    """Autocompletado para el buscador: prefijo sobre nombres de productos,
+    categorías, materiales y santos desde un índice en memoria (sin consultar la base)"""
+    try:
+        term = request.args.get('q', '')
+        limit = min(request.args.get('limit', 8, type=int) or 8, 20)
+        
+        return jsonify({
+            'success': True,
+            'query': term,
+            'suggestions': suggest_index.suggest(term, limit=limit)
         }), 200
         
     except Exception as e:
-        print(f"❌ Error en búsqueda: {str(e)}")
+        logger.error("❌ Error en sugerencias: %s", e)
         return jsonify({
             'success': False,
             'error': str(e)
         }), 400
 
+@api.route('/admin/cache/stats', methods=['GET'])
+@admin_required
+def get_cache_stats(current_user_id, current_user_role):
+    """Hits/misses de las cachés de catálogo, tamaño del índice de sugerencias y cola
+    del log de actividad (este proceso)"""
+    return jsonify({
+        'success': True,
+        **cache_stats(),
+        'suggest_index': suggest_index.stats(),
+        'activity_log': activity_log_writer.stats()
+    }), 200
+
 # =============================================================================
 # CATEGORY ENDPOINTS
 # =============================================================================
 
 @api.route('/categories', methods=['GET'])
+@conditional_get(Category, Product)
 def get_categories():
     """Obtener todas las categorías"""
     try:
-        categories = Category.query.order_by(Category.name).all()
+        # Conteo de productos con un COUNT agrupado (una sola consulta para todas las categorías)
+        in_stock_only = request.args.get('in_stock_only', 'false').lower() == 'true'
+        categories = Category.with_product_counts(in_stock_only=in_stock_only)\
+                             .order_by(Category.name)\
+                             .all()
         
         categories_data = []
-        for category in categories:
+        for category, product_count in categories:
             categories_data.append({
                 'id': category.id,
                 'name': category.name,
                 'description': category.description or '',
                 'image_url': category.image_url or '',
-                'product_count': len(category.products) if category.products else 0,
+                'product_count': product_count,
                 'created_at': category.created_at.isoformat() if category.created_at else None
             })
         
@@ -1532,7 +1726,7 @@ def delete_category(current_user_id=None, current_user_role=None, category_id=No
             return jsonify({'success': False, 'message': 'Categoría no encontrada'}), 404
         
         # Verificar si hay productos en esta categoría
-        product_count = len(category.products) if category.products else 0
+        product_count = category.count_products()
         if product_count > 0:
             return jsonify({
                 'success': False, 
@@ -1597,10 +1791,12 @@ def create_order():
         customer_postal_code = customer_info.get('postal_code') or customer_info.get('codigoPostal')
         
         # ✅ USAR DATOS DE DIRECCIÓN GUARDADA O MANUALES
+        # ✅ Buscar usuario por email una sola vez (si existe)
+        user = User.query.filter_by(email=customer_email).first() if customer_email else None
+        
         if user_address:
             # ✅ VERIFICAR SEGURIDAD: que la dirección pertenece al usuario
-            user_from_email = User.query.filter_by(email=customer_email).first()
-            if user_from_email and user_address.user_id != user_from_email.id:
+            if user and user_address.user_id != user.id:
                 return jsonify({'message': 'La dirección no pertenece a este usuario'}), 403
             
             # Usar datos de la dirección guardada (pero priorizar datos del formulario)
@@ -1620,17 +1816,30 @@ def create_order():
         if '@' not in customer_email:
             return jsonify({'message': 'Invalid email format'}), 400
         
-        # Calcular totales (usar los que vienen del frontend o calcular)
-        subtotal = data.get('subtotal', sum(item.get('price', 0) * item.get('quantity', 0) for item in items))
-        shipping = data.get('shipping', 10000)  # Usar el del frontend o 10000 por defecto
-        total = data.get('total', subtotal + shipping)
+        # ✅ VALIDACIÓN: Campos requeridos en cada item (el precio lo pone el servidor)
+        for item_data in items:
+            if not isinstance(item_data, dict) or not all(key in item_data for key in ['productId', 'quantity', 'size']):
+                return jsonify({'message': 'Missing required fields in order items'}), 400
+            quantity = item_data['quantity']
+            if isinstance(quantity, bool) or not isinstance(quantity, int) or quantity <= 0:
+                return jsonify({'message': 'Invalid item quantity'}), 400
+        
+        # ✅ Cargar todos los productos del carrito en una sola consulta IN (...)
+        product_ids = {item_data['productId'] for item_data in items}
+        products = {
+            product.id: product
+            for product in Product.query.filter(Product.id.in_(product_ids)).all()
+        }
+        
+        for item_data in items:
+            if item_data['productId'] not in products:
+                return jsonify({'message': f"Product not found: {item_data['productId']}"}), 404
         
-        # ✅ VALIDACIÓN: Totales deben ser positivos
-        if subtotal < 0 or shipping < 0 or total < 0:
-            return jsonify({'message': 'Invalid order totals'}), 400
+        # ✅ Totales calculados en el servidor con el precio actual del producto
+        subtotal = sum(products[item_data['productId']].price * item_data['quantity'] for item_data in items)
+        shipping = order_service.shipping_for(subtotal)
         
-        # ✅ NUEVO: Buscar usuario por email (si existe)
-        user = User.query.filter_by(email=customer_email).first()
+        total = subtotal + shipping
         user_id = user.id if user else None
         
         # Crear la orden
@@ -1653,65 +1862,35 @@ def create_order():
         db.session.add(order)
         db.session.flush()  # Para obtener el ID sin commit
         
-        # ✅ VALIDACIÓN: Crear items de la orden con verificación
-        for item_data in items:
-            # Validar campos requeridos en cada item
-            if not all(key in item_data for key in ['productId', 'quantity', 'size', 'price']):
-                db.session.rollback()
-                return jsonify({'message': 'Missing required fields in order items'}), 400
-            
-            # Validar que el producto existe
-            product = Product.query.get(item_data['productId'])
-            if not product:
-                db.session.rollback()
-                return jsonify({'message': f"Product not found: {item_data['productId']}"}), 404
-            
-            order_item = OrderItem(
-                order_id=order.id,
-                product_id=item_data['productId'],
-                quantity=item_data['quantity'],
-                size=item_data['size'],
-                price=item_data['price']
-            )
-            db.session.add(order_item)
+        # ✅ Insertar todos los items en un solo INSERT masivo
+        db.session.execute(insert(OrderItem), [
+            {
+                'id': generate_uuid(),
+                'order_id': order.id,
+                'product_id': item_data['productId'],
+                'quantity': item_data['quantity'],
+                'size': item_data['size'],
+                'price': products[item_data['productId']].price
+            }
+            for item_data in items
+        ])
+        
+        # ✅ Reservar stock con UPDATE condicional (sin sobreventa en lanzamientos)
+        try:
+            stock_service.reserve(order, [(item_data['productId'], item_data['quantity']) for item_data in items])
+        except InsufficientStockError as stock_error:
+            db.session.rollback()
+            product = products[stock_error.product_id]
+            return jsonify({
+                'message': f'Stock insuficiente para {product.name}',
+                'product_id': product.id,
+                'error': 'insufficient_stock'
+            }), 409
         
-        # ✅ NUEVO: ACTUALIZACIÓN ROBUSTA DE ESTADÍSTICAS DEL USUARIO
+        # ✅ Estadísticas del usuario: la orden nace PENDING, solo cambia last_order_date.
+        # total_orders/total_spent se ajustan con deltas cuando la orden se completa (order_service)
         if user:
-            try:
-                from sqlalchemy import func
-                
-                # ✅ CORRECCIÓN DEFINITIVA: Usar OBJETOS Enum, no strings
-                completed_statuses = [OrderStatusEnum.CONFIRMED, OrderStatusEnum.DELIVERED]
-                
-                # Contar todas las órdenes del usuario
-                count_all_result = db.session.query(func.count(Order.id)).filter(Order.user_id == user.id).scalar()
-                
-                # Contar órdenes completadas (confirmed/delivered)
-                count_completed_result = db.session.query(func.count(Order.id)).filter(
-                    Order.user_id == user.id,
-                    Order.status.in_(completed_statuses)
-                ).scalar()
-                
-                # Calcular total gastado en órdenes completadas
-                spent_result = db.session.query(func.coalesce(func.sum(Order.total), 0.0)).filter(
-                    Order.user_id == user.id,
-                    Order.status.in_(completed_statuses)
-                ).scalar()
-                
-                # Actualizar estadísticas del usuario
-                user.total_orders = count_all_result or 0
-                user.total_spent = float(spent_result or 0.0)
-                
-                # Actualizar last_order_date
-                from datetime import datetime
-                user.last_order_date = datetime.utcnow()
-                
-                db.session.add(user)
-                
-            except Exception as stats_error:
-                # Si hay error en estadísticas, continuar sin afectar la orden
-                print(f"⚠️ Error actualizando estadísticas: {stats_error}")
-                pass
+            user_stats_service.register_new_order(order)
         
         db.session.commit()
         
@@ -1729,66 +1908,38 @@ def create_order():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creating order: {str(e)}")
+        logger.error("❌ Error creating order: %s", e)
         return jsonify({'message': f'Error creating order: {str(e)}'}), 400
     
 @api.route('/admin/recalculate-user-stats', methods=['POST'])
 @superadmin_required
 def recalculate_user_stats():
-    """Recalcular total_orders y total_spent para todos los usuarios (solo superadmin)"""
+    """Recalcular total_orders y total_spent para todos los usuarios (solo superadmin).
+    Para tablas grandes usar el comando: flask recalc-user-stats"""
     try:
-        print("🔧 === RECALCULATING USER STATS ===")
-        
-        # ✅ SEGURIDAD: Verificar que es superadmin (ya lo hace el decorator)
-        from sqlalchemy import func
+        logger.debug("🔧 === RECALCULATING USER STATS ===")
         
-        users = User.query.all()
-        updated_count = 0
-        error_count = 0
+        chunk_size = request.args.get('chunk_size', 1000, type=int)
+        if chunk_size is None or chunk_size < 1:
+            return jsonify({'error': 'chunk_size must be a positive integer'}), 400
         
-        for user in users:
-            try:
-                # ✅ CÁLCULO SEGURO: Desde la base de datos, solo órdenes completadas
-                stats = db.session.query(
-                    func.count(Order.id).label('total_orders'),
-                    func.coalesce(func.sum(Order.total), 0.0).label('total_spent')
-                ).filter(
-                    Order.user_id == user.id,
-                    Order.status.in_(['confirmed', 'delivered'])  # ✅ Solo órdenes completadas
-                ).first()
-                
-                # Actualizar usuario
-                user.total_orders = stats.total_orders
-                user.total_spent = float(stats.total_spent)
-                
-                # Actualizar last_order_date con la orden más reciente
-                last_order = Order.query.filter_by(user_id=user.id)\
-                    .order_by(Order.created_at.desc())\
-                    .first()
-                user.last_order_date = last_order.created_at if last_order else None
-                
-                db.session.add(user)
-                updated_count += 1
-                
-                print(f"✅ Usuario {user.email}: {user.total_orders} pedidos, ${user.total_spent:.2f} gastado")
-                
-            except Exception as user_error:
-                print(f"❌ Error procesando usuario {user.id}: {user_error}")
-                error_count += 1
-                continue  # Continuar con el siguiente usuario
+        # ✅ Recalculo por conjuntos: UPDATE ... FROM por rangos de id, commit por rango
+        updated_count, with_orders = user_stats_service.recalculate_all(chunk_size=chunk_size)
         
-        db.session.commit()
+        logger.info("✅ Estadísticas recalculadas: %s usuarios (%s con pedidos)", updated_count, with_orders)
         
         return jsonify({
             'success': True,
-            'message': f'Stats recalculated for {updated_count} users, {error_count} errors',
+            'message': f'Stats recalculated for {updated_count} users, 0 errors',
             'updated_count': updated_count,
-            'error_count': error_count
+            # El recálculo por conjuntos no tiene errores por usuario; se mantiene la clave
+            'error_count': 0,
+            'with_orders_count': with_orders
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error in recalculate_user_stats: {str(e)}")
+        logger.error("❌ Error in recalculate_user_stats: %s", e)
         return jsonify({'error': str(e)}), 400
     
 @api.route('/admin/users/<int:user_id>/recalculate-stats', methods=['POST'])
@@ -1800,27 +1951,7 @@ def recalculate_single_user_stats(user_id):
         if not user:
             return jsonify({'error': 'User not found'}), 404
         
-        from sqlalchemy import func
-        
-        # Calcular estadísticas desde la base de datos
-        stats = db.session.query(
-            func.count(Order.id).label('total_orders'),
-            func.coalesce(func.sum(Order.total), 0.0).label('total_spent')
-        ).filter(
-            Order.user_id == user.id,
-            Order.status.in_(['confirmed', 'delivered'])
-        ).first()
-        
-        # Actualizar usuario
-        user.total_orders = stats.total_orders
-        user.total_spent = float(stats.total_spent)
-        
-        # Actualizar last_order_date
-        last_order = Order.query.filter_by(user_id=user.id)\
-            .order_by(Order.created_at.desc())\
-            .first()
-        user.last_order_date = last_order.created_at if last_order else None
-        
+        user = user_stats_service.recalculate_user(user.id)
         db.session.commit()
         
         return jsonify({
@@ -1837,7 +1968,7 @@ def recalculate_single_user_stats(user_id):
 def get_order(order_id):
     """Obtener detalles de una orden específica"""
     try:
-        order = Order.query.get(order_id)
+        order = db.session.get(Order, order_id, options=Order.serialize_options())
         if not order:
             return jsonify({'message': 'Order not found'}), 404
         
@@ -1853,13 +1984,24 @@ def get_order(order_id):
 def get_all_orders(current_user_id, current_user_role):
     """Obtener todas las órdenes (solo admin)"""
     try:
-        orders = Order.query.order_by(Order.created_at.desc()).all()
+        query = Order.query.options(*Order.serialize_options())
+        
+        if wants_keyset():
+            page = keyset_paginate(query, Order.created_at, Order.id)
+            return jsonify({
+                'orders': [order.serialize() for order in page.items],
+                **page.meta()
+            }), 200
+        
+        orders = query.order_by(Order.created_at.desc()).all()
         
         return jsonify({
             'orders': [order.serialize() for order in orders],
             'total': len(orders)
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
@@ -1881,38 +2023,17 @@ def update_order_status(current_user_id, current_user_role, order_id):
             return jsonify({'message': f'Invalid status. Must be one of: {valid_statuses}'}), 400
         
         old_status = order.status.value
-        order.status = OrderStatusEnum(new_status)
-        
-        # ✅ NUEVO: ACTUALIZAR ESTADÍSTICAS DEL USUARIO SI LA ORDEN SE COMPLETA
-        if order.user_id and new_status in ['confirmed', 'delivered']:
-            try:
-                user = User.query.get(order.user_id)
-                if user:
-                    from sqlalchemy import func
-                    
-                    # ✅ CORRECCIÓN DEFINITIVA: Usar OBJETOS Enum
-                    completed_statuses = [OrderStatusEnum.CONFIRMED, OrderStatusEnum.DELIVERED]
-                    
-                    # Recalcular desde base de datos
-                    total_orders = db.session.query(func.count(Order.id))\
-                        .filter(Order.user_id == user.id)\
-                        .scalar()
-                    
-                    total_spent_result = db.session.query(func.coalesce(func.sum(Order.total), 0.0))\
-                        .filter(
-                            Order.user_id == user.id,
-                            Order.status.in_(completed_statuses)  # ✅ CORREGIDO
-                        )\
-                        .scalar()
-                    
-                    user.total_orders = total_orders
-                    user.total_spent = float(total_spent_result)
-                    
-                    print(f"✅ Estadísticas actualizadas - Usuario {user.email}: {user.total_orders} pedidos, ${user.total_spent:.2f} gastado")
-                    db.session.add(user)
-                    
-            except Exception as stats_error:
-                print(f"⚠️ Error actualizando estadísticas: {stats_error}")
+        # Cambia el estado y mantiene rollup de ventas y estadísticas del usuario en la misma transacción
+        try:
+            order_service.change_status(order, OrderStatusEnum(new_status))
+        except InsufficientStockError as stock_error:
+            # Reabrir una orden cancelada requiere volver a reservar su stock
+            db.session.rollback()
+            return jsonify({
+                'message': 'Stock insuficiente para reabrir la orden',
+                'product_id': stock_error.product_id,
+                'error': 'insufficient_stock'
+            }), 409
         
         db.session.commit()
         
@@ -1923,7 +2044,7 @@ def update_order_status(current_user_id, current_user_role, order_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error updating order status: {str(e)}")
+        logger.error("❌ Error updating order status: %s", e)
         return jsonify({'message': str(e)}), 400
 
 # =============================================================================
@@ -1953,35 +2074,35 @@ def save_uploaded_file(file, folder):
         
         # Obtener directorio donde está app.py
         app_dir = os.path.abspath(current_app.root_path)
-        print(f"📁 app_dir (current_app.root_path): {app_dir}")
+        logger.debug("📁 app_dir (current_app.root_path): %s", app_dir)
         
         # Subir un nivel si estamos en src/
         if app_dir.endswith('src'):
             project_root = os.path.dirname(app_dir)
-            print(f"📁 Detectado 'src' en la ruta, subiendo un nivel")
+            logger.debug("📁 Detectado 'src' en la ruta, subiendo un nivel")
         else:
             project_root = app_dir
             
-        print(f"📁 project_root: {project_root}")
+        logger.debug("📁 project_root: %s", project_root)
         
         upload_dir = os.path.join(project_root, 'uploads', folder)
         upload_dir = os.path.abspath(upload_dir)
         
         # Crear directorio si no existe
         os.makedirs(upload_dir, exist_ok=True)
-        print(f"📁 upload_dir FINAL: {upload_dir}")
+        logger.debug("📁 upload_dir FINAL: %s", upload_dir)
         
         # Guardar archivo físicamente
         file_path = os.path.join(upload_dir, unique_filename)
         file.save(file_path)
-        print(f"💾 File saved to: {file_path}")
+        logger.debug("💾 File saved to: %s", file_path)
         
         # Verificar que se guardó
         if os.path.exists(file_path):
             file_size = os.path.getsize(file_path)
-            print(f"✅ File verified! Size: {file_size} bytes")
+            logger.debug("✅ File verified! Size: %s bytes", file_size)
         else:
-            print(f"❌ ERROR: File NOT saved: {file_path}")
+            logger.error("❌ ERROR: File NOT saved: %s", file_path)
             return None
         
         # Retornar ruta relativa para la BD
@@ -2011,8 +2132,8 @@ def upload_media(current_user_id, current_user_role, product_id):
         new_images = product.images.copy() if product.images else []
         new_videos = product.videos.copy() if product.videos else []
         
-        print(f"📸 Imágenes existentes: {new_images}")
-        print(f"🎥 Videos existentes: {new_videos}")
+        logger.debug("📸 Imágenes existentes: %s", new_images)
+        logger.debug("🎥 Videos existentes: %s", new_videos)
         
         for file in files:
             if file.filename == '':
@@ -2024,7 +2145,7 @@ def upload_media(current_user_id, current_user_role, product_id):
             file.seek(0)
             
             if file_size > MAX_FILE_SIZE:
-                print(f"⚠️ Archivo muy grande: {file.filename} ({file_size} bytes)")
+                logger.warning("⚠️ Archivo muy grande: %s (%s bytes)", file.filename, file_size)
                 continue
             
             # Determinar tipo de archivo
@@ -2035,7 +2156,7 @@ def upload_media(current_user_id, current_user_role, product_id):
                 folder = 'videos' 
                 target_list = new_videos
             else:
-                print(f"⚠️ Tipo de archivo no permitido: {file.filename}")
+                logger.warning("⚠️ Tipo de archivo no permitido: %s", file.filename)
                 continue
             
             # Guardar archivo
@@ -2043,34 +2164,32 @@ def upload_media(current_user_id, current_user_role, product_id):
             if file_path:
                 target_list.append(file_path)
                 uploaded_files.append(file_path)
-                print(f"✅ Archivo agregado a {folder}: {file_path}")
+                logger.info("✅ Archivo agregado a %s: %s", folder, file_path)
         
         # ✅ ACTUALIZAR EL PRODUCTO CON LAS NUEVAS LISTAS
         product.images = new_images
         product.videos = new_videos
         
-        print(f"🔄 Producto actualizado - images: {product.images}")
-        print(f"🔄 Producto actualizado - videos: {product.videos}")
+        logger.debug("🔄 Producto actualizado - images: %s", product.images)
+        logger.debug("🔄 Producto actualizado - videos: %s", product.videos)
         
         db.session.commit()
         
         # ✅ VERIFICACIÓN FINAL
         db.session.refresh(product)
-        print(f"✅ COMMIT exitoso")
-        print(f"📸 Imágenes finales en BD: {product.images}")
-        print(f"🎥 Videos finales en BD: {product.videos}")
+        logger.debug("✅ COMMIT exitoso")
+        logger.debug("📸 Imágenes finales en BD: %s", product.images)
+        logger.debug("🎥 Videos finales en BD: %s", product.videos)
         
         return jsonify({
             'message': f'Se subieron {len(uploaded_files)} archivos',
             'uploaded_files': uploaded_files,
-            'product': product.serialize()
+            'product': product.serialize(admin_product_fields(current_user_role))
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en upload: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error en upload: %s", e)
         return jsonify({'message': str(e)}), 400
 
 @api.route('/admin/upload/<product_id>', methods=['DELETE'])
@@ -2078,22 +2197,22 @@ def upload_media(current_user_id, current_user_role, product_id):
 def delete_media(current_user_id, current_user_role, product_id):
     """Eliminar una imagen o video de un producto - VERSIÓN CORREGIDA"""
     try:
-        print(f"🔧 DELETE request recibida para product_id: {product_id}")
+        logger.debug("🔧 DELETE request recibida para product_id: %s", product_id)
         
         # ✅ OBTENER el producto con lock para evitar condiciones de carrera
         product = Product.query.get(product_id)
         if not product:
-            print(f"❌ Producto no encontrado: {product_id}")
+            logger.warning("❌ Producto no encontrado: %s", product_id)
             return jsonify({'message': 'Producto no encontrado'}), 404
         
         data = request.get_json()
-        print(f"📦 Datos recibidos: {data}")
+        logger.debug("📦 Datos recibidos: %s", data)
         
         file_path = data.get('file_path')
         file_type = data.get('type')
         
         if not file_path or not file_type:
-            print(f"❌ Faltan parámetros: file_path={file_path}, file_type={file_type}")
+            logger.warning("❌ Faltan parámetros: file_path=%s, file_type=%s", file_path, file_type)
             return jsonify({'message': 'Ruta de archivo y tipo requeridos'}), 400
         
         # Determinar campo a actualizar
@@ -2101,21 +2220,21 @@ def delete_media(current_user_id, current_user_role, product_id):
         
         # ✅ OBTENER la lista actual y hacer una COPIA
         current_media = getattr(product, media_field, []) or []
-        print(f"🗑️ Eliminando archivo: {file_path}")
-        print(f"📋 Lista actual de {media_field}: {current_media}")
+        logger.debug("🗑️ Eliminando archivo: %s", file_path)
+        logger.debug("📋 Lista actual de %s: %s", media_field, current_media)
         
         # ✅ VERIFICAR y remover de la lista
         if file_path in current_media:
-            print(f"✅ Archivo encontrado en la lista, eliminando...")
+            logger.debug("✅ Archivo encontrado en la lista, eliminando...")
             # ✅ CREAR NUEVA LISTA sin el archivo
             updated_media = [img for img in current_media if img != file_path]
-            print(f"📋 Lista después de eliminar: {updated_media}")
+            logger.debug("📋 Lista después de eliminar: %s", updated_media)
             
             # ✅ ACTUALIZAR EL PRODUCTO con la nueva lista
             setattr(product, media_field, updated_media)
             
         else:
-            print(f"❌ Archivo NO encontrado en la lista: {file_path}")
+            logger.warning("❌ Archivo NO encontrado en la lista: %s", file_path)
             return jsonify({'message': 'Archivo no encontrado en el producto'}), 404
         
         # Eliminar archivo físico (solo para archivos locales)
@@ -2127,18 +2246,18 @@ def delete_media(current_user_id, current_user_role, product_id):
                 full_physical_path = os.path.join(project_root, relative_path)
                 full_physical_path = os.path.abspath(full_physical_path)
                 
-                print(f"📁 Ruta física del archivo: {full_physical_path}")
+                logger.debug("📁 Ruta física del archivo: %s", full_physical_path)
                 
                 if os.path.exists(full_physical_path):
                     os.remove(full_physical_path)
-                    print(f"✅ Archivo físico eliminado")
+                    logger.info("✅ Archivo físico eliminado")
                 else:
-                    print(f"⚠️ Archivo físico no encontrado (pero se removió de la lista)")
+                    logger.warning("⚠️ Archivo físico no encontrado (pero se removió de la lista)")
                     
             except Exception as e:
-                print(f"⚠️ Error eliminando archivo físico: {e}")
+                logger.warning("⚠️ Error eliminando archivo físico: %s", e)
         else:
-            print(f"ℹ️ Es una URL externa, no se elimina archivo físico")
+            logger.debug("ℹ️ Es una URL externa, no se elimina archivo físico")
         
         # ✅ HACER COMMIT para guardar los cambios
         db.session.commit()
@@ -2146,20 +2265,18 @@ def delete_media(current_user_id, current_user_role, product_id):
         # ✅ CRÍTICO: Recargar el producto desde la base de datos
         db.session.refresh(product)
         
-        print(f"✅ DELETE completado exitosamente")
-        print(f"📸 Estado final REAL desde BD - images: {product.images}")
-        print(f"🎥 Estado final REAL desde BD - videos: {product.videos}")
+        logger.info("✅ DELETE completado exitosamente")
+        logger.debug("📸 Estado final REAL desde BD - images: %s", product.images)
+        logger.debug("🎥 Estado final REAL desde BD - videos: %s", product.videos)
         
         return jsonify({
             'message': 'Archivo eliminado correctamente',
-            'product': product.serialize()  # ✅ Esto ahora tendrá los datos ACTUALIZADOS
+            'product': product.serialize(admin_product_fields(current_user_role))  # ✅ Esto ahora tendrá los datos ACTUALIZADOS
         }), 200
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error en DELETE: {e}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error en DELETE: %s", e)
         return jsonify({'message': str(e)}), 400
             
 # Endpoint para reordenar archivos multimedia
@@ -2184,7 +2301,7 @@ def reorder_media(current_user_id, current_user_role, product_id):
         
         return jsonify({
             'message': 'Orden actualizado correctamente',
-            'product': product.serialize()
+            'product': product.serialize(admin_product_fields(current_user_role))
         }), 200
         
     except Exception as e:
@@ -2212,6 +2329,14 @@ def get_admin_reviews(current_user_id, current_user_role):  # ✅ CAMBIÉ EL NOM
         elif status == 'approved':
             query = query.filter_by(is_approved=True)
         
+        # Paginación por cursor (clientes nuevos) u OFFSET con page/per_page (compatibilidad)
+        if wants_keyset():
+            keyset_page = keyset_paginate(query, Review.created_at, Review.id)
+            return jsonify({
+                'reviews': [review.serialize() for review in keyset_page.items],
+                **keyset_page.meta()
+            }), 200
+        
         reviews = query.order_by(Review.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -2223,6 +2348,8 @@ def get_admin_reviews(current_user_id, current_user_role):  # ✅ CAMBIÉ EL NOM
             'current_page': page
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
@@ -2267,16 +2394,27 @@ def create_review(product_id):
 def get_product_reviews(product_id):
     """Obtener reseñas de un producto (solo las aprobadas)"""
     try:
-        reviews = Review.query.filter_by(
+        query = Review.query.filter_by(
             product_id=product_id, 
             is_approved=True
-        ).order_by(Review.created_at.desc()).all()
+        )
+        
+        if wants_keyset():
+            page = keyset_paginate(query, Review.created_at, Review.id)
+            return jsonify({
+                'reviews': [review.serialize() for review in page.items],
+                **page.meta()
+            }), 200
+        
+        reviews = query.order_by(Review.created_at.desc()).all()
         
         return jsonify({
             'reviews': [review.serialize() for review in reviews],
             'total': len(reviews)
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
@@ -2297,6 +2435,14 @@ def get_reviews_admin(current_user_id, current_user_role):
         elif status == 'approved':
             query = query.filter_by(is_approved=True)
         
+        # Paginación por cursor (clientes nuevos) u OFFSET con page/per_page (compatibilidad)
+        if wants_keyset():
+            keyset_page = keyset_paginate(query, Review.created_at, Review.id)
+            return jsonify({
+                'reviews': [review.serialize() for review in keyset_page.items],
+                **keyset_page.meta()
+            }), 200
+        
         reviews = query.order_by(Review.created_at.desc()).paginate(
             page=page, per_page=per_page, error_out=False
         )
@@ -2308,6 +2454,8 @@ def get_reviews_admin(current_user_id, current_user_role):
             'current_page': page
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
         return jsonify({'message': str(e)}), 400
 
@@ -2395,7 +2543,7 @@ def update_product_rating(product_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"Error actualizando rating: {e}")
+        logger.error("Error actualizando rating: %s", e)
 
 # Endpoint para crear múltiples reseñas desde una orden
 @api.route('/orders/<order_id>/reviews', methods=['POST'])
@@ -2403,18 +2551,15 @@ def update_product_rating(product_id):
 def create_order_reviews(current_user_id, current_user_role, order_id):
     """Crear múltiples reseñas para los productos de una orden (usuario autenticado)"""
     try:
-        print(f"🔧 CREATE_ORDER_REVIEWS DEBUG:")
-        print(f"   - Order ID: {order_id}")
-        print(f"   - Current User ID: {current_user_id}")
+        logger.debug("🔧 CREATE_ORDER_REVIEWS DEBUG: Order ID: %s; Current User ID: %s", order_id, current_user_id)
         
         # Verificar que la orden existe
         order = Order.query.get(order_id)
         if not order:
-            print("❌ Order not found")
+            logger.warning("❌ Order not found")
             return jsonify({'success': False, 'error': 'Orden no encontrada'}), 404
         
-        print(f"   - Order User ID: {order.user_id}")
-        print(f"   - Order Status: {order.status}")
+        logger.debug("🔧 Order User ID: %s; Order Status: %s", order.user_id, order.status)
         
         # ✅ CORRECCIÓN: Algunas órdenes pueden no tener user_id (guest checkout)
         # Permitir si la orden pertenece al usuario O si el email coincide
@@ -2422,12 +2567,12 @@ def create_order_reviews(current_user_id, current_user_role, order_id):
         if user and order.user_id != current_user_id:
             # Verificar por email como fallback
             if order.customer_email != user.email:
-                print(f"❌ Unauthorized: Order email {order.customer_email} != User email {user.email}")
+                logger.warning("❌ Unauthorized: Order email %s != User email %s", order.customer_email, user.email)
                 return jsonify({'success': False, 'error': 'No autorizado para esta orden'}), 403
         
         # Verificar que la orden está entregada
         if order.status.value != 'delivered':
-            print(f"❌ Order not delivered: {order.status}")
+            logger.warning("❌ Order not delivered: %s", order.status)
             return jsonify({'success': False, 'error': 'Solo puedes calificar órdenes entregadas'}), 400
         
         data = request.get_json()
@@ -2468,7 +2613,7 @@ def create_order_reviews(current_user_id, current_user_role, order_id):
         for review in created_reviews:
             update_product_rating(review.product_id)
         
-        print(f"✅ Reviews created: {len(created_reviews)}")
+        logger.info("✅ Reviews created: %s", len(created_reviews))
         return jsonify({
             'success': True,
             'message': f'{len(created_reviews)} reseñas creadas correctamente',
@@ -2477,7 +2622,7 @@ def create_order_reviews(current_user_id, current_user_role, order_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creando reseñas de orden: {str(e)}")
+        logger.error("❌ Error creando reseñas de orden: %s", e)
         return jsonify({'success': False, 'error': str(e)}), 500
 
 # =============================================================================
@@ -2527,33 +2672,18 @@ def get_profit_analytics(current_user_id=None, current_user_role=None):
         else:  # all
             start_date_current = datetime(2020, 1, 1)  # Fecha muy antigua
         
-        # Query para periodo actual
-        query_current = Order.query.filter(
-            Order.status.in_(['DELIVERED', 'CONFIRMED']),
-            Order.created_at >= start_date_current,
-            Order.created_at <= end_date_current
-        )
-        
-        completed_orders_current = query_current.all()
+        # Métricas periodo actual - CON FILTRO POR ROL (consultas agregadas)
+        metrics_current = analytics_service.calculate_metrics(start_date_current, end_date_current, current_user_role)
         
-        # Datos del periodo anterior (para comparación)
-        completed_orders_previous = []
+        # Métricas periodo anterior (para comparación) - CON FILTRO POR ROL
+        metrics_previous = None
         if compare and start_date_previous:
-            query_previous = Order.query.filter(
-                Order.status.in_(['DELIVERED', 'CONFIRMED']),
-                Order.created_at >= start_date_previous,
-                Order.created_at <= end_date_previous
-            )
-            completed_orders_previous = query_previous.all()
-        
-        # Calcular métricas periodo actual - CON FILTRO POR ROL
-        metrics_current = calculate_metrics(completed_orders_current, current_user_role)
-        
-        # Calcular métricas periodo anterior - CON FILTRO POR ROL
-        metrics_previous = calculate_metrics(completed_orders_previous, current_user_role) if compare and completed_orders_previous else None
+            metrics_previous = analytics_service.calculate_metrics(start_date_previous, end_date_previous, current_user_role)
+            if not metrics_previous['total_orders']:
+                metrics_previous = None
         
         # Datos para gráfico de tendencias (últimas 12 semanas) - CON FILTRO POR ROL
-        weekly_trends = get_weekly_trends(current_user_role)
+        weekly_trends = analytics_service.get_weekly_trends(current_user_role)
         
         return jsonify({
             'success': True,
@@ -2568,152 +2698,36 @@ def get_profit_analytics(current_user_id=None, current_user_role=None):
     except Exception as e:
         return jsonify({'success': False, 'error': str(e)}), 500
 
-def calculate_metrics(orders, user_role=None):
-    """Calcular métricas para un conjunto de órdenes - FILTRADO POR ROL"""
-    total_revenue = 0
-    total_cost = 0
-    product_profits = {}
-    
-    for order in orders:
-        total_revenue += order.total if order.total else 0
-        
-        # Solo calcular costos si es SuperAdmin
-        if user_role and user_role.lower() == 'superadmin':
-            for item in order.items:
-                product = Product.query.get(item.product_id)
-                if product and product.costo_prenda:
-                    item_cost = product.costo_prenda * item.quantity
-                    item_revenue = item.price * item.quantity
-                    
-                    total_cost += item_cost
-                    
-                    if product.id not in product_profits:
-                        product_profits[product.id] = {
-                            'name': product.name,
-                            'total_revenue': 0,
-                            'total_cost': 0,
-                            'total_quantity': 0
-                        }
-                    
-                    product_profits[product.id]['total_revenue'] += item_revenue
-                    product_profits[product.id]['total_cost'] += item_cost
-                    product_profits[product.id]['total_quantity'] += item.quantity
-        else:
-            # Para roles no-SuperAdmin, solo contar cantidades
-            for item in order.items:
-                product = Product.query.get(item.product_id)
-                if product:
-                    if product.id not in product_profits:
-                        product_profits[product.id] = {
-                            'name': product.name,
-                            'total_revenue': 0,
-                            'total_cost': 0,
-                            'total_quantity': 0
-                        }
-                    
-                    product_profits[product.id]['total_revenue'] += item.price * item.quantity
-                    product_profits[product.id]['total_quantity'] += item.quantity
-
-    # Calcular márgenes SOLO para SuperAdmin
-    if user_role and user_role.lower() == 'superadmin':
-        gross_profit = total_revenue - total_cost
-        profit_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
-
-        for product_id, data in product_profits.items():
-            product_profit = data['total_revenue'] - data['total_cost']
-            data['total_profit'] = product_profit
-            data['margin'] = (product_profit / data['total_revenue'] * 100) if data['total_revenue'] > 0 else 0
-    else:
-        # Para roles no-SuperAdmin, ocultar datos financieros sensibles
-        gross_profit = 0
-        profit_margin = 0
-        total_cost = 0
-        
-        for product_id, data in product_profits.items():
-            data['total_profit'] = 0  # Ocultar ganancias
-            data['margin'] = 0  # Ocultar márgenes
-
-    top_products = sorted(
-        product_profits.values(),
-        key=lambda x: x['total_quantity'],  # Ordenar por cantidad vendida en lugar de ganancias
-        reverse=True
-    )[:10]
-
-    return {
-        'total_revenue': total_revenue if user_role and user_role.lower() == 'superadmin' else 0,
-        'total_cost': total_cost if user_role and user_role.lower() == 'superadmin' else 0,
-        'gross_profit': gross_profit if user_role and user_role.lower() == 'superadmin' else 0,
-        'profit_margin': round(profit_margin, 2) if user_role and user_role.lower() == 'superadmin' else 0,
-        'total_orders': len(orders),
-        'avg_order_value': total_revenue / len(orders) if orders else 0,
-        'top_products': top_products,
-        'total_products_sold': sum(item['total_quantity'] for item in product_profits.values())
-    }
-
-def get_weekly_trends(user_role=None):
-    """Obtener tendencias semanales de los últimos 3 meses - FILTRADO POR ROL"""
-    from datetime import datetime, timedelta
-    
-    weekly_data = []
-    end_date = datetime.now()
-    
-    # Últimos 3 meses INCLUYENDO la semana actual
-    start_date = end_date - timedelta(days=84)  # 12 semanas = 3 meses
-
-    # Primera semana comience en lunes
-    days_since_monday = start_date.weekday()  # 0 = lunes, 6 = domingo
-    adjusted_start_date = start_date - timedelta(days=days_since_monday)
-    
-    current_date = adjusted_start_date
-    week_count = 0
-    
-    while current_date <= end_date and week_count < 13:  # 13 semanas para incluir completa
-        week_start = current_date
-        week_end = current_date + timedelta(days=6, hours=23, minutes=59, seconds=59)
+@api.route('/admin/analytics/trends', methods=['GET'])
+@admin_required
+def get_sales_trends(current_user_id=None, current_user_role=None):
+    """Serie de ventas por día/semana/mes en un rango arbitrario (zoom del dashboard)"""
+    try:
+        bucket = request.args.get('bucket', 'week')
         
-        week_orders = Order.query.filter(
-            Order.status.in_(['DELIVERED', 'CONFIRMED']),
-            Order.created_at.between(week_start, week_end)
-        ).all()
+        from datetime import timedelta
         
-        week_revenue = sum(order.total for order in week_orders if order.total)
+        try:
+            end_date = datetime.fromisoformat(request.args['end']) if request.args.get('end') else datetime.now()
+            start_date = datetime.fromisoformat(request.args['start']) if request.args.get('start') else end_date - timedelta(days=84)
+        except ValueError:
+            return jsonify({'success': False, 'error': 'Formato de fecha inválido. Use YYYY-MM-DD'}), 400
         
-        # Solo calcular costos si es SuperAdmin
-        if user_role and user_role.lower() == 'superadmin':
-            week_cost = 0
-            for order in week_orders:
-                for item in order.items:
-                    product = Product.query.get(item.product_id)
-                    if product and product.costo_prenda:
-                        week_cost += product.costo_prenda * item.quantity
-            
-            week_profit = week_revenue - week_cost
-            week_margin = (week_profit / week_revenue * 100) if week_revenue > 0 else 0
-        else:
-            # Para roles no-SuperAdmin, ocultar datos financieros
-            week_cost = 0
-            week_profit = 0
-            week_margin = 0
-        
-        # Determinar si es la semana actual
-        is_current_week = end_date >= week_start and end_date <= week_end
-        
-        weekly_data.append({
-            'week': week_start.strftime('%d/%m'),
-            'revenue': week_revenue if user_role and user_role.lower() == 'superadmin' else 0,
-            'profit': week_profit if user_role and user_role.lower() == 'superadmin' else 0,
-            'margin': round(week_margin, 2) if user_role and user_role.lower() == 'superadmin' else 0,
-            'orders': len(week_orders),
-            'week_start': week_start.isoformat(),
-            'week_end': week_end.isoformat(),
-            'is_current_week': is_current_week,
-            'has_data': len(week_orders) > 0
-        })
+        try:
+            trends = analytics_service.get_sales_trends(start_date, end_date, bucket, current_user_role)
+        except ValueError as e:
+            return jsonify({'success': False, 'error': str(e)}), 400
         
-        current_date += timedelta(days=7)
-        week_count += 1
-    
-    return weekly_data
+        return jsonify({
+            'success': True,
+            'bucket': bucket,
+            'start': start_date.isoformat(),
+            'end': end_date.isoformat(),
+            'trends': trends
+        }), 200
+
+    except Exception as e:
+        return jsonify({'success': False, 'error': str(e)}), 500
 
 # =============================================================================
 # MERCADO PAGO PAYMENT ENDPOINTS
@@ -2724,7 +2738,7 @@ def create_mercadopago_payment():
     """Crear preferencia de pago en Mercado Pago"""
     try:
         data = request.get_json()
-        print("🎯 Datos recibidos para Mercado Pago:", data)
+        logger.debug("🎯 Datos recibidos para Mercado Pago: %s", data)
         
         # Validar datos requeridos
         if not data.get('amount') or not data.get('order_id') or not data.get('items'):
@@ -2742,7 +2756,7 @@ def create_mercadopago_payment():
             items=data['items']
         )
         
-        print("🔗 Resultado de Mercado Pago API:", result)
+        logger.debug("🔗 Resultado de Mercado Pago API: %s", result)
         
         if not result['success']:
             return jsonify({'error': result['error']}), 400
@@ -2755,7 +2769,7 @@ def create_mercadopago_payment():
         }), 200
         
     except Exception as e:
-        print("❌ Error en create-mercadopago-payment:", str(e))
+        logger.error("❌ Error en create-mercadopago-payment: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/verify-mercadopago-payment', methods=['POST'])
@@ -2784,7 +2798,7 @@ def verify_mercadopago_payment():
         if payment_data['status'] == 'approved':
             order = Order.query.get(order_id)
             if order:
-                order.status = OrderStatusEnum.CONFIRMED
+                order_service.change_status(order, OrderStatusEnum.CONFIRMED)
                 db.session.commit()
                 
                 return jsonify({
@@ -2811,145 +2825,59 @@ def verify_mercadopago_payment():
 def mercadopago_webhook():
     """
     Webhook para recibir notificaciones de Mercado Pago
-    Este endpoint será llamado automáticamente por MP cuando cambie el estado del pago
+    Este endpoint será llamado automáticamente por MP cuando cambie el estado del pago.
+    Solo valida y guarda la notificación en payment_webhook_jobs; la consulta del pago
+    y la actualización de la orden las hace `flask payments-worker`.
     """
     try:
         # Obtener datos del webhook
-        payload = request.get_json() if request.is_json else {}
+        payload = request.get_json(silent=True) or {}
         query_params = request.args.to_dict()
         
-        print("="*60)
-        print("🔔 WEBHOOK RECIBIDO DE MERCADO PAGO")
-        print(f"📦 Body: {payload}")
-        print(f"🔗 Query params: {query_params}")
-        print("="*60)
+        logger.info("🔔 WEBHOOK RECIBIDO DE MERCADO PAGO")
+        logger.debug("📦 Body: %s", payload)
+        logger.debug("🔗 Query params: %s", query_params)
+        
+        # Solo se aceptan notificaciones firmadas por Mercado Pago (x-signature)
+        if not payment_webhook_service.verify_signature(request.headers, query_params, payload):
+            logger.warning("⛔ Webhook con firma inválida desde %s", request.remote_addr)
+            return jsonify({'status': 'invalid_signature'}), 401
         
         # Obtener tipo de notificación
         notification_type = payload.get('type') or query_params.get('type')
         
         # Solo procesar notificaciones de pago
         if notification_type != 'payment':
-            print(f"ℹ️ Notificación ignorada, tipo: {notification_type}")
+            logger.debug("ℹ️ Notificación ignorada, tipo: %s", notification_type)
             return jsonify({'status': 'ignored'}), 200
         
         # Obtener payment_id (puede venir en diferentes formatos)
-        payment_id = None
-        if 'id' in query_params:
-            payment_id = query_params['id']
-            print(f"🎯 Payment ID desde query params (prueba MP): {payment_id}")
-        if 'data' in payload and 'id' in payload['data']:
-            payment_id = payload['data']['id']
-        elif 'id' in payload:
-            payment_id = payload['id']
-        elif 'data.id' in query_params:
-            payment_id = query_params['data.id']
-        
+        payment_id = payment_webhook_service.extract_payment_id(payload, query_params)
         if not payment_id:
-            print("⚠️ No se encontró payment_id")
+            logger.warning("⚠️ No se encontró payment_id")
             return jsonify({'status': 'no_payment_id'}), 200
         
-        print(f"💳 Payment ID: {payment_id}")
-        
-        # Obtener información del pago desde Mercado Pago
-        from .services.mercadopago_service import mercado_pago_service
-        result = mercado_pago_service.get_payment(payment_id)
-        
-        if not result.get('success'):
-            print(f"❌ Error obteniendo pago: {result.get('error')}")
-            return jsonify({'status': 'error'}), 200
-        
-        payment_data = result['payment']
-        
-        # Extraer información relevante
-        payment_status = payment_data.get('status')
-        status_detail = payment_data.get('status_detail')
-        order_id = payment_data.get('external_reference')
-        transaction_amount = payment_data.get('transaction_amount')
-        payment_method = payment_data.get('payment_method_id')
-        
-        print(f"📊 Estado: {payment_status}")
-        print(f"📊 Detalle: {status_detail}")
-        print(f"💰 Monto: {transaction_amount} {payment_data.get('currency_id')}")
-        print(f"🏦 Método: {payment_method}")
-        print(f"🔖 Order ID: {order_id}")
-        
-        if not order_id:
-            print("⚠️ No se encontró external_reference (order_id)")
-            return jsonify({'status': 'no_reference'}), 200
-        
-        # Buscar la orden
-        order = Order.query.filter_by(id=order_id).first()
+        # Cola acotada: si el worker no da abasto MP reintenta más tarde
+        if payment_webhook_service.backlog_full():
+            logger.error("❌ Cola de pagos llena, notificación de %s rechazada", payment_id)
+            return jsonify({'status': 'busy'}), 503
         
-        if not order:
-            print(f"⚠️ Orden {order_id} no encontrada")
-            return jsonify({'status': 'order_not_found'}), 200
-        
-        # Actualizar orden según el estado del pago
-        if payment_status == 'approved':
-            print("✅ PAGO APROBADO - Actualizando orden")
-            
-            # Actualizar orden
-            order.status = OrderStatusEnum.CONFIRMED
-            order.payment_id = str(payment_id)
-            order.payment_status = 'approved'
-            order.payment_method = payment_method
-            
-            # Guardar en BD
-            try:
-                db.session.commit()
-                print(f"✅ Orden {order_id} actualizada a CONFIRMED")
-                
-                # 📧 Enviar email de confirmación
-                try:
-                    from .services.email_service import send_order_confirmation_email
-                    email_sent = send_order_confirmation_email(order)
-                    if email_sent:
-                        print(f"📧 Email enviado a {order.customer_info.get('email')}")
-                    else:
-                        print(f"⚠️ Email no pudo ser enviado")
-                except ImportError:
-                    print("⚠️ Servicio de email no disponible")
-                except Exception as email_error:
-                    print(f"❌ Error enviando email: {email_error}")
-                
-            except Exception as db_error:
-                print(f"❌ Error guardando en BD: {db_error}")
-                db.session.rollback()
-                return jsonify({'status': 'db_error'}), 200
-                
-        elif payment_status == 'pending':
-            print("⏳ PAGO PENDIENTE")
-            order.payment_id = str(payment_id)
-            order.payment_status = 'pending'
-            db.session.commit()
-            
-        elif payment_status == 'rejected':
-            print("❌ PAGO RECHAZADO")
-            order.payment_id = str(payment_id)
-            order.payment_status = 'rejected'
-            order.status = OrderStatusEnum.CANCELLED
-            db.session.commit()
-            
-        elif payment_status == 'cancelled':
-            print("🚫 PAGO CANCELADO")
-            order.payment_id = str(payment_id)
-            order.payment_status = 'cancelled'
-            order.status = OrderStatusEnum.CANCELLED
-            db.session.commit()
-        
-        print(f"✅ Webhook procesado exitosamente")
-        print("="*60)
+        job, created = payment_webhook_service.enqueue(
+            payment_id,
+            notification_type=notification_type,
+            payload={'body': payload, 'query': query_params}
+        )
+        db.session.commit()
+        logger.info("💳 Pago %s en cola (job %s%s)", payment_id, job.id, '' if created else ', ya existía')
         
         # IMPORTANTE: Siempre responder 200 OK
-        return jsonify({'status': 'received'}), 200
+        return jsonify({'status': 'queued', 'job_id': job.id}), 200
         
     except Exception as e:
-        print(f"❌ Error crítico en webhook: {str(e)}")
-        import traceback
-        print(traceback.format_exc())
-        
-        # Aún así responder 200 para evitar reintentos infinitos
-        return jsonify({'status': 'error', 'message': str(e)}), 200
+        db.session.rollback()
+        logger.exception("❌ Error crítico en webhook: %s", e)
+        # Sin el job guardado, se pide a MP que reintente la notificación
+        return jsonify({'status': 'error', 'message': str(e)}), 500
 
 
 # =============================================================================
@@ -2984,7 +2912,7 @@ def get_order_status(order_id):
         }), 200
         
     except Exception as e:
-        print(f"❌ Error obteniendo estado de orden: {e}")
+        logger.error("❌ Error obteniendo estado de orden: %s", e)
         return jsonify({'error': str(e)}), 500
 
 
@@ -2993,13 +2921,13 @@ def get_order_status(order_id):
 @api.route('/', methods=['GET', 'POST'])
 def root():
     if request.method == 'POST':
-        print("✅ POST en raíz recibido!")
+        logger.info("✅ POST en raíz recibido!")
         return jsonify({"status": "accepted"}), 200
     return jsonify({"message": "API running"})
 @api.route('/', methods=['GET', 'POST'])
 def handle_root():
     if request.method == 'POST':
-        print("🎯 IPN RECIBIDO EN RAÍZ!")
+        logger.info("🎯 IPN RECIBIDO EN RAÍZ!")
         return jsonify({"status": "accepted"}), 200
     else:
         return jsonify({"message": "Peregrinos Shop API running"})
@@ -3007,15 +2935,16 @@ def handle_root():
 # Después de todas las rutas, agrega:
 @api.after_request
 def log_routes(response):
+    # DEBUG muestreado por request (ver api/logging_setup.py): en producción no cuesta nada
     if request.endpoint:
-        print(f"📍 Ruta accedida: {request.endpoint} - Método: {request.method}")
+        logger.debug("📍 Ruta accedida: %s - Método: %s - %s", request.endpoint, request.method, response.status_code)
     else:
-        print(f"❌ Ruta NO encontrada: {request.path} - Método: {request.method}")
+        logger.debug("❌ Ruta NO encontrada: %s - Método: %s", request.path, request.method)
     return response
 
 @api.route('/ipn-test', methods=['POST'])
 def ipn_test():
-    print("🎯 IPN Test recibido")
+    logger.info("🎯 IPN Test recibido")
     return jsonify({"status": "accepted"}), 200
     
 
@@ -3039,8 +2968,7 @@ def google_auth():
         if not token:
             return jsonify({'error': 'Token is required'}), 400
         
-        print("🎯 Iniciando autenticación con Google...")
-        print(f"📦 Token recibido (primeros 50 chars): {token[:50]}...")
+        logger.debug("🎯 Iniciando autenticación con Google...")
         
         # Verificar token con Google
         google_service = GoogleAuthService()
@@ -3060,8 +2988,8 @@ def google_auth():
         if not jwt_token:
             return jsonify({'error': 'Error generating token'}), 500
         
-        print(f"✅ Autenticación exitosa para: {user.email}")
-        print(f"🔐 Token JWT generado con nuevo sistema para user_id: {user.id}")
+        logger.info("✅ Autenticación exitosa para: %s", user.email)
+        logger.debug("🔐 Token JWT generado con nuevo sistema para user_id: %s", user.id)
         
         # ✅ NUEVO: Determinar si necesita aceptar términos
         needs_terms_acceptance = is_new_user or not (user.terms_accepted and user.privacy_policy_accepted)
@@ -3075,9 +3003,7 @@ def google_auth():
         }), 200
         
     except Exception as e:
-        print(f"❌ Error en google auth: {str(e)}")
-        import traceback
-        traceback.print_exc()
+        logger.exception("❌ Error en google auth: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/auth/user/me', methods=['GET'])
@@ -3086,16 +3012,16 @@ def get_current_user(current_user_id, current_user_role):
     """Obtener información del usuario normal actual"""
     try:
         # ✅ El decorador token_required ya verificó el token y nos pasa los parámetros
-        print(f"🔍 Buscando usuario con ID: {current_user_id}")
+        logger.debug("🔍 Buscando usuario con ID: %s", current_user_id)
         
         # Buscar usuario en la base de datos
         user = User.query.get(current_user_id)
         
         if not user:
-            print(f"❌ Usuario no encontrado: {current_user_id}")
+            logger.warning("❌ Usuario no encontrado: %s", current_user_id)
             return jsonify({'error': 'User not found'}), 404
         
-        print(f"✅ Usuario encontrado: {user.email}")
+        logger.debug("✅ Usuario encontrado: %s", user.email)
         
         return jsonify({
             'success': True,
@@ -3103,7 +3029,7 @@ def get_current_user(current_user_id, current_user_role):
         }), 200
             
     except Exception as e:
-        print(f"❌ Error obteniendo usuario actual: {str(e)}")
+        logger.error("❌ Error obteniendo usuario actual: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/auth/user/logout', methods=['POST'])
@@ -3162,7 +3088,7 @@ def accept_legal_terms():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error accepting terms: {str(e)}")
+        logger.error("❌ Error accepting terms: %s", e)
         return jsonify({'error': str(e)}), 400
 
 @api.route('/auth/check-legal-terms/<user_id>', methods=['GET'])
@@ -3182,7 +3108,7 @@ def check_legal_terms_status(user_id):
         }), 200
         
     except Exception as e:
-        print(f"❌ Error checking terms: {str(e)}")
+        logger.error("❌ Error checking terms: %s", e)
         return jsonify({'error': str(e)}), 400
     
 
@@ -3191,10 +3117,21 @@ def check_legal_terms_status(user_id):
 # =============================================================================
 
 @api.route('/saints', methods=['GET'])
+@conditional_get(Saint)
 def get_saints():
     """Obtener todos los santos activos (público)"""
     try:
-        saints = Saint.query.filter_by(is_active=True).all()
+        query = Saint.query.filter_by(is_active=True)
+        
+        if wants_keyset():
+            page = keyset_paginate(query, Saint.name, Saint.id, descending=False)
+            return jsonify({
+                'success': True,
+                'saints': [saint.serialize_short() for saint in page.items],
+                **page.meta()
+            }), 200
+        
+        saints = query.all()
         
         return jsonify({
             'success': True,
@@ -3202,11 +3139,14 @@ def get_saints():
             'count': len(saints)
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
-        print(f"❌ Error obteniendo santos: {e}")
+        logger.error("❌ Error obteniendo santos: %s", e)
         return jsonify({'error': 'Error al obtener la lista'}), 500
 
 @api.route('/saints/featured', methods=['GET'])
+@conditional_get(Saint)
 def get_featured_saints():
     """Obtener santos destacados (público)"""
     try:
@@ -3219,10 +3159,11 @@ def get_featured_saints():
         }), 200
         
     except Exception as e:
-        print(f"❌ Error obteniendo santos destacados: {e}")
+        logger.error("❌ Error obteniendo santos destacados: %s", e)
         return jsonify({'error': 'Error al obtener santos destacados'}), 500
 
 @api.route('/saints/<saint_id>', methods=['GET'])
+@conditional_get(Saint)
 def get_saint(saint_id):
     """Obtener un santo específico por ID (público)"""
     try:
@@ -3237,7 +3178,7 @@ def get_saint(saint_id):
         }), 200
         
     except Exception as e:
-        print(f"❌ Error obteniendo santo: {e}")
+        logger.error("❌ Error obteniendo santo: %s", e)
         return jsonify({'error': 'Error al obtener el santo'}), 500
 
 @api.route('/saints', methods=['POST'])
@@ -3272,7 +3213,7 @@ def create_saint():
         db.session.add(new_saint)
         db.session.commit()
         
-        print(f"✅ Santo creado: {new_saint.name}")
+        logger.info("✅ Santo creado: %s", new_saint.name)
         
         return jsonify({
             'success': True,
@@ -3282,7 +3223,7 @@ def create_saint():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error creando santo: {e}")
+        logger.error("❌ Error creando santo: %s", e)
         return jsonify({'error': 'Error al crear el santo'}), 500
 
 @api.route('/saints/<saint_id>', methods=['PUT'])
@@ -3310,7 +3251,7 @@ def update_saint(saint_id):
         
         db.session.commit()
         
-        print(f"✅ Santo actualizado: {saint.name}")
+        logger.info("✅ Santo actualizado: %s", saint.name)
         
         return jsonify({
             'success': True,
@@ -3320,7 +3261,7 @@ def update_saint(saint_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error actualizando santo: {e}")
+        logger.error("❌ Error actualizando santo: %s", e)
         return jsonify({'error': 'Error al actualizar el santo'}), 500
 
 @api.route('/saints/<saint_id>', methods=['DELETE'])
@@ -3340,7 +3281,7 @@ def delete_saint(saint_id):
         saint.is_active = False
         db.session.commit()
         
-        print(f"✅ Santo eliminado: {saint.name}")
+        logger.info("✅ Santo eliminado: %s", saint.name)
         
         return jsonify({
             'success': True,
@@ -3349,7 +3290,7 @@ def delete_saint(saint_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error eliminando santo: {e}")
+        logger.error("❌ Error eliminando santo: %s", e)
         return jsonify({'error': 'Error al eliminar el santo'}), 500
     
 # =============================================================================
@@ -3377,7 +3318,7 @@ def create_contact_message():
         db.session.add(new_message)
         db.session.commit()
         
-        print(f"✅ Mensaje de contacto recibido: {new_message.name} - {new_message.message_type}")
+        logger.info("✅ Mensaje de contacto recibido: %s - %s", new_message.name, new_message.message_type)
         
         return jsonify({
             'success': True,
@@ -3387,7 +3328,7 @@ def create_contact_message():
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error recibiendo mensaje de contacto: {e}")
+        logger.error("❌ Error recibiendo mensaje de contacto: %s", e)
         return jsonify({'error': 'Error al enviar el mensaje'}), 500
     
 # =============================================================================
@@ -3403,6 +3344,14 @@ def get_contact_messages():
         # if not current_user.get('is_admin'):
         #     return jsonify({'error': 'Acceso no autorizado'}), 403
 
+        if wants_keyset():
+            page = keyset_paginate(ContactMessage.query, ContactMessage.created_at, ContactMessage.id)
+            return jsonify({
+                'success': True,
+                'messages': [message.serialize() for message in page.items],
+                **page.meta()
+            }), 200
+        
         messages = ContactMessage.query.order_by(ContactMessage.created_at.desc()).all()
         
         return jsonify({
@@ -3411,8 +3360,10 @@ def get_contact_messages():
             'count': len(messages)
         }), 200
         
+    except InvalidCursorError:
+        raise
     except Exception as e:
-        print(f"❌ Error obteniendo mensajes: {e}")
+        logger.error("❌ Error obteniendo mensajes: %s", e)
         return jsonify({'error': 'Error al obtener los mensajes'}), 500
 
 @api.route('/contact-messages/<message_id>', methods=['PUT'])
@@ -3438,7 +3389,7 @@ def update_contact_message(message_id):
         
         db.session.commit()
         
-        print(f"✅ Mensaje actualizado: {message.id} - {message.status}")
+        logger.info("✅ Mensaje actualizado: %s - %s", message.id, message.status)
         
         return jsonify({
             'success': True,
@@ -3448,5 +3399,5 @@ def update_contact_message(message_id):
         
     except Exception as e:
         db.session.rollback()
-        print(f"❌ Error actualizando mensaje: {e}")
+        logger.error("❌ Error actualizando mensaje: %s", e)
         return jsonify({'error': 'Error al actualizar el mensaje'}), 500
\ No newline at end of file
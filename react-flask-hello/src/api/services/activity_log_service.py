@@ -0,0 +1,326 @@
+import atexit
+import gzip
+import json
+import logging
+import os
+import queue
+import threading
+import time
+from datetime import datetime, date, timedelta
+from sqlalchemy import insert, delete
+from sqlalchemy.orm import selectinload
+from api.models import db, UserActivityLog, generate_uuid
+
+logger = logging.getLogger(__name__)
+
+# Registros en memoria esperando escritura; si se llena se descartan (y se cuentan)
+ACTIVITY_LOG_QUEUE_SIZE = int(os.getenv('ACTIVITY_LOG_QUEUE_SIZE', '10000'))
+
+# Se escribe al juntar N registros o cada T milisegundos, lo que ocurra primero
+ACTIVITY_LOG_BATCH_SIZE = int(os.getenv('ACTIVITY_LOG_BATCH_SIZE', '200'))
+ACTIVITY_LOG_FLUSH_MS = int(os.getenv('ACTIVITY_LOG_FLUSH_MS', '500'))
+
+# Días que se conservan en la tabla (flask activity-logs-purge)
+ACTIVITY_LOG_RETENTION_DAYS = int(os.getenv('ACTIVITY_LOG_RETENTION_DAYS', '180'))
+
+
+class ActivityLogWriter:
+    """Escritura diferida del log de actividad de los admins.
+    log() solo arma la fila y la pone en una cola acotada; un hilo la inserta por
+    lotes (INSERT de varias filas) con su propia conexión, así el request no paga un
+    commit extra ni se confirma a medias la transacción de quien registra la actividad.
+    El hilo se inicia con el primer registro (también en cada worker tras un fork)
+    y al terminar el proceso se vacía la cola."""
+
+    def __init__(self, queue_size=ACTIVITY_LOG_QUEUE_SIZE, batch_size=ACTIVITY_LOG_BATCH_SIZE,
+                 flush_ms=ACTIVITY_LOG_FLUSH_MS):
+        self.app = None
+        self.batch_size = batch_size
+        self.flush_interval = flush_ms / 1000.0
+        self._queue = queue.Queue(maxsize=queue_size)
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread = None
+        self._pid = None
+        self.written = 0
+        self.dropped = 0
+        self.failed = 0
+        self.batches = 0
+
+    def init_app(self, app):
+        self.app = app
+        atexit.register(self.shutdown)
+
+    # =========================================================================
+    # PRODUCTOR (hilo del request)
+    # =========================================================================
+
+    def log(self, admin_user_id, action, description, request=None):
+        """Encola un registro; nunca bloquea ni lanza excepciones al llamador"""
+        row = {
+            'id': generate_uuid(),
+            'admin_user_id': admin_user_id,
+            'action': action,
+            'description': description,
+            # Los datos del request se copian aquí: el objeto no se puede usar desde otro hilo
+            'ip_address': request.remote_addr if request else None,
+            'user_agent': request.headers.get('User-Agent') if request else None,
+            'created_at': datetime.utcnow()
+        }
+        try:
+            self._ensure_thread()
+            self._queue.put_nowait(row)
+        except queue.Full:
+            with self._lock:
+                self.dropped += 1
+            logger.warning("⚠️ Cola del log de actividad llena, registro descartado: %s", action)
+        except Exception as e:
+            logger.error("Error logging activity: %s", e)
+
+    def _ensure_thread(self):
+        pid = os.getpid()
+        if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+            return
+        with self._lock:
+            if self._thread is not None and self._thread.is_alive() and self._pid == pid:
+                return
+            if self.app is None:
+                raise RuntimeError('ActivityLogWriter.init_app() no fue llamado')
+            self._stop.clear()
+            self._pid = pid
+            self._thread = threading.Thread(target=self._run, name='activity-log-writer', daemon=True)
+            self._thread.start()
+
+    # =========================================================================
+    # ESCRITOR (hilo de fondo)
+    # =========================================================================
+
+    def _next_batch(self):
+        """Espera el primer registro y junta hasta batch_size o hasta que venza el intervalo"""
+        try:
+            batch = [self._queue.get(timeout=self.flush_interval)]
+        except queue.Empty:
+            return []
+
+        deadline = time.monotonic() + self.flush_interval
+        while len(batch) < self.batch_size:
+            remaining = deadline - time.monotonic()
+            if remaining <= 0:
+                break
+            try:
+                batch.append(self._queue.get(timeout=remaining))
+            except queue.Empty:
+                break
+        return batch
+
+    def _insert(self, rows):
+        with self.app.app_context():
+            # Conexión propia (no la sesión del request); executemany -> INSERT multi-fila
+            with db.engine.begin() as connection:
+                connection.execute(insert(UserActivityLog.__table__), rows)
+
+    def _write(self, batch):
+        try:
+            self._insert(batch)
+            with self._lock:
+                self.written += len(batch)
+                self.batches += 1
+        except Exception as e:
+            # Una fila inválida (o un corte breve) no debe perder el lote entero:
+            # se reintenta fila por fila y solo se cuentan las que vuelven a fallar
+            logger.warning("⚠️ Falló el lote de %s registros de actividad, reintentando uno por uno: %s",
+                           len(batch), e)
+            self._write_rows(batch)
+        finally:
+            for _ in batch:
+                self._queue.task_done()
+
+    def _write_rows(self, rows):
+        written = failed = 0
+        for row in rows:
+            try:
+                self._insert([row])
+                written += 1
+            except Exception as e:
+                failed += 1
+                logger.error("❌ Error escribiendo registro de actividad %s (%s): %s",
+                             row['id'], row['action'], e)
+        with self._lock:
+            self.written += written
+            self.failed += failed
+
+    def _run(self):
+        while not self._stop.is_set():
+            batch = self._next_batch()
+            if batch:
+                self._write(batch)
+        # Lo que quede en la cola al detenerse
+        self._drain()
+
+    def _drain(self):
+        while True:
+            batch = []
+            while len(batch) < self.batch_size:
+                try:
+                    batch.append(self._queue.get_nowait())
+                except queue.Empty:
+                    break
+            if not batch:
+                return
+            self._write(batch)
+
+    # =========================================================================
+    # CONTROL
+    # =========================================================================
+
+    def flush(self, timeout=5.0):
+        """Espera a que se escriba lo encolado hasta ahora; True si terminó a tiempo"""
+        deadline = time.monotonic() + timeout
+        while self._queue.unfinished_tasks:
+            if self._thread is None or not self._thread.is_alive() or self._pid != os.getpid():
+                # Sin hilo escritor (p. ej. tras un fork): se escribe aquí
+                self._drain()
+                break
+            if time.monotonic() >= deadline:
+                return False
+            time.sleep(0.01)
+        return True
+
+    def shutdown(self, timeout=5.0):
+        """Detiene el hilo escribiendo lo pendiente (registrado con atexit)"""
+        self._stop.set()
+        if self._thread is not None and self._thread.is_alive() and self._pid == os.getpid():
+            self._thread.join(timeout)
+        else:
+            self._drain()
+
+    def stats(self):
+        with self._lock:
+            return {
+                'backlog': self._queue.qsize(),
+                'written': self.written,
+                'batches': self.batches,
+                'dropped': self.dropped,
+                'failed': self.failed
+            }
+
+
+class ActivityLogService:
+    """Consulta y retención del log de actividad"""
+
+    # =========================================================================
+    # FILTROS
+    # =========================================================================
+
+    def _list_arg(self, args, name):
+        """Acepta ?action=a&action=b y ?action=a,b"""
+        values = []
+        for raw in args.getlist(name):
+            values.extend(value.strip() for value in raw.split(',') if value.strip())
+        return values
+
+    def _parse_datetime(self, value, name, end_of_day=False):
+        """ISO 8601; una fecha sola en date_to incluye todo ese día"""
+        if value in (None, ''):
+            return None
+        try:
+            if len(value) == 10:
+                day = date.fromisoformat(value)
+                return datetime.combine(day + timedelta(days=1) if end_of_day else day, datetime.min.time())
+            return datetime.fromisoformat(value.replace('Z', '+00:00')).replace(tzinfo=None)
+        except ValueError:
+            raise ValueError(f'{name} must be an ISO date (YYYY-MM-DD) or datetime')
+
+    def parse_filters(self, args):
+        """Lee los filtros de la query string; lanza ValueError si una fecha no es válida"""
+        return {
+            'action': self._list_arg(args, 'action'),
+            'admin_user_id': self._list_arg(args, 'admin_user_id'),
+            'date_from': self._parse_datetime(args.get('date_from'), 'date_from'),
+            'date_to': self._parse_datetime(args.get('date_to'), 'date_to', end_of_day=True),
+        }
+
+    def query(self, filters):
+        """Logs filtrados. El admin de cada log se carga con un solo SELECT ... IN por
+        página (selectinload) en lugar de una consulta por fila desde serialize()"""
+        query = UserActivityLog.query.options(selectinload(UserActivityLog.admin_user))
+        if filters['action']:
+            query = query.filter(UserActivityLog.action.in_(filters['action']))
+        if filters['admin_user_id']:
+            query = query.filter(UserActivityLog.admin_user_id.in_(filters['admin_user_id']))
+        if filters['date_from'] is not None:
+            query = query.filter(UserActivityLog.created_at >= filters['date_from'])
+        if filters['date_to'] is not None:
+            query = query.filter(UserActivityLog.created_at < filters['date_to'])
+        return query
+
+    # =========================================================================
+    # RETENCIÓN
+    # =========================================================================
+
+    def _archive_row(self, log):
+        return {
+            'id': log.id,
+            'admin_user_id': log.admin_user_id,
+            'action': log.action,
+            'description': log.description,
+            'ip_address': log.ip_address,
+            'user_agent': log.user_agent,
+            'created_at': log.created_at.isoformat() if log.created_at else None
+        }
+
+    def purge(self, before, batch_size=5000, archive_path=None, dry_run=False, progress=None):
+        """Elimina (y opcionalmente archiva en JSON lines, .gz si la ruta lo indica) los
+        logs anteriores a `before`, por lotes con un commit cada uno para no bloquear la
+        tabla. Recorre el índice de created_at. Devuelve el número de logs eliminados."""
+        old_logs = UserActivityLog.query.filter(UserActivityLog.created_at < before)
+        if dry_run:
+            return old_logs.count()
+
+        archive = None
+        if archive_path:
+            opener = gzip.open if archive_path.endswith('.gz') else open
+            archive = opener(archive_path, 'at', encoding='utf-8')
+
+        purged = 0
+        try:
+            while True:
+                batch = old_logs.order_by(UserActivityLog.created_at, UserActivityLog.id)\
+                    .limit(batch_size)\
+                    .all()
+                if not batch:
+                    break
+
+                if archive:
+                    for log in batch:
+                        archive.write(json.dumps(self._archive_row(log), ensure_ascii=False) + '\n')
+                    archive.flush()
+
+                # Se leen antes del commit: después las instancias quedan separadas de la sesión
+                ids = [log.id for log in batch]
+                last_created_at = batch[-1].created_at
+
+                db.session.execute(
+                    delete(UserActivityLog).where(UserActivityLog.id.in_(ids)),
+                    execution_options={'synchronize_session': False}
+                )
+                db.session.commit()
+                db.session.expunge_all()
+
+                purged += len(ids)
+                if progress:
+                    progress(last_created_at, purged)
+        finally:
+            if archive:
+                archive.close()
+
+        return purged
+
+
+activity_log_writer = ActivityLogWriter()
+activity_log_service = ActivityLogService()
+
+
+def log_admin_activity(admin_user_id, action, description, request=None):
+    """Función helper para registrar actividad de admin (escritura diferida por lotes)"""
+    activity_log_writer.log(admin_user_id, action, description, request)
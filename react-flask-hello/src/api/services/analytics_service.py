@@ -0,0 +1,427 @@
+from datetime import datetime, date, timedelta
+from sqlalchemy import func, literal_column, insert, delete, update, or_, bindparam
+from api.models import db, Order, OrderItem, Product, SalesDailyRollup, COMPLETED_ORDER_STATUSES
+
+# Tamaños de bucket soportados por las series de tendencias
+TREND_BUCKETS = ('day', 'week', 'month')
+MAX_TREND_BUCKETS = 400
+TREND_LABEL_FORMATS = {'day': '%d/%m', 'week': '%d/%m', 'month': '%m/%Y'}
+
+
+def is_superadmin(user_role):
+    return bool(user_role) and user_role.lower() == 'superadmin'
+
+
+class AnalyticsService:
+    """Métricas de ventas calculadas con consultas agregadas en la base de datos.
+    Los datos por producto salen de sales_daily_rollup; el número de consultas es
+    constante sin importar cuántas órdenes haya en el periodo."""
+
+    def _completed_in_range(self, query, start_date, end_date):
+        return query.filter(
+            Order.status.in_(COMPLETED_ORDER_STATUSES),
+            Order.created_at >= start_date,
+            Order.created_at <= end_date
+        )
+
+    def get_order_totals(self, start_date, end_date):
+        """Cantidad de órdenes completadas y suma de sus totales (1 consulta)"""
+        query = db.session.query(
+            func.count(Order.id),
+            func.coalesce(func.sum(Order.total), 0.0)
+        )
+        total_orders, total_revenue = self._completed_in_range(query, start_date, end_date).one()
+        return int(total_orders or 0), float(total_revenue or 0)
+
+    def get_product_sales(self, start_date, end_date, user_role=None):
+        """Unidades, ingresos y costos agrupados por producto desde el rollup diario (1 consulta).
+        Para SuperAdmin solo se incluyen productos con costo_prenda, igual que antes."""
+        total_quantity = func.coalesce(func.sum(SalesDailyRollup.units), 0)
+
+        query = db.session.query(
+            Product.id,
+            Product.name,
+            total_quantity.label('total_quantity'),
+            func.coalesce(func.sum(SalesDailyRollup.revenue), 0.0).label('total_revenue'),
+            func.coalesce(func.sum(SalesDailyRollup.cost), 0.0).label('total_cost')
+        ).select_from(SalesDailyRollup)\
+         .join(Product, Product.id == SalesDailyRollup.product_id)\
+         .filter(
+             SalesDailyRollup.day >= self._as_date(start_date),
+             SalesDailyRollup.day <= self._as_date(end_date)
+         )
+
+        if is_superadmin(user_role):
+            query = query.filter(Product.costo_prenda.isnot(None), Product.costo_prenda != 0)
+
+        return query.group_by(Product.id, Product.name)\
+                    .having(total_quantity != 0)\
+                    .order_by(total_quantity.desc(), Product.id)\
+                    .all()
+
+    def calculate_metrics(self, start_date, end_date, user_role=None):
+        """Calcular métricas del periodo - FILTRADO POR ROL"""
+        superadmin = is_superadmin(user_role)
+
+        total_orders, total_revenue = self.get_order_totals(start_date, end_date)
+        rows = self.get_product_sales(start_date, end_date, user_role)
+
+        product_profits = []
+        total_cost = 0.0
+        for row in rows:
+            revenue = float(row.total_revenue or 0)
+            cost = float(row.total_cost or 0) if superadmin else 0
+            total_cost += cost
+
+            data = {
+                'name': row.name,
+                'total_revenue': revenue,
+                'total_cost': cost,
+                'total_quantity': int(row.total_quantity or 0)
+            }
+
+            # Márgenes SOLO para SuperAdmin
+            if superadmin:
+                data['total_profit'] = revenue - cost
+                data['margin'] = ((revenue - cost) / revenue * 100) if revenue > 0 else 0
+            else:
+                data['total_profit'] = 0
+                data['margin'] = 0
+
+            product_profits.append(data)
+
+        gross_profit = total_revenue - total_cost
+        profit_margin = (gross_profit / total_revenue * 100) if total_revenue > 0 else 0
+
+        return {
+            'total_revenue': total_revenue if superadmin else 0,
+            'total_cost': total_cost if superadmin else 0,
+            'gross_profit': gross_profit if superadmin else 0,
+            'profit_margin': round(profit_margin, 2) if superadmin else 0,
+            'total_orders': total_orders,
+            'avg_order_value': total_revenue / total_orders if total_orders else 0,
+            # Ya vienen ordenados por cantidad vendida desde la consulta
+            'top_products': product_profits[:10],
+            'total_products_sold': sum(item['total_quantity'] for item in product_profits)
+        }
+
+    # =========================================================================
+    # SERIES DE TENDENCIAS (una sola consulta agrupada por bucket)
+    # =========================================================================
+
+    def _bucket_expression(self, column, bucket):
+        """Expresión SQL que trunca la fecha al inicio del bucket (lunes para semanas)"""
+        if db.session.get_bind().dialect.name == 'postgresql':
+            # Literal (no bind param) para que SELECT y GROUP BY usen la misma expresión
+            return func.date_trunc(literal_column(f"'{bucket}'"), column)
+        if bucket == 'day':
+            return func.date(column)
+        if bucket == 'week':
+            return func.date(column, literal_column("'weekday 0'"), literal_column("'-6 days'"))
+        return func.strftime(literal_column("'%Y-%m-01'"), column)
+
+    def _bucket_start(self, value, bucket):
+        """Inicio (date) del bucket que contiene value"""
+        day = value.date() if isinstance(value, datetime) else value
+        if bucket == 'week':
+            return day - timedelta(days=day.weekday())
+        if bucket == 'month':
+            return day.replace(day=1)
+        return day
+
+    def _next_bucket(self, start, bucket):
+        if bucket == 'day':
+            return start + timedelta(days=1)
+        if bucket == 'week':
+            return start + timedelta(days=7)
+        return (start + timedelta(days=32)).replace(day=1)
+
+    def _as_date(self, value):
+        # Postgres devuelve datetime, SQLite devuelve 'YYYY-MM-DD'
+        if isinstance(value, datetime):
+            return value.date()
+        if isinstance(value, date):
+            return value
+        return date.fromisoformat(str(value)[:10])
+
+    def bucket_starts(self, start_date, end_date, bucket='week'):
+        """Lista de inicios de bucket entre start_date y end_date (inclusive)"""
+        current = self._bucket_start(start_date, bucket)
+        last = self._bucket_start(end_date, bucket)
+        starts = []
+        while current <= last:
+            starts.append(current)
+            current = self._next_bucket(current, bucket)
+        return starts
+
+    def get_sales_trends(self, start_date, end_date, bucket='week', user_role=None):
+        """Serie de ingresos/costos/utilidad/órdenes por bucket (day/week/month).
+        Una consulta GROUP BY sobre orders (y otra sobre el rollup para costos);
+        los buckets sin ventas se completan en Python."""
+        if bucket not in TREND_BUCKETS:
+            raise ValueError(f'Invalid bucket: {bucket}. Must be one of: {list(TREND_BUCKETS)}')
+
+        if start_date > end_date:
+            raise ValueError('start must be before end')
+
+        superadmin = is_superadmin(user_role)
+        starts = self.bucket_starts(start_date, end_date, bucket)
+        if len(starts) > MAX_TREND_BUCKETS:
+            raise ValueError(f'Range too large: {len(starts)} buckets (max {MAX_TREND_BUCKETS})')
+
+        range_start = datetime.combine(starts[0], datetime.min.time())
+        range_end = datetime.combine(self._next_bucket(starts[-1], bucket), datetime.min.time())
+
+        completed_in_range = (
+            Order.status.in_(COMPLETED_ORDER_STATUSES),
+            Order.created_at >= range_start,
+            Order.created_at < range_end
+        )
+
+        bucket_column = self._bucket_expression(Order.created_at, bucket).label('bucket')
+        columns = [
+            bucket_column,
+            func.count(Order.id).label('orders'),
+            func.coalesce(func.sum(Order.total), 0.0).label('revenue')
+        ]
+
+        rows = db.session.query(*columns)\
+                         .filter(*completed_in_range)\
+                         .group_by(bucket_column)\
+                         .all()
+        by_bucket = {self._as_date(row.bucket): row for row in rows}
+
+        # Solo SuperAdmin ve costos: salen del rollup diario con el mismo bucket
+        costs = {}
+        if superadmin:
+            cost_bucket = self._bucket_expression(SalesDailyRollup.day, bucket).label('bucket')
+            cost_rows = db.session.query(
+                cost_bucket,
+                func.coalesce(func.sum(SalesDailyRollup.cost), 0.0).label('cost')
+            ).filter(
+                SalesDailyRollup.day >= starts[0],
+                SalesDailyRollup.day < self._next_bucket(starts[-1], bucket)
+            ).group_by(cost_bucket).all()
+            costs = {self._as_date(row.bucket): float(row.cost or 0) for row in cost_rows}
+
+        today = self._bucket_start(datetime.now(), bucket)
+        series = []
+        for start in starts:
+            row = by_bucket.get(start)
+            orders = int(row.orders) if row else 0
+            revenue = float(row.revenue or 0) if row else 0.0
+            cost = costs.get(start, 0.0)
+            profit = revenue - cost
+            margin = (profit / revenue * 100) if revenue > 0 else 0
+
+            bucket_start = datetime.combine(start, datetime.min.time())
+            bucket_end = datetime.combine(self._next_bucket(start, bucket), datetime.min.time()) - timedelta(seconds=1)
+
+            series.append({
+                'label': start.strftime(TREND_LABEL_FORMATS[bucket]),
+                'bucket_start': bucket_start.isoformat(),
+                'bucket_end': bucket_end.isoformat(),
+                # Para roles no-SuperAdmin, ocultar datos financieros
+                'revenue': revenue if superadmin else 0,
+                'cost': cost if superadmin else 0,
+                'profit': profit if superadmin else 0,
+                'margin': round(margin, 2) if superadmin else 0,
+                'orders': orders,
+                'is_current': start == today,
+                'has_data': orders > 0
+            })
+
+        return series
+
+    def get_weekly_trends(self, user_role=None, weeks=12):
+        """Tendencias semanales de los últimos 3 meses (incluye la semana actual) - FILTRADO POR ROL"""
+        end_date = datetime.now()
+        start_date = end_date - timedelta(days=weeks * 7)
+
+        weekly_data = []
+        for point in self.get_sales_trends(start_date, end_date, 'week', user_role)[:weeks + 1]:
+            weekly_data.append({
+                'week': point['label'],
+                'revenue': point['revenue'],
+                'cost': point['cost'],
+                'profit': point['profit'],
+                'margin': point['margin'],
+                'orders': point['orders'],
+                'week_start': point['bucket_start'],
+                'week_end': point['bucket_end'],
+                'is_current_week': point['is_current'],
+                'has_data': point['has_data']
+            })
+
+        return weekly_data
+
+    # =========================================================================
+    # ROLLUP DIARIO DE VENTAS (sales_daily_rollup)
+    # =========================================================================
+
+    def _upsert_rollup(self, rows):
+        """INSERT ... ON CONFLICT (day, product_id) DO UPDATE sumando los deltas"""
+        if db.session.get_bind().dialect.name == 'postgresql':
+            from sqlalchemy.dialects.postgresql import insert as dialect_insert
+        else:
+            from sqlalchemy.dialects.sqlite import insert as dialect_insert
+
+        stmt = dialect_insert(SalesDailyRollup).values(rows)
+        stmt = stmt.on_conflict_do_update(
+            index_elements=['day', 'product_id'],
+            set_={
+                'revenue': SalesDailyRollup.revenue + stmt.excluded.revenue,
+                'cost': SalesDailyRollup.cost + stmt.excluded.cost,
+                'units': SalesDailyRollup.units + stmt.excluded.units
+            }
+        )
+        db.session.execute(stmt)
+
+    def apply_order_sales(self, order, sign):
+        """Suma (sign=1) o resta (sign=-1) las líneas de la orden en el rollup diario
+        y en products.units_sold. Se llama cuando la orden entra o sale de
+        CONFIRMED/DELIVERED; no hace commit."""
+        day = self._as_date(order.created_at or datetime.utcnow())
+
+        lines = db.session.query(
+            OrderItem.product_id,
+            OrderItem.quantity,
+            OrderItem.price,
+            Product.costo_prenda
+        ).join(Product, Product.id == OrderItem.product_id)\
+         .filter(OrderItem.order_id == order.id)\
+         .all()
+
+        # Agrupar por producto: una orden puede tener el mismo producto en varias tallas
+        per_product = {}
+        for line in lines:
+            data = per_product.setdefault(line.product_id, {
+                'day': day, 'product_id': line.product_id, 'revenue': 0.0, 'cost': 0.0, 'units': 0
+            })
+            data['revenue'] += sign * line.quantity * line.price
+            data['cost'] += sign * line.quantity * (line.costo_prenda or 0)
+            data['units'] += sign * line.quantity
+
+        if per_product:
+            self._upsert_rollup(list(per_product.values()))
+
+            # Contador materializado para /products/top-selling (sin tocar updated_at del producto)
+            products = Product.__table__
+            db.session.execute(
+                update(products)
+                .where(products.c.id == bindparam('row_id'))
+                .values(
+                    units_sold=func.coalesce(products.c.units_sold, 0) + bindparam('delta'),
+                    updated_at=products.c.updated_at
+                ).execution_options(inventory_only=True),
+                [{'row_id': data['product_id'], 'delta': data['units']} for data in per_product.values()]
+            )
+
+    def rebuild_rollup(self, chunk_days=31, progress=None):
+        """Reconstruye sales_daily_rollup desde orders/order_items por rangos de días.
+        Cada rango se borra y se vuelve a insertar en su propia transacción."""
+        first, last = db.session.query(
+            func.min(Order.created_at),
+            func.max(Order.created_at)
+        ).filter(Order.status.in_(COMPLETED_ORDER_STATUSES)).one()
+
+        if not first:
+            db.session.execute(delete(SalesDailyRollup))
+            db.session.commit()
+            return 0
+
+        first_day, last_day = self._as_date(first), self._as_date(last)
+
+        # Filas fuera del rango de ventas actuales
+        db.session.execute(delete(SalesDailyRollup).where(
+            or_(SalesDailyRollup.day < first_day, SalesDailyRollup.day > last_day)
+        ))
+        db.session.commit()
+
+        day_column = func.date(Order.created_at)
+        chunks = 0
+        chunk_start = first_day
+
+        while chunk_start <= last_day:
+            chunk_end = chunk_start + timedelta(days=chunk_days)
+
+            grouped = db.session.query(
+                day_column,
+                OrderItem.product_id,
+                func.sum(OrderItem.quantity * OrderItem.price),
+                func.sum(OrderItem.quantity * func.coalesce(Product.costo_prenda, 0.0)),
+                func.sum(OrderItem.quantity)
+            ).select_from(Order)\
+             .join(OrderItem, OrderItem.order_id == Order.id)\
+             .join(Product, Product.id == OrderItem.product_id)\
+             .filter(
+                 Order.status.in_(COMPLETED_ORDER_STATUSES),
+                 Order.created_at >= datetime.combine(chunk_start, datetime.min.time()),
+                 Order.created_at < datetime.combine(chunk_end, datetime.min.time())
+             ).group_by(day_column, OrderItem.product_id)
+
+            db.session.execute(delete(SalesDailyRollup).where(
+                SalesDailyRollup.day >= chunk_start,
+                SalesDailyRollup.day < chunk_end
+            ))
+            db.session.execute(
+                insert(SalesDailyRollup).from_select(
+                    ['day', 'product_id', 'revenue', 'cost', 'units'],
+                    grouped.statement
+                )
+            )
+            db.session.commit()
+
+            chunks += 1
+            if progress:
+                progress(chunk_start, min(chunk_end - timedelta(days=1), last_day))
+
+            chunk_start = chunk_end
+
+        return chunks
+
+    # =========================================================================
+    # MÁS VENDIDOS (products.units_sold)
+    # =========================================================================
+
+    def rebuild_units_sold(self):
+        """Recalcula products.units_sold desde las órdenes completadas (un solo UPDATE)"""
+        sold = db.session.query(func.coalesce(func.sum(OrderItem.quantity), 0))\
+            .join(Order, Order.id == OrderItem.order_id)\
+            .filter(
+                OrderItem.product_id == Product.id,
+                Order.status.in_(COMPLETED_ORDER_STATUSES)
+            ).scalar_subquery()
+
+        products = Product.__table__
+        result = db.session.execute(
+            update(products).values(units_sold=sold, updated_at=products.c.updated_at)
+        )
+        db.session.commit()
+        return result.rowcount
+
+    def get_top_selling(self, limit=4, since=None):
+        """[(Product, unidades)] más vendidos. Sin since: ORDER BY units_sold (índice).
+        Con since (date): suma del rollup diario desde esa fecha."""
+        if since is None:
+            return db.session.query(Product, Product.units_sold)\
+                .filter(Product.units_sold > 0)\
+                .order_by(Product.units_sold.desc(), Product.id.desc())\
+                .limit(limit)\
+                .all()
+
+        units = func.sum(SalesDailyRollup.units).label('units')
+        window = db.session.query(SalesDailyRollup.product_id, units)\
+            .filter(SalesDailyRollup.day >= self._as_date(since))\
+            .group_by(SalesDailyRollup.product_id)\
+            .having(units > 0)\
+            .subquery()
+
+        return db.session.query(Product, window.c.units)\
+            .join(window, window.c.product_id == Product.id)\
+            .order_by(window.c.units.desc(), Product.id.desc())\
+            .limit(limit)\
+            .all()
+
+
+analytics_service = AnalyticsService()
@@ -0,0 +1,288 @@
+import os
+from sqlalchemy import and_, or_, case, cast, exists, func, literal, literal_column, select, true, tuple_, union_all, Integer, String
+from api.models import db, Product, Category
+
+# Límites de los rangos de precio (COP) para el facet de precio
+PRICE_BUCKET_EDGES = tuple(
+    int(edge) for edge in os.getenv('CATALOG_PRICE_BUCKETS', '50000,100000,150000,200000').split(',')
+)
+
+# Ordenamientos del catálogo: (columna, descendente). Cada uno tiene su índice (sort_key, id)
+SORT_OPTIONS = {
+    'newest': (Product.created_at, True),
+    'price_asc': (Product.price, False),
+    'price_desc': (Product.price, True),
+    'rating': (func.coalesce(Product.rating, literal_column('0')), True),
+    'best_selling': (Product.units_sold, True),
+}
+
+# Dimensiones con conteo propio, en el orden en que se devuelven
+FACETS = ('category', 'subcategory', 'material', 'size', 'price', 'rating', 'is_new')
+
+
+class CatalogService:
+    """Navegación del catálogo con filtros y facets.
+    Los conteos de cada facet aplican todos los filtros excepto el de su propia
+    dimensión (así se pueden ofrecer las demás opciones de la misma dimensión).
+    Se calculan en un único recorrido: GROUPING SETS en PostgreSQL, UNION ALL de
+    GROUP BY en otros motores; las tallas (JSON) se agrupan en una consulta aparte."""
+
+    def _dialect(self):
+        return db.session.get_bind().dialect.name
+
+    # =========================================================================
+    # FILTROS
+    # =========================================================================
+
+    def _list_arg(self, args, name):
+        """Acepta ?size=M&size=L y ?size=M,L"""
+        values = []
+        for raw in args.getlist(name):
+            values.extend(value.strip() for value in raw.split(',') if value.strip())
+        return values
+
+    def parse_filters(self, args):
+        """Lee los filtros de la query string; lanza ValueError si un número no es válido"""
+        def number(name):
+            value = args.get(name)
+            if value in (None, ''):
+                return None
+            try:
+                return float(value)
+            except ValueError:
+                raise ValueError(f'{name} must be a number')
+
+        return {
+            'category': self._list_arg(args, 'category'),
+            'subcategory': self._list_arg(args, 'subcategory'),
+            'material': self._list_arg(args, 'material'),
+            'size': self._list_arg(args, 'size'),
+            'min_price': number('min_price'),
+            'max_price': number('max_price'),
+            'min_rating': number('min_rating'),
+            'is_new': args.get('is_new', 'false').lower() == 'true',
+            'in_stock': args.get('in_stock', 'false').lower() == 'true',
+            'on_sale': args.get('on_sale', 'false').lower() == 'true',
+        }
+
+    def _sizes_table(self):
+        """Elementos del arreglo JSON sizes como tabla (una fila por talla)"""
+        if self._dialect() == 'postgresql':
+            return func.json_array_elements_text(Product.sizes).table_valued('value')
+        return func.json_each(Product.sizes).table_valued('value')
+
+    def _size_condition(self, sizes):
+        if self._dialect() in ('postgresql', 'sqlite'):
+            elements = self._sizes_table()
+            return exists(select(literal_column('1')).select_from(elements).where(elements.c.value.in_(sizes)))
+        return or_(*[cast(Product.sizes, String).like(f'%"{size}"%') for size in sizes])
+
+    def _rating_value(self):
+        return func.coalesce(Product.rating, literal_column('0'))
+
+    def facet_conditions(self, filters):
+        """Condición de cada dimensión filtrada: {facet: condición}"""
+        conditions = {}
+        if filters['category']:
+            # Se aceptan ids o nombres de categoría
+            conditions['category'] = Product.category_id.in_(
+                select(Category.id).where(or_(
+                    Category.id.in_(filters['category']),
+                    Category.name.in_(filters['category'])
+                ))
+            )
+        if filters['subcategory']:
+            conditions['subcategory'] = Product.subcategory.in_(filters['subcategory'])
+        if filters['material']:
+            conditions['material'] = Product.material.in_(filters['material'])
+        if filters['size']:
+            conditions['size'] = self._size_condition(filters['size'])
+
+        price_range = []
+        if filters['min_price'] is not None:
+            price_range.append(Product.price >= filters['min_price'])
+        if filters['max_price'] is not None:
+            price_range.append(Product.price < filters['max_price'])
+        if price_range:
+            conditions['price'] = and_(*price_range)
+
+        if filters['min_rating'] is not None:
+            conditions['rating'] = self._rating_value() >= filters['min_rating']
+        if filters['is_new']:
+            conditions['is_new'] = Product.is_new == True
+        return conditions
+
+    def base_conditions(self, filters):
+        """Filtros que no tienen facet y se aplican a todo"""
+        conditions = []
+        if filters['in_stock']:
+            conditions.append(Product.in_stock == True)
+        if filters['on_sale']:
+            conditions.append(Product.is_on_sale == True)
+        return conditions
+
+    def browse_query(self, filters, fields=None):
+        """Query de productos con todos los filtros; fields limita las columnas cargadas"""
+        conditions = self.base_conditions(filters) + list(self.facet_conditions(filters).values())
+        return Product.query.options(*Product.load_options(fields)).filter(*conditions)
+
+    # =========================================================================
+    # FACETS
+    # =========================================================================
+
+    def _price_bucket(self):
+        # Límites como literales: PostgreSQL exige que la expresión del SELECT y la
+        # del GROUP BY sean idénticas (con parámetros distintos no las reconoce)
+        return case(
+            *[(Product.price < literal_column(str(edge)), literal_column(str(index)))
+              for index, edge in enumerate(PRICE_BUCKET_EDGES)],
+            else_=literal_column(str(len(PRICE_BUCKET_EDGES)))
+        )
+
+    def _rating_bucket(self):
+        if self._dialect() == 'postgresql':
+            return cast(func.floor(self._rating_value()), Integer)
+        return cast(self._rating_value(), Integer)
+
+    def _count_matching(self, conditions):
+        if not conditions:
+            return func.count()
+        return func.sum(case((and_(*conditions), literal_column('1')), else_=literal_column('0')))
+
+    def _dimensions(self):
+        """facet -> (expresión agrupada, etiqueta opcional)"""
+        return {
+            'category': (Product.category_id, Category.name),
+            'subcategory': (Product.subcategory, None),
+            'material': (Product.material, None),
+            'price': (self._price_bucket(), None),
+            'rating': (self._rating_bucket(), None),
+            'is_new': (Product.is_new, None),
+        }
+
+    def _grouped_rows(self, filters):
+        """Filas (facet, valor, etiqueta, conteo, coincidencias) de todas las dimensiones
+        excepto tallas; 'coincidencias' cuenta los productos que cumplen todos los filtros"""
+        conditions = self.facet_conditions(filters)
+        base = self.base_conditions(filters)
+        dimensions = self._dimensions()
+        matches_all = self._count_matching(list(conditions.values()))
+
+        def count_for(facet):
+            return self._count_matching([c for name, c in conditions.items() if name != facet])
+
+        if self._dialect() == 'postgresql':
+            columns = []
+            grouping_sets = []
+            for facet, (expression, label) in dimensions.items():
+                columns.append(expression.label(f'v_{facet}'))
+                if label is not None:
+                    columns.append(label.label(f'l_{facet}'))
+                    grouping_sets.append(tuple_(expression, label))
+                else:
+                    grouping_sets.append(tuple_(expression))
+                columns.append(func.grouping(expression).label(f'g_{facet}'))
+                columns.append(count_for(facet).label(f'c_{facet}'))
+
+            statement = select(*columns, matches_all.label('matches'))\
+                .select_from(Product)\
+                .outerjoin(Category, Category.id == Product.category_id)\
+                .where(*base)\
+                .group_by(func.grouping_sets(*grouping_sets))
+
+            rows = []
+            for row in db.session.execute(statement).mappings():
+                facet = next(name for name in dimensions if row[f'g_{name}'] == 0)
+                rows.append((facet, row[f'v_{facet}'], row.get(f'l_{facet}'), row[f'c_{facet}'], row['matches']))
+            return rows
+
+        branches = []
+        for facet, (expression, label) in dimensions.items():
+            branch = select(
+                literal(facet).label('facet'),
+                expression.label('value'),
+                (label if label is not None else literal(None, String)).label('label'),
+                count_for(facet).label('count'),
+                matches_all.label('matches')
+            ).select_from(Product).outerjoin(Category, Category.id == Product.category_id).where(*base)
+            branches.append(branch.group_by(expression, label) if label is not None else branch.group_by(expression))
+
+        return [tuple(row) for row in db.session.execute(union_all(*branches))]
+
+    def _size_rows(self, filters):
+        if self._dialect() not in ('postgresql', 'sqlite'):
+            return []
+        conditions = self.facet_conditions(filters)
+        elements = self._sizes_table()
+        statement = select(
+            elements.c.value,
+            self._count_matching([c for name, c in conditions.items() if name != 'size'])
+        ).select_from(Product.__table__.join(elements, true()))\
+            .where(*self.base_conditions(filters))\
+            .group_by(elements.c.value)
+        return db.session.execute(statement).all()
+
+    def facets(self, filters):
+        """Devuelve ({facet: [opciones]}, total de productos que cumplen todos los filtros)"""
+        selected = {
+            'category': set(filters['category']),
+            'subcategory': set(filters['subcategory']),
+            'material': set(filters['material']),
+            'size': set(filters['size']),
+        }
+        result = {facet: [] for facet in FACETS}
+        rating_counts = {}
+        total = 0
+
+        for facet, value, label, count, matches in self._grouped_rows(filters):
+            count = int(count or 0)
+            if facet == 'category':
+                total += int(matches or 0)
+
+            if facet in ('category', 'subcategory', 'material'):
+                if value is None:
+                    continue
+                is_selected = value in selected[facet] or (label is not None and label in selected[facet])
+                if count or is_selected:
+                    option = {'value': value, 'count': count, 'selected': is_selected}
+                    if facet == 'category':
+                        option['label'] = label
+                    result[facet].append(option)
+            elif facet == 'price':
+                index = int(value)
+                if count:
+                    result['price'].append({
+                        'min': PRICE_BUCKET_EDGES[index - 1] if index > 0 else 0,
+                        'max': PRICE_BUCKET_EDGES[index] if index < len(PRICE_BUCKET_EDGES) else None,
+                        'count': count
+                    })
+            elif facet == 'rating':
+                rating_counts[int(value or 0)] = count
+            elif facet == 'is_new':
+                if value:
+                    result['is_new'].append({'value': True, 'count': count, 'selected': filters['is_new']})
+
+        for value, count in self._size_rows(filters):
+            count = int(count or 0)
+            is_selected = value in selected['size']
+            if value is not None and (count or is_selected):
+                result['size'].append({'value': value, 'count': count, 'selected': is_selected})
+
+        # Rating acumulado: "4 o más estrellas" incluye los de 5
+        accumulated = 0
+        for stars in range(5, 0, -1):
+            accumulated += sum(count for value, count in rating_counts.items()
+                               if value == stars or (stars == 5 and value > 5))
+            if accumulated:
+                result['rating'].append({'min': stars, 'count': accumulated,
+                                         'selected': filters['min_rating'] == stars})
+
+        for facet in ('category', 'subcategory', 'material'):
+            result[facet].sort(key=lambda option: (-option['count'], str(option.get('label') or option['value'])))
+        result['size'].sort(key=lambda option: option['value'])
+        result['price'].sort(key=lambda option: option['min'])
+
+        return result, total
+
+
+catalog_service = CatalogService()
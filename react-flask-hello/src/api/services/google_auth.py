@@ -1,4 +1,5 @@
 import os
+import logging
 from google.oauth2 import id_token
 from google.auth.transport import requests
 import jwt
@@ -6,6 +7,8 @@ from datetime import datetime, timedelta
 from api.models import db, User
 from api.utils import generate_token, get_jwt_secret 
 
+logger = logging.getLogger(__name__)
+
 class GoogleAuthService:
     def __init__(self):
         self.client_id = os.getenv('GOOGLE_CLIENT_ID', '')
@@ -15,7 +18,7 @@ class GoogleAuthService:
     def verify_google_token(self, token):
         """Verificar el token de Google"""
         try:
-            print("🔐 Verificando token de Google...")
+            logger.debug("🔐 Verificando token de Google...")
             
             # Verificar el token con Google
             idinfo = id_token.verify_oauth2_token(
@@ -29,7 +32,7 @@ class GoogleAuthService:
             if idinfo['aud'] not in [self.client_id]:
                 raise ValueError('Could not verify audience.')
             
-            print("✅ Token verificado correctamente")
+            logger.debug("✅ Token verificado correctamente")
             
             return {
                 'success': True,
@@ -43,13 +46,13 @@ class GoogleAuthService:
             }
             
         except ValueError as e:
-            print(f"❌ Error verificando token: {str(e)}")
+            logger.warning("❌ Error verificando token: %s", e)
             return {
                 'success': False,
                 'error': f'Token de Google inválido: {str(e)}'
             }
         except Exception as e:
-            print(f"❌ Error inesperado: {str(e)}")
+            logger.error("❌ Error inesperado: %s", e)
             return {
                 'success': False,
                 'error': f'Error de autenticación: {str(e)}'
@@ -60,16 +63,16 @@ class GoogleAuthService:
         try:
             # ✅ USAR generate_token del utils para consistencia
             token = generate_token(user_id, 'user')
-            print(f"✅ JWT generado con sistema centralizado para user_id: {user_id}")
+            logger.debug("✅ JWT generado con sistema centralizado para user_id: %s", user_id)
             return token
         except Exception as e:
-            print(f"❌ Error generando JWT: {str(e)}")
+            logger.error("❌ Error generando JWT: %s", e)
             return None
 
     # ✅ MANTENER TODO EL RESTO DEL CÓDIGO IGUAL
     def find_or_create_user(self, user_data, legal_data=None):
         try:
-            print(f"🔍 Buscando usuario: {user_data['email']}")
+            logger.debug("🔍 Buscando usuario: %s", user_data['email'])
             
             # Buscar por google_id
             user = User.query.filter_by(google_id=user_data['google_id']).first()
@@ -82,11 +85,11 @@ class GoogleAuthService:
                 
                 if user:
                     # Usuario existe pero sin google_id - actualizar
-                    print(f"🔄 Actualizando usuario existente con Google ID: {user.email}")
+                    logger.debug("🔄 Actualizando usuario existente con Google ID: %s", user.email)
                     user.google_id = user_data['google_id']
                 else:
                     # Crear nuevo usuario
-                    print(f"👤 Creando nuevo usuario: {user_data['email']}")
+                    logger.debug("👤 Creando nuevo usuario: %s", user_data['email'])
                     user = User(
                         google_id=user_data['google_id'],
                         email=user_data['email'],
@@ -112,10 +115,10 @@ class GoogleAuthService:
                     db.session.add(user)
                     is_new_user = True
             else:
-                print(f"✅ Usuario existente encontrado: {user.email}")
+                logger.debug("✅ Usuario existente encontrado: %s", user.email)
             
             # ✅ SIEMPRE actualizar información y tracking
-            print(f"🔄 Actualizando datos del usuario...")
+            logger.debug("🔄 Actualizando datos del usuario...")
             user.name = user_data['name']
             user.picture = user_data['picture']
             user.email_verified = user_data['email_verified']
@@ -125,15 +128,12 @@ class GoogleAuthService:
             db.session.commit()
             
             # ✅ Log para debugging
-            print(f"✅ Usuario guardado:")
-            print(f"   - ID: {user.id}")
-            print(f"   - Login count: {user.login_count}")
-            print(f"   - Last login: {user.last_login}")
+            logger.debug("✅ Usuario guardado: ID: %s; Login count: %s; Last login: %s", user.id, user.login_count, user.last_login)
             
             # Devolver usuario y flag de nuevo usuario
             return user, is_new_user
             
         except Exception as e:
             db.session.rollback()
-            print(f"❌ Error en find_or_create_user: {str(e)}")
+            logger.error("❌ Error en find_or_create_user: %s", e)
             raise e
\ No newline at end of file
@@ -1,6 +1,8 @@
 import mercadopago
 import os
-import json
+import logging
+
+logger = logging.getLogger(__name__)
 
 class MercadoPagoService:
     def __init__(self):
@@ -10,24 +12,21 @@ class MercadoPagoService:
         
         self.access_token = os.getenv('MERCADOPAGO_ACCESS_TOKEN')
         
-        print(f"🔑 MERCADOPAGO_ACCESS_TOKEN cargado: {bool(self.access_token)}")
+        logger.debug("🔑 MERCADOPAGO_ACCESS_TOKEN cargado: %s", bool(self.access_token))
         if self.access_token:
-            print(f"🔑 Token preview: {self.access_token[:20]}...")
             # Detectar tipo de credenciales (solo informativo)
             is_test = 'TEST-' in self.access_token or self.access_token.startswith('APP_USR-')
-            print(f"🔑 Tipo detectado: {'TEST/Sandbox' if is_test else 'Producción'}")
+            logger.debug("🔑 Tipo detectado: %s", 'TEST/Sandbox' if is_test else 'Producción')
         
         # ✅ Inicializar SDK sin forzar ambiente
         # Las credenciales determinan automáticamente si es test o producción
         self.sdk = mercadopago.SDK(self.access_token)
-        print("✅ SDK de Mercado Pago inicializado")
+        logger.info("✅ SDK de Mercado Pago inicializado")
     
     def create_preference(self, amount, order_id, customer_email, customer_name, items):
         """Crear preferencia de pago en Mercado Pago"""
         try:
-            print(f"🔗 Creando preferencia Mercado Pago:")
-            print(f"   Order: {order_id}")
-            print(f"   Amount: {amount}")
+            logger.debug("🔗 Creando preferencia Mercado Pago: Order: %s; Amount: %s", order_id, amount)
             
             # Construir items
             mp_items = []
@@ -93,12 +92,12 @@ class MercadoPagoService:
                 }
             }
             
-            print(f"   Preference data: {json.dumps(preference_data, indent=2)}")
+            logger.debug("🔗 Preference data: %s", preference_data)
             
             # Crear preferencia
             preference_result = self.sdk.preference().create(preference_data)
             
-            print(f"   MP Response Status: {preference_result.get('status')}")
+            logger.debug("🔗 MP Response Status: %s", preference_result.get('status'))
             
             if preference_result["status"] in [200, 201]:
                 preference = preference_result["response"]
@@ -116,16 +115,14 @@ class MercadoPagoService:
                 }
             else:
                 error_msg = preference_result.get('response', {})
-                print(f"❌ Error completo: {json.dumps(error_msg, indent=2)}")
+                logger.error("❌ Error completo: %s", error_msg)
                 return {
                     'success': False,
                     'error': f"MercadoPago error: {error_msg}"
                 }
                 
         except Exception as e:
-            print(f"❌ Exception: {str(e)}")
-            import traceback
-            traceback.print_exc()
+            logger.exception("❌ Exception: %s", e)
             return {
                 'success': False,
                 'error': str(e)
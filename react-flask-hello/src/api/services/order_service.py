@@ -0,0 +1,74 @@
+import os
+from sqlalchemy import update, func
+from api.models import db, Order, OrderStatusEnum, COMPLETED_ORDER_STATUSES
+from api.services.analytics_service import analytics_service
+from api.services.user_stats_service import user_stats_service
+from api.services.stock_service import stock_service
+
+# Envío fijo; gratis cuando el subtotal supera el umbral (igual que el checkout)
+SHIPPING_COST = int(os.getenv('SHIPPING_COST', '10000'))
+FREE_SHIPPING_THRESHOLD = int(os.getenv('FREE_SHIPPING_THRESHOLD', '200000'))
+
+
+class OrderService:
+    """Punto único para cambiar el estado de una orden.
+    Mantiene los datos derivados (rollup de ventas, units_sold, estadísticas del usuario,
+    reservas de stock) dentro de la misma transacción;
+    el commit lo hace quien llama."""
+
+    def shipping_for(self, subtotal):
+        """Costo de envío calculado en el servidor (el del cliente no se usa)"""
+        return 0 if subtotal > FREE_SHIPPING_THRESHOLD else SHIPPING_COST
+
+    def _update_status(self, order, old_status, new_status):
+        """UPDATE condicional sobre el estado anterior; False si otra petición ganó"""
+        result = db.session.execute(
+            update(Order)
+            .where(Order.id == order.id, Order.status == old_status)
+            .values(status=new_status, updated_at=func.now())
+        )
+
+        if result.rowcount != 1:
+            # Otra petición (webhook duplicado, admin) ganó la carrera
+            db.session.refresh(order)
+            return False
+        return True
+
+    def change_status(self, order, new_status):
+        """Cambia el estado con un UPDATE condicional sobre el estado anterior.
+        Devuelve True si esta llamada hizo la transición; False si la orden ya
+        tenía ese estado o si otra petición la cambió primero (idempotente).
+        Reabrir una orden cancelada vuelve a reservar su stock; si no alcanza lanza
+        InsufficientStockError y la orden sigue cancelada."""
+        old_status = order.status
+        if old_status == new_status:
+            return False
+
+        if old_status == OrderStatusEnum.CANCELLED:
+            # Al cancelarla se devolvió el stock: el savepoint deshace también el
+            # cambio de estado si ya no hay unidades para reservar
+            with db.session.begin_nested():
+                if not self._update_status(order, old_status, new_status):
+                    return False
+                stock_service.reserve(order, [(item.product_id, item.quantity) for item in order.items])
+        elif not self._update_status(order, old_status, new_status):
+            return False
+
+        was_completed = old_status in COMPLETED_ORDER_STATUSES
+        is_completed = new_status in COMPLETED_ORDER_STATUSES
+
+        if was_completed != is_completed:
+            sign = 1 if is_completed else -1
+            analytics_service.apply_order_sales(order, sign)
+            user_stats_service.apply_order_delta(order, sign)
+
+        # Cancelada: el stock vuelve al inventario; pagada/avanzada: la reserva es definitiva
+        if new_status == OrderStatusEnum.CANCELLED:
+            stock_service.release_order(order)
+        elif new_status != OrderStatusEnum.PENDING:
+            stock_service.commit_order(order)
+
+        return True
+
+
+order_service = OrderService()
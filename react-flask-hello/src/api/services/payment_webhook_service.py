@@ -0,0 +1,381 @@
+import hashlib
+import hmac
+import logging
+import os
+import random
+import socket
+import threading
+import time
+from datetime import datetime, timedelta
+from sqlalchemy import select, update, delete, func, or_, and_
+from api.models import db, Order, OrderStatusEnum, PaymentWebhookJob
+from api.services.order_service import order_service
+from api.services.stock_service import InsufficientStockError
+
+logger = logging.getLogger(__name__)
+
+# Reintentos: espera base * 2^(intento-1) segundos (con jitter), hasta el máximo
+PAYMENT_JOB_MAX_ATTEMPTS = int(os.getenv('PAYMENT_JOB_MAX_ATTEMPTS', '8'))
+PAYMENT_JOB_BACKOFF_SECONDS = int(os.getenv('PAYMENT_JOB_BACKOFF_SECONDS', '15'))
+PAYMENT_JOB_MAX_BACKOFF_SECONDS = int(os.getenv('PAYMENT_JOB_MAX_BACKOFF_SECONDS', '3600'))
+
+# Un job 'processing' más viejo que esto se considera de un worker caído y se vuelve a tomar
+PAYMENT_JOB_LOCK_TIMEOUT = int(os.getenv('PAYMENT_JOB_LOCK_TIMEOUT', '300'))
+
+# Con más jobs en cola el webhook responde 503 (Mercado Pago reintenta la notificación)
+PAYMENT_JOB_MAX_PENDING = int(os.getenv('PAYMENT_JOB_MAX_PENDING', '5000'))
+
+# Jobs terminados (done/failed) se eliminan pasados N días; el worker purga cada intervalo
+PAYMENT_JOB_RETENTION_DAYS = int(os.getenv('PAYMENT_JOB_RETENTION_DAYS', '30'))
+PAYMENT_JOB_PURGE_INTERVAL = int(os.getenv('PAYMENT_JOB_PURGE_INTERVAL', '3600'))
+
+# Clave secreta del webhook (panel de Mercado Pago > Webhooks) para validar x-signature
+MERCADOPAGO_WEBHOOK_SECRET = os.getenv('MERCADOPAGO_WEBHOOK_SECRET')
+
+# Estado del pago en Mercado Pago -> (payment_status de la orden, nuevo estado o None)
+PAYMENT_TRANSITIONS = {
+    'approved': ('approved', OrderStatusEnum.CONFIRMED),
+    'pending': ('pending', None),
+    'rejected': ('rejected', OrderStatusEnum.CANCELLED),
+    'cancelled': ('cancelled', OrderStatusEnum.CANCELLED),
+}
+
+
+class RetryableJobError(Exception):
+    """Falla transitoria (pasarela caída, timeout): el job se reintenta más tarde"""
+
+
+class PaymentWebhookService:
+    """Cola durable (tabla payment_webhook_jobs) para las notificaciones de pago.
+    El webhook solo valida y encola (responde 200 de inmediato); `flask payments-worker`
+    toma los jobs, consulta el pago en Mercado Pago y aplica el cambio de estado.
+    Los jobs se toman con SELECT ... FOR UPDATE SKIP LOCKED en PostgreSQL (varios
+    workers sin pisarse); en otros motores, con un UPDATE condicional por job."""
+
+    def __init__(self):
+        self._unsigned_warned = False
+
+    @property
+    def worker_id(self):
+        return f'{socket.gethostname()}:{os.getpid()}'
+
+    def _dialect(self):
+        return db.session.get_bind().dialect.name
+
+    # =========================================================================
+    # ENCOLAR (webhook)
+    # =========================================================================
+
+    def extract_payment_id(self, payload, query_params):
+        """payment_id de la notificación (MP lo envía en distintos formatos)"""
+        payment_id = None
+        if 'id' in query_params:
+            payment_id = query_params['id']
+        if isinstance(payload.get('data'), dict) and 'id' in payload['data']:
+            payment_id = payload['data']['id']
+        elif 'id' in payload:
+            payment_id = payload['id']
+        elif 'data.id' in query_params:
+            payment_id = query_params['data.id']
+
+        payment_id = str(payment_id).strip() if payment_id is not None else ''
+        if not payment_id or len(payment_id) > 64 or not payment_id.replace('-', '').isalnum():
+            return None
+        return payment_id
+
+    def verify_signature(self, headers, query_params, payload, secret=None):
+        """Valida el header x-signature (ts=...,v1=...): HMAC-SHA256 con la clave secreta
+        del webhook sobre 'id:{data.id};request-id:{x-request-id};ts:{ts};' (las partes
+        que no vienen se omiten). Sin MERCADOPAGO_WEBHOOK_SECRET no se valida."""
+        secret = MERCADOPAGO_WEBHOOK_SECRET if secret is None else secret
+        if not secret:
+            if not self._unsigned_warned:
+                self._unsigned_warned = True
+                logger.warning("⚠️ MERCADOPAGO_WEBHOOK_SECRET no configurado: el webhook no valida la firma")
+            return True
+
+        parts = {}
+        for part in headers.get('x-signature', '').split(','):
+            key, _, value = part.strip().partition('=')
+            parts[key] = value
+        ts, signature = parts.get('ts'), parts.get('v1')
+        if not ts or not signature:
+            return False
+
+        data_id = query_params.get('data.id')
+        if data_id is None and isinstance(payload.get('data'), dict):
+            data_id = payload['data'].get('id')
+        request_id = headers.get('x-request-id')
+
+        manifest = ''
+        if data_id is not None:
+            manifest += f'id:{str(data_id).lower()};'
+        if request_id:
+            manifest += f'request-id:{request_id};'
+        manifest += f'ts:{ts};'
+
+        expected = hmac.new(secret.encode('utf-8'), manifest.encode('utf-8'), hashlib.sha256).hexdigest()
+        return hmac.compare_digest(expected, signature)
+
+    def backlog_full(self):
+        """True si la cola llegó a PAYMENT_JOB_MAX_PENDING jobs sin procesar"""
+        pending = db.session.query(func.count(PaymentWebhookJob.id))\
+            .filter(PaymentWebhookJob.status == 'pending')\
+            .scalar()
+        return pending >= PAYMENT_JOB_MAX_PENDING
+
+    def enqueue(self, payment_id, notification_type=None, payload=None, provider='mercadopago'):
+        """Crea el job (el commit lo hace quien llama). Si ya hay uno en cola sin tomar
+        para el mismo pago no se duplica: el worker consulta el estado actual del pago."""
+        existing = PaymentWebhookJob.query.filter_by(
+            provider=provider, payment_id=payment_id, status='pending'
+        ).first()
+        if existing:
+            return existing, False
+
+        job = PaymentWebhookJob(
+            provider=provider,
+            payment_id=payment_id,
+            notification_type=notification_type,
+            payload=payload,
+            status='pending',
+            attempts=0,
+            run_after=datetime.utcnow()
+        )
+        db.session.add(job)
+        return job, True
+
+    # =========================================================================
+    # TOMAR JOBS (worker)
+    # =========================================================================
+
+    def _claimable(self, now):
+        stale = now - timedelta(seconds=PAYMENT_JOB_LOCK_TIMEOUT)
+        return or_(
+            and_(PaymentWebhookJob.status == 'pending', PaymentWebhookJob.run_after <= now),
+            and_(PaymentWebhookJob.status == 'processing', PaymentWebhookJob.locked_at < stale)
+        )
+
+    def claim(self, limit=10, now=None):
+        """Marca hasta `limit` jobs como 'processing' para este worker y hace commit.
+        Devuelve los jobs tomados."""
+        now = now or datetime.utcnow()
+        candidates = select(PaymentWebhookJob.id)\
+            .where(self._claimable(now))\
+            .order_by(PaymentWebhookJob.run_after, PaymentWebhookJob.id)\
+            .limit(limit)
+
+        if self._dialect() == 'postgresql':
+            # Las filas bloqueadas por otro worker se saltan en lugar de esperarlas
+            job_ids = db.session.execute(candidates.with_for_update(skip_locked=True)).scalars().all()
+            if job_ids:
+                db.session.execute(
+                    update(PaymentWebhookJob)
+                    .where(PaymentWebhookJob.id.in_(job_ids))
+                    .values(status='processing', locked_at=now, locked_by=self.worker_id,
+                            attempts=PaymentWebhookJob.attempts + 1),
+                    execution_options={'synchronize_session': False}
+                )
+        else:
+            # Sin SKIP LOCKED: cada job se toma con un UPDATE que solo gana un worker
+            job_ids = []
+            for job_id in db.session.execute(candidates).scalars().all():
+                result = db.session.execute(
+                    update(PaymentWebhookJob)
+                    .where(PaymentWebhookJob.id == job_id, self._claimable(now))
+                    .values(status='processing', locked_at=now, locked_by=self.worker_id,
+                            attempts=PaymentWebhookJob.attempts + 1),
+                    execution_options={'synchronize_session': False}
+                )
+                if result.rowcount == 1:
+                    job_ids.append(job_id)
+
+        db.session.commit()
+        if not job_ids:
+            return []
+        return PaymentWebhookJob.query\
+            .filter(PaymentWebhookJob.id.in_(job_ids))\
+            .order_by(PaymentWebhookJob.run_after, PaymentWebhookJob.id)\
+            .all()
+
+    # =========================================================================
+    # PROCESAR
+    # =========================================================================
+
+    def fetch_payment(self, payment_id):
+        from api.services.mercadopago_service import mercado_pago_service
+
+        result = mercado_pago_service.get_payment(payment_id)
+        if not result.get('success'):
+            raise RetryableJobError(f"Error obteniendo pago: {result.get('error')}")
+        return result['payment']
+
+    def apply_payment(self, payment_id, payment_data):
+        """Aplica el estado del pago a su orden (el commit lo hace quien llama).
+        Devuelve (resultado, orden o None, True si la orden cambió de estado)."""
+        payment_status = payment_data.get('status')
+        order_id = payment_data.get('external_reference')
+
+        logger.debug("📊 Pago %s: %s (%s) - orden %s - %s %s", payment_id, payment_status,
+                     payment_data.get('status_detail'), order_id,
+                     payment_data.get('transaction_amount'), payment_data.get('currency_id'))
+
+        if not order_id:
+            logger.warning("⚠️ Pago %s sin external_reference (order_id)", payment_id)
+            return 'no_reference', None, False
+
+        order = db.session.get(Order, order_id)
+        if not order:
+            logger.warning("⚠️ Orden %s no encontrada", order_id)
+            return 'order_not_found', None, False
+
+        transition = PAYMENT_TRANSITIONS.get(payment_status)
+        if transition is None:
+            logger.info("ℹ️ Estado de pago sin acción: %s (orden %s)", payment_status, order_id)
+            return f'ignored_{payment_status}'[:30], order, False
+
+        order_payment_status, new_status = transition
+        order.payment_id = str(payment_id)
+        order.payment_status = order_payment_status
+        if payment_status == 'approved':
+            order.payment_method = payment_data.get('payment_method_id')
+
+        try:
+            changed = order_service.change_status(order, new_status) if new_status else False
+        except InsufficientStockError as e:
+            # Pago aprobado de una orden ya cancelada cuyo stock se vendió: queda cancelada
+            # y se registra para reembolso manual (reintentar no lo resuelve)
+            logger.error("❌ Pago %s aprobado pero la orden %s no se pudo reabrir: %s", payment_id, order_id, e)
+            return 'insufficient_stock', order, False
+        logger.info("✅ Pago %s %s - orden %s%s", payment_id, payment_status, order_id,
+                    f' -> {new_status.value}' if changed else '')
+        return payment_status, order, changed
+
+    def _send_confirmation(self, order):
+        try:
+            from api.services.email_service import send_order_confirmation_email
+            if send_order_confirmation_email(order):
+                logger.info("📧 Email enviado a %s", order.customer_email)
+            else:
+                logger.warning("⚠️ Email no pudo ser enviado")
+        except ImportError:
+            logger.warning("⚠️ Servicio de email no disponible")
+        except Exception as e:
+            logger.error("❌ Error enviando email: %s", e)
+
+    def _backoff(self, attempts):
+        delay = min(PAYMENT_JOB_BACKOFF_SECONDS * 2 ** max(attempts - 1, 0), PAYMENT_JOB_MAX_BACKOFF_SECONDS)
+        return delay * random.uniform(0.8, 1.2)
+
+    def _fail(self, job, error):
+        """Reprograma el job con backoff o lo marca 'failed' si agotó los intentos"""
+        db.session.rollback()
+        job = db.session.get(PaymentWebhookJob, job.id)
+        job.last_error = str(error)[:2000]
+        job.locked_at = None
+        job.locked_by = None
+        if job.attempts >= PAYMENT_JOB_MAX_ATTEMPTS:
+            job.status = 'failed'
+            logger.error("❌ Job %s (pago %s) falló definitivamente tras %s intentos: %s",
+                         job.id, job.payment_id, job.attempts, error)
+        else:
+            job.status = 'pending'
+            job.run_after = datetime.utcnow() + timedelta(seconds=self._backoff(job.attempts))
+            logger.warning("⚠️ Job %s (pago %s) intento %s falló, reintento a las %s: %s",
+                           job.id, job.payment_id, job.attempts, job.run_after.isoformat(), error)
+        db.session.commit()
+
+    def process(self, job):
+        """Procesa un job tomado; el estado de la orden y el del job se confirman juntos.
+        Devuelve True si terminó (done), False si quedó para reintento o falló."""
+        try:
+            payment_data = self.fetch_payment(job.payment_id)
+            result, order, changed = self.apply_payment(job.payment_id, payment_data)
+
+            job.status = 'done'
+            job.result = result
+            job.last_error = None
+            job.locked_at = None
+            job.locked_by = None
+            db.session.commit()
+        except Exception as e:
+            if not isinstance(e, RetryableJobError):
+                logger.exception("❌ Error procesando job %s (pago %s)", job.id, job.payment_id)
+            self._fail(job, e)
+            return False
+
+        # El email solo se envía una vez: cuando este job confirmó la orden
+        if changed and result == 'approved':
+            self._send_confirmation(order)
+        return True
+
+    # =========================================================================
+    # RETENCIÓN
+    # =========================================================================
+
+    def purge_finished(self, before, batch_size=1000):
+        """Elimina los jobs terminados (done/failed) sin cambios desde `before`, por lotes
+        con un commit cada uno. Devuelve cuántos se eliminaron."""
+        purged = 0
+        while True:
+            job_ids = db.session.execute(
+                select(PaymentWebhookJob.id)
+                .where(PaymentWebhookJob.status.in_(('done', 'failed')), PaymentWebhookJob.updated_at < before)
+                .limit(batch_size)
+            ).scalars().all()
+            if not job_ids:
+                break
+            db.session.execute(
+                delete(PaymentWebhookJob).where(PaymentWebhookJob.id.in_(job_ids)),
+                execution_options={'synchronize_session': False}
+            )
+            db.session.commit()
+            purged += len(job_ids)
+        return purged
+
+    def run_pending(self, limit=10):
+        """Toma y procesa una tanda; devuelve (tomados, completados)"""
+        jobs = self.claim(limit=limit)
+        done = sum(1 for job in jobs if self.process(job))
+        return len(jobs), done
+
+    def _purge_old(self, retention_days):
+        try:
+            purged = self.purge_finished(datetime.utcnow() - timedelta(days=retention_days))
+            if purged:
+                logger.info("🧹 %s jobs de pago terminados eliminados (más de %s días)", purged, retention_days)
+        except Exception as e:
+            db.session.rollback()
+            logger.exception("❌ Error purgando jobs de pago: %s", e)
+
+    def run_worker(self, batch_size=10, poll_interval=2.0, stop_event=None, once=False, progress=None,
+                   retention_days=PAYMENT_JOB_RETENTION_DAYS):
+        """Bucle del worker: procesa tandas hasta que no quedan jobs y espera poll_interval.
+        Cada PAYMENT_JOB_PURGE_INTERVAL segundos elimina los jobs terminados con más de
+        retention_days días (0 o None: no purga)."""
+        stop_event = stop_event or threading.Event()
+        total_done = 0
+        next_purge = time.monotonic()
+        while not stop_event.is_set():
+            if retention_days and time.monotonic() >= next_purge:
+                self._purge_old(retention_days)
+                next_purge = time.monotonic() + PAYMENT_JOB_PURGE_INTERVAL
+
+            try:
+                claimed, done = self.run_pending(limit=batch_size)
+            except Exception as e:
+                db.session.rollback()
+                logger.exception("❌ Error en el worker de pagos: %s", e)
+                claimed, done = 0, 0
+
+            total_done += done
+            if claimed and progress:
+                progress(claimed, done)
+            if once and claimed < batch_size:
+                break
+            db.session.remove()
+            if claimed < batch_size:
+                stop_event.wait(poll_interval)
+        return total_done
+
+payment_webhook_service = PaymentWebhookService()
@@ -0,0 +1,110 @@
+from sqlalchemy import func
+from sqlalchemy.orm import aliased
+from werkzeug.datastructures import MultiDict
+from api.models import db, Product, Review, Order, OrderItem, COMPLETED_ORDER_STATUSES
+from api.pagination import keyset_paginate
+
+# Vista de los productos relacionados (tarjetas)
+RELATED_FIELDS = Product.VIEWS['card']
+
+
+class ProductPageService:
+    """Todo lo que necesita la página de un producto en una sola respuesta y con un
+    número fijo de consultas (5), sin importar cuántas reseñas o relacionados haya:
+    producto + categoría, primera página de reseñas aprobadas, histograma de ratings,
+    relacionados de la misma categoría y comprados junto con este producto."""
+
+    def get_product(self, product_id):
+        fields = Product.VIEWS['detail']
+        return Product.query.options(*Product.load_options(fields)).filter_by(id=product_id).first()
+
+    def get_reviews_page(self, product_id, limit):
+        """Primera página por keyset: el cursor sirve para /products/<id>/reviews?cursor="""
+        query = Review.query.filter_by(product_id=product_id, is_approved=True)
+        return keyset_paginate(query, Review.created_at, Review.id, args=MultiDict({'limit': limit}))
+
+    def get_rating_summary(self, product_id):
+        rows = db.session.query(Review.rating, func.count(Review.id))\
+            .filter(Review.product_id == product_id, Review.is_approved == True)\
+            .group_by(Review.rating)\
+            .all()
+
+        histogram = {str(stars): 0 for stars in range(1, 6)}
+        total = 0
+        points = 0
+        for rating, count in rows:
+            if rating is None:
+                continue
+            histogram[str(rating)] = histogram.get(str(rating), 0) + count
+            total += count
+            points += rating * count
+
+        return {
+            'average': round(points / total, 1) if total else 0.0,
+            'count': total,
+            'histogram': histogram
+        }
+
+    def get_same_category(self, product, limit):
+        """Los más vendidos de la misma categoría (índice units_sold)"""
+        return Product.query.options(*Product.load_options(RELATED_FIELDS))\
+            .filter(
+                Product.category_id == product.category_id,
+                Product.id != product.id,
+                Product.in_stock == True
+            )\
+            .order_by(Product.units_sold.desc(), Product.id.desc())\
+            .limit(limit)\
+            .all()
+
+    def get_bought_together(self, product_id, limit):
+        """Productos que aparecen en las mismas órdenes completadas, por número de órdenes"""
+        this_item = aliased(OrderItem)
+        other_item = aliased(OrderItem)
+
+        scores = db.session.query(
+            other_item.product_id.label('product_id'),
+            func.count(func.distinct(other_item.order_id)).label('score')
+        ).join(this_item, this_item.order_id == other_item.order_id)\
+            .join(Order, Order.id == this_item.order_id)\
+            .filter(
+                this_item.product_id == product_id,
+                other_item.product_id != product_id,
+                Order.status.in_(COMPLETED_ORDER_STATUSES)
+            )\
+            .group_by(other_item.product_id)\
+            .subquery()
+
+        return Product.query.options(*Product.load_options(RELATED_FIELDS))\
+            .join(scores, scores.c.product_id == Product.id)\
+            .filter(Product.in_stock == True)\
+            .order_by(scores.c.score.desc(), Product.id.desc())\
+            .limit(limit)\
+            .all()
+
+    def build(self, product_id, review_limit=5, related_limit=8):
+        """Diccionario de la página o None si el producto no existe"""
+        product = self.get_product(product_id)
+        if not product:
+            return None
+
+        reviews = self.get_reviews_page(product_id, review_limit)
+
+        return {
+            'product': product.serialize(Product.VIEWS['detail']),
+            'reviews': [review.serialize() for review in reviews.items],
+            'reviews_next_cursor': reviews.next_cursor,
+            'reviews_has_more': reviews.next_cursor is not None,
+            'rating_summary': self.get_rating_summary(product_id),
+            'related': {
+                'same_category': [
+                    related.serialize(RELATED_FIELDS) for related in self.get_same_category(product, related_limit)
+                ],
+                'bought_together': [
+                    related.serialize(RELATED_FIELDS) for related in self.get_bought_together(product_id, related_limit)
+                ]
+            }
+        }
+
+
+product_page_service = ProductPageService()
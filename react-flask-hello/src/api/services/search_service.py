@@ -0,0 +1,209 @@
+import re
+from sqlalchemy import text, or_
+from api.models import db, Product, Category, Saint
+
+# Palabras de búsqueda: letras/números (incluye tildes y ñ), sin operadores
+TOKEN_RE = re.compile(r'\w+', re.UNICODE)
+MAX_TOKENS = 8
+
+# =============================================================================
+# SQLITE (desarrollo local): tablas FTS5 mantenidas con triggers
+# =============================================================================
+
+SQLITE_FTS_DDL = [
+    """CREATE VIRTUAL TABLE IF NOT EXISTS products_fts USING fts5(
+        product_id UNINDEXED, name, category, subcategory, material, origen, description,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE VIRTUAL TABLE IF NOT EXISTS saints_fts USING fts5(
+        saint_id UNINDEXED, name, patronage, summary, biography,
+        tokenize = 'unicode61 remove_diacritics 2'
+    )""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_insert AFTER INSERT ON products BEGIN
+        INSERT INTO products_fts (product_id, name, category, subcategory, material, origen, description)
+        VALUES (NEW.id, NEW.name, (SELECT name FROM categories WHERE id = NEW.category_id),
+                NEW.subcategory, NEW.material, NEW.origen, NEW.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_update
+        AFTER UPDATE OF name, description, subcategory, material, origen, category_id ON products BEGIN
+        DELETE FROM products_fts WHERE product_id = OLD.id;
+        INSERT INTO products_fts (product_id, name, category, subcategory, material, origen, description)
+        VALUES (NEW.id, NEW.name, (SELECT name FROM categories WHERE id = NEW.category_id),
+                NEW.subcategory, NEW.material, NEW.origen, NEW.description);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS products_fts_delete AFTER DELETE ON products BEGIN
+        DELETE FROM products_fts WHERE product_id = OLD.id;
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS categories_fts_update AFTER UPDATE OF name ON categories BEGIN
+        UPDATE products_fts SET category = NEW.name
+        WHERE product_id IN (SELECT id FROM products WHERE category_id = NEW.id);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS saints_fts_insert AFTER INSERT ON saints BEGIN
+        INSERT INTO saints_fts (saint_id, name, patronage, summary, biography)
+        VALUES (NEW.id, NEW.name, NEW.patronage, NEW.summary, NEW.biography);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS saints_fts_update
+        AFTER UPDATE OF name, patronage, summary, biography ON saints BEGIN
+        DELETE FROM saints_fts WHERE saint_id = OLD.id;
+        INSERT INTO saints_fts (saint_id, name, patronage, summary, biography)
+        VALUES (NEW.id, NEW.name, NEW.patronage, NEW.summary, NEW.biography);
+    END""",
+    """CREATE TRIGGER IF NOT EXISTS saints_fts_delete AFTER DELETE ON saints BEGIN
+        DELETE FROM saints_fts WHERE saint_id = OLD.id;
+    END""",
+]
+
+SQLITE_FTS_REBUILD = [
+    "DELETE FROM products_fts",
+    """INSERT INTO products_fts (product_id, name, category, subcategory, material, origen, description)
+       SELECT p.id, p.name, c.name, p.subcategory, p.material, p.origen, p.description
+       FROM products p LEFT JOIN categories c ON c.id = p.category_id""",
+    "DELETE FROM saints_fts",
+    """INSERT INTO saints_fts (saint_id, name, patronage, summary, biography)
+       SELECT id, name, patronage, summary, biography FROM saints""",
+]
+
+
+class SearchService:
+    """Búsqueda de texto completo de productos y santos ordenada por relevancia.
+    PostgreSQL: columnas search_vector (tsvector, configuración es_unaccent, índice GIN)
+    mantenidas por triggers (ver migración). SQLite: tablas FTS5 creadas al primer uso.
+    Otros motores: ILIKE como antes."""
+
+    def __init__(self):
+        self._sqlite_ready = set()
+
+    def _dialect(self):
+        return db.session.get_bind().dialect.name
+
+    def tokenize(self, term):
+        return TOKEN_RE.findall(term.lower())[:MAX_TOKENS]
+
+    # =========================================================================
+    # SQLITE FTS5
+    # =========================================================================
+
+    def ensure_sqlite_index(self, rebuild=False):
+        """Crea las tablas FTS5 y sus triggers si no existen (y las llena la primera vez).
+        Usa una conexión y transacción propias: no confirma lo que tenga la sesión del request."""
+        bind = db.session.get_bind()
+        key = str(bind.url)
+        if key in self._sqlite_ready and not rebuild:
+            return
+
+        with bind.engine.begin() as connection:
+            exists = connection.execute(
+                text("SELECT 1 FROM sqlite_master WHERE type = 'table' AND name = 'products_fts'")
+            ).scalar()
+
+            for statement in SQLITE_FTS_DDL:
+                connection.execute(text(statement))
+            if rebuild or not exists:
+                for statement in SQLITE_FTS_REBUILD:
+                    connection.execute(text(statement))
+
+        self._sqlite_ready.add(key)
+
+    def _sqlite_match(self, tokens):
+        # Cada palabra como prefijo: "cami" encuentra "camiseta"
+        return ' AND '.join(f'"{token}"*' for token in tokens)
+
+    # =========================================================================
+    # POSTGRESQL tsvector
+    # =========================================================================
+
+    def _pg_tsquery(self, tokens):
+        return ' & '.join(f'{token}:*' for token in tokens)
+
+    # =========================================================================
+    # BÚSQUEDAS
+    # =========================================================================
+
+    def _load_in_order(self, model, ids):
+        """Carga las entidades en una consulta y respeta el orden de relevancia"""
+        if not ids:
+            return []
+        by_id = {obj.id: obj for obj in model.query.filter(model.id.in_(ids)).all()}
+        return [by_id[obj_id] for obj_id in ids if obj_id in by_id]
+
+    def search_products(self, term, limit=10, in_stock_only=True):
+        tokens = self.tokenize(term)
+        if not tokens:
+            return []
+
+        dialect = self._dialect()
+        stock_filter = 'AND p.in_stock' if in_stock_only else ''
+
+        if dialect == 'postgresql':
+            ids = db.session.execute(text(f"""
+                SELECT p.id
+                FROM products p, to_tsquery('es_unaccent', :query) query
+                WHERE p.search_vector @@ query {stock_filter}
+                ORDER BY ts_rank_cd(p.search_vector, query) DESC, p.name
+                LIMIT :limit
+            """), {'query': self._pg_tsquery(tokens), 'limit': limit}).scalars().all()
+            return self._load_in_order(Product, ids)
+
+        if dialect == 'sqlite':
+            self.ensure_sqlite_index()
+            # bm25: menor es más relevante; pesos por columna (nombre > categoría > ... > descripción)
+            ids = db.session.execute(text(f"""
+                SELECT f.product_id
+                FROM products_fts f JOIN products p ON p.id = f.product_id
+                WHERE products_fts MATCH :query {stock_filter}
+                ORDER BY bm25(products_fts, 0.0, 10.0, 5.0, 4.0, 3.0, 3.0, 1.0), p.name
+                LIMIT :limit
+            """), {'query': self._sqlite_match(tokens), 'limit': limit}).scalars().all()
+            return self._load_in_order(Product, ids)
+
+        pattern = f'%{term}%'
+        query = Product.query.join(Category).filter(or_(
+            Product.name.ilike(pattern),
+            Product.description.ilike(pattern),
+            Product.subcategory.ilike(pattern),
+            Product.material.ilike(pattern),
+            Product.origen.ilike(pattern),
+            Category.name.ilike(pattern)
+        ))
+        if in_stock_only:
+            query = query.filter(Product.in_stock == True)
+        return query.limit(limit).all()
+
+    def search_saints(self, term, limit=5):
+        tokens = self.tokenize(term)
+        if not tokens:
+            return []
+
+        dialect = self._dialect()
+
+        if dialect == 'postgresql':
+            ids = db.session.execute(text("""
+                SELECT s.id
+                FROM saints s, to_tsquery('es_unaccent', :query) query
+                WHERE s.search_vector @@ query AND s.is_active
+                ORDER BY ts_rank_cd(s.search_vector, query) DESC, s.name
+                LIMIT :limit
+            """), {'query': self._pg_tsquery(tokens), 'limit': limit}).scalars().all()
+            return self._load_in_order(Saint, ids)
+
+        if dialect == 'sqlite':
+            self.ensure_sqlite_index()
+            ids = db.session.execute(text("""
+                SELECT f.saint_id
+                FROM saints_fts f JOIN saints s ON s.id = f.saint_id
+                WHERE saints_fts MATCH :query AND s.is_active
+                ORDER BY bm25(saints_fts, 0.0, 10.0, 5.0, 3.0, 1.0), s.name
+                LIMIT :limit
+            """), {'query': self._sqlite_match(tokens), 'limit': limit}).scalars().all()
+            return self._load_in_order(Saint, ids)
+
+        pattern = f'%{term}%'
+        return Saint.query.filter(or_(
+            Saint.name.ilike(pattern),
+            Saint.summary.ilike(pattern),
+            Saint.biography.ilike(pattern),
+            Saint.patronage.ilike(pattern)
+        )).filter(Saint.is_active == True).limit(limit).all()
+
+
+search_service = SearchService()
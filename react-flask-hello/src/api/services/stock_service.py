@@ -0,0 +1,161 @@
+import os
+from datetime import datetime, timedelta
+from sqlalchemy import update, insert, select
+from api.models import db, Product, Order, StockReservation, OrderStatusEnum, generate_uuid
+from api.cache import mark_catalog_changed
+
+
+class InsufficientStockError(Exception):
+    """No hay unidades suficientes de un producto para reservar"""
+
+    def __init__(self, product_id, requested):
+        self.product_id = product_id
+        self.requested = requested
+        super().__init__(f'Insufficient stock for product {product_id} (requested {requested})')
+
+
+class StockService:
+    """Reservas de stock con UPDATE condicionales: nunca se lee y luego se escribe el stock,
+    así que no hay sobreventa ni bloqueos largos sobre los productos más vendidos.
+    Ningún método hace commit; la reserva vive en la misma transacción que la orden.
+    Los UPDATE de stock no tocan updated_at ni la versión del catálogo (inventory_only);
+    solo invalidan las cachés cuando un producto se agota o vuelve a tener stock."""
+
+    def __init__(self):
+        self.ttl = timedelta(minutes=int(os.getenv('STOCK_RESERVATION_TTL_MINUTES', '30')))
+
+    def reserve(self, order, lines):
+        """Descuenta el stock de cada producto de la orden y registra las reservas.
+        lines: iterable de (product_id, quantity). Lanza InsufficientStockError si
+        algún producto no alcanza (quien llama debe hacer rollback).
+        Los productos sin inventario (stock_quantity 0/NULL y en venta) no se limitan
+        ni se reservan; la disponibilidad la define solo in_stock."""
+        per_product = {}
+        for product_id, quantity in lines:
+            per_product[product_id] = per_product.get(product_id, 0) + quantity
+
+        reserved = {}
+        # Orden fijo de productos para evitar deadlocks entre checkouts concurrentes
+        for product_id in sorted(per_product):
+            quantity = per_product[product_id]
+            remaining = db.session.execute(
+                update(Product)
+                .where(Product.id == product_id, Product.stock_quantity >= quantity)
+                .values(
+                    stock_quantity=Product.stock_quantity - quantity,
+                    in_stock=(Product.stock_quantity - quantity) > 0,
+                    updated_at=Product.updated_at
+                )
+                .returning(Product.stock_quantity)
+                .execution_options(synchronize_session=False, inventory_only=True)
+            ).scalar_one_or_none()
+            if remaining is not None:
+                reserved[product_id] = quantity
+                if remaining <= 0:
+                    mark_catalog_changed(db.session, Product.__tablename__)
+            elif not self._is_untracked(product_id):
+                raise InsufficientStockError(product_id, quantity)
+
+        if not reserved:
+            return
+
+        expires_at = datetime.utcnow() + self.ttl
+        db.session.execute(insert(StockReservation), [
+            {
+                'id': generate_uuid(),
+                'order_id': order.id,
+                'product_id': product_id,
+                'quantity': quantity,
+                'status': 'active',
+                'expires_at': expires_at
+            }
+            for product_id, quantity in reserved.items()
+        ])
+
+    def _is_untracked(self, product_id):
+        """Sin inventario cargado: stock 0/NULL pero marcado en venta. Uno que se
+        agotó por ventas queda con in_stock=False (ver reserve) y sí cuenta como agotado."""
+        row = db.session.execute(
+            select(Product.stock_quantity, Product.in_stock).where(Product.id == product_id)
+        ).first()
+        return row is not None and not row.stock_quantity and row.in_stock is not False
+
+    def _reservations(self, order_id, statuses):
+        return db.session.execute(
+            select(StockReservation.id, StockReservation.product_id, StockReservation.quantity, StockReservation.status)
+            .where(StockReservation.order_id == order_id, StockReservation.status.in_(statuses))
+        ).all()
+
+    def _mark(self, reservation, status):
+        """Cambia el estado de una reserva; True solo si esta llamada la cambió"""
+        result = db.session.execute(
+            update(StockReservation)
+            .where(StockReservation.id == reservation.id, StockReservation.status == reservation.status)
+            .values(status=status)
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount == 1
+
+    def release_order(self, order):
+        """Devuelve al stock las unidades de la orden, esté pagada o no (idempotente)"""
+        released = 0
+        for reservation in self._reservations(order.id, ('active', 'committed')):
+            if not self._mark(reservation, 'released'):
+                continue  # Otra petición ya la liberó
+
+            stock = db.session.execute(
+                update(Product)
+                .where(Product.id == reservation.product_id)
+                .values(
+                    stock_quantity=Product.stock_quantity + reservation.quantity,
+                    in_stock=True,
+                    updated_at=Product.updated_at
+                )
+                .returning(Product.stock_quantity)
+                .execution_options(synchronize_session=False, inventory_only=True)
+            ).scalar_one_or_none()
+            if stock == reservation.quantity:
+                # Estaba agotado y vuelve a estar disponible
+                mark_catalog_changed(db.session, Product.__tablename__)
+            released += 1
+        return released
+
+    def commit_order(self, order):
+        """La orden se pagó/avanzó: el descuento de stock pasa a ser definitivo"""
+        committed = 0
+        for reservation in self._reservations(order.id, ('active',)):
+            if self._mark(reservation, 'committed'):
+                committed += 1
+        return committed
+
+    def release_expired(self, now=None, limit=500):
+        """Cancela las órdenes PENDING cuya reserva expiró (lo que libera su stock).
+        Hace commit por orden para no retener bloqueos. Devuelve cuántas se cancelaron."""
+        from api.services.order_service import order_service
+
+        now = now or datetime.utcnow()
+        order_ids = db.session.execute(
+            select(StockReservation.order_id)
+            .where(StockReservation.status == 'active', StockReservation.expires_at < now)
+            .distinct()
+            .limit(limit)
+        ).scalars().all()
+
+        cancelled = 0
+        for order_id in order_ids:
+            order = db.session.get(Order, order_id)
+            if order and order.status == OrderStatusEnum.PENDING:
+                if order_service.change_status(order, OrderStatusEnum.CANCELLED):
+                    cancelled += 1
+            elif order:
+                # Estado inconsistente (orden ya avanzada o cancelada): solo cerrar la reserva
+                if order.status == OrderStatusEnum.CANCELLED:
+                    self.release_order(order)
+                else:
+                    self.commit_order(order)
+            db.session.commit()
+
+        return cancelled
+
+
+stock_service = StockService()
@@ -0,0 +1,247 @@
+import os
+import re
+import time
+import threading
+import unicodedata
+from bisect import bisect_left, insort
+from sqlalchemy import event
+from sqlalchemy.orm import Session
+from api.models import db, Product, Category, Saint
+
+WORD_RE = re.compile(r'\w+', re.UNICODE)
+
+# Respaldo: cada cuánto se reconstruye desde la base (cambios hechos por otros
+# workers o con UPDATE masivos que no pasan por la sesión)
+MAX_INDEX_AGE = int(os.getenv('SUGGEST_INDEX_MAX_AGE', '300'))
+
+# Orden de tipos cuando dos sugerencias empatan
+KIND_PRIORITY = {'product': 0, 'saint': 1, 'category': 2, 'material': 3}
+
+
+def fold(value):
+    """Minúsculas, sin tildes y con espacios simples: 'San José ' -> 'san jose'"""
+    decomposed = unicodedata.normalize('NFKD', value or '')
+    without_accents = ''.join(ch for ch in decomposed if not unicodedata.combining(ch))
+    return ' '.join(WORD_RE.findall(without_accents.lower()))
+
+
+class SuggestIndex:
+    """Índice de prefijos en memoria para el autocompletado de la búsqueda.
+    Es una lista ordenada de (clave, tipo, id) consultada con bisect: cada texto
+    se indexa desde el inicio de cada palabra, así 'jose' encuentra 'San José'.
+    Se actualiza al hacer commit de Product/Category/Saint (eventos de sesión)."""
+
+    def __init__(self):
+        self._lock = threading.Lock()
+        self._keys = []          # [(clave, tipo, id)] ordenada
+        self._entries = {}       # (tipo, id) -> (texto visible, [claves])
+        self._categories = {}    # category_id -> nombre
+        self._materials = {}     # material plegado -> (texto visible, nº de productos)
+        self._product_materials = {}  # product_id -> material plegado
+        self._built_at = 0.0
+
+    # =========================================================================
+    # ESTRUCTURA
+    # =========================================================================
+
+    def _remove(self, kind, entry_id):
+        entry = self._entries.pop((kind, entry_id), None)
+        if not entry:
+            return
+        for key in entry[1]:
+            position = bisect_left(self._keys, (key, kind, entry_id))
+            if position < len(self._keys) and self._keys[position] == (key, kind, entry_id):
+                del self._keys[position]
+
+    def _add(self, kind, entry_id, text):
+        self._remove(kind, entry_id)
+        folded = fold(text)
+        if not folded:
+            return
+
+        words = folded.split(' ')
+        keys = [' '.join(words[i:]) for i in range(len(words))]
+        for key in keys:
+            insort(self._keys, (key, kind, entry_id))
+        self._entries[(kind, entry_id)] = (text, keys)
+
+    def _set_product_material(self, product_id, material):
+        """Los materiales se sugieren una vez aunque los usen varios productos"""
+        old = self._product_materials.pop(product_id, None)
+        if old:
+            text, count = self._materials[old]
+            if count <= 1:
+                del self._materials[old]
+                self._remove('material', old)
+            else:
+                self._materials[old] = (text, count - 1)
+
+        new = fold(material) if material else ''
+        if new:
+            text, count = self._materials.get(new, (material.strip(), 0))
+            self._materials[new] = (text, count + 1)
+            self._product_materials[product_id] = new
+            if count == 0:
+                self._add('material', new, text)
+
+    def _apply_product(self, product_id, name, material, visible):
+        if visible:
+            self._add('product', product_id, name)
+            self._set_product_material(product_id, material)
+        else:
+            self._remove('product', product_id)
+            self._set_product_material(product_id, None)
+
+    def _apply_saint(self, saint_id, name, visible):
+        if visible:
+            self._add('saint', saint_id, name)
+        else:
+            self._remove('saint', saint_id)
+
+    def _apply_category(self, category_id, name, visible):
+        if visible:
+            self._categories[category_id] = name
+            self._add('category', category_id, name)
+        else:
+            self._categories.pop(category_id, None)
+            self._remove('category', category_id)
+
+    # =========================================================================
+    # CONSTRUCCIÓN Y ACTUALIZACIÓN
+    # =========================================================================
+
+    def rebuild(self):
+        """Reconstrucción completa (3 consultas livianas con solo las columnas necesarias)"""
+        products = db.session.query(Product.id, Product.name, Product.material)\
+            .filter(Product.in_stock == True).all()
+        saints = db.session.query(Saint.id, Saint.name).filter(Saint.is_active == True).all()
+        categories = db.session.query(Category.id, Category.name).all()
+
+        fresh = SuggestIndex()
+        for product in products:
+            fresh._apply_product(product.id, product.name, product.material, True)
+        for saint in saints:
+            fresh._apply_saint(saint.id, saint.name, True)
+        for category in categories:
+            fresh._apply_category(category.id, category.name, True)
+
+        with self._lock:
+            self._keys = fresh._keys
+            self._entries = fresh._entries
+            self._categories = fresh._categories
+            self._materials = fresh._materials
+            self._product_materials = fresh._product_materials
+            self._built_at = time.monotonic()
+
+    def apply_changes(self, changes):
+        """Aplica los cambios capturados en un commit: [(tipo, id, datos | None)]"""
+        if not self._built_at:
+            return  # Aún no se construyó; se hará completo en la primera consulta
+
+        with self._lock:
+            for kind, entry_id, data in changes:
+                if kind == 'product':
+                    self._apply_product(entry_id, data and data['name'], data and data['material'],
+                                        bool(data and data['visible']))
+                elif kind == 'saint':
+                    self._apply_saint(entry_id, data and data['name'], bool(data and data['visible']))
+                elif kind == 'category':
+                    self._apply_category(entry_id, data and data['name'], data is not None)
+
+    def invalidate(self):
+        with self._lock:
+            self._built_at = 0.0
+
+    # =========================================================================
+    # CONSULTA
+    # =========================================================================
+
+    def suggest(self, term, limit=8):
+        """Sugerencias para el prefijo escrito; sin consultas a la base salvo al
+        construir el índice la primera vez o cuando vence MAX_INDEX_AGE"""
+        prefix = fold(term)
+        if not prefix:
+            return []
+
+        if not self._built_at or time.monotonic() - self._built_at > MAX_INDEX_AGE:
+            self.rebuild()
+
+        matches = {}
+        with self._lock:
+            position = bisect_left(self._keys, (prefix,))
+            scanned = 0
+            # Se revisan más candidatos que limit para poder priorizar coincidencias al inicio
+            while position < len(self._keys) and scanned < limit * 10:
+                key, kind, entry_id = self._keys[position]
+                if not key.startswith(prefix):
+                    break
+                text, keys = self._entries[(kind, entry_id)]
+                starts_text = key == keys[0]
+                best = matches.get((kind, entry_id))
+                if best is None or (starts_text and not best[0]):
+                    matches[(kind, entry_id)] = (starts_text, text)
+                position += 1
+                scanned += 1
+
+        ranked = sorted(
+            matches.items(),
+            key=lambda item: (not item[1][0], KIND_PRIORITY[item[0][0]], len(item[1][1]), item[1][1])
+        )
+        return [
+            {'text': text, 'type': kind, 'id': entry_id if kind != 'material' else None}
+            for (kind, entry_id), (_, text) in ranked[:limit]
+        ]
+
+    def stats(self):
+        with self._lock:
+            return {
+                'keys': len(self._keys),
+                'entries': len(self._entries),
+                'age_seconds': round(time.monotonic() - self._built_at, 1) if self._built_at else None
+            }
+
+
+suggest_index = SuggestIndex()
+
+
+# =============================================================================
+# EVENTOS DE SESIÓN: captura en el flush, aplica solo si la transacción hace commit
+# =============================================================================
+
+def _snapshot(obj, deleted):
+    if isinstance(obj, Product):
+        data = None if deleted else {'name': obj.name, 'material': obj.material, 'visible': obj.in_stock is not False}
+        return ('product', obj.id, data)
+    if isinstance(obj, Saint):
+        data = None if deleted else {'name': obj.name, 'visible': obj.is_active is not False}
+        return ('saint', obj.id, data)
+    if isinstance(obj, Category):
+        return ('category', obj.id, None if deleted else {'name': obj.name})
+    return None
+
+
+@event.listens_for(Session, 'after_flush')
+def _collect_suggest_changes(session, flush_context):
+    changes = []
+    for obj in list(session.new) + list(session.dirty):
+        change = _snapshot(obj, deleted=False)
+        if change:
+            changes.append(change)
+    for obj in session.deleted:
+        change = _snapshot(obj, deleted=True)
+        if change:
+            changes.append(change)
+    if changes:
+        session.info.setdefault('suggest_changes', []).extend(changes)
+
+
+@event.listens_for(Session, 'after_commit')
+def _apply_suggest_changes(session):
+    changes = session.info.pop('suggest_changes', None)
+    if changes:
+        suggest_index.apply_changes(changes)
+
+
+@event.listens_for(Session, 'after_soft_rollback')
+def _discard_suggest_changes(session, previous_transaction):
+    session.info.pop('suggest_changes', None)
@@ -0,0 +1,119 @@
+from sqlalchemy import update, select, func, case
+from api.models import db, User, Order, COMPLETED_ORDER_STATUSES
+
+
+class UserStatsService:
+    """Estadísticas de compra de los usuarios (total_orders, total_spent, last_order_date).
+    total_orders y total_spent cuentan solo órdenes completadas (CONFIRMED/DELIVERED);
+    last_order_date es la orden más reciente en cualquier estado."""
+
+    def _stats_subquery(self, first_id, last_id):
+        """Agregados por usuario para un rango de ids (una sola pasada sobre orders)"""
+        completed = Order.status.in_(COMPLETED_ORDER_STATUSES)
+
+        return select(
+            Order.user_id.label('user_id'),
+            func.sum(case((completed, 1), else_=0)).label('total_orders'),
+            func.coalesce(func.sum(case((completed, Order.total), else_=0.0)), 0.0).label('total_spent'),
+            func.max(Order.created_at).label('last_order_date')
+        ).where(
+            Order.user_id >= first_id,
+            Order.user_id <= last_id
+        ).group_by(Order.user_id).subquery()
+
+    def _recalculate_range(self, first_id, last_id):
+        """Recalcula un rango de ids con dos UPDATE; no hace commit"""
+        # Usuarios sin órdenes quedan en cero
+        db.session.execute(
+            update(User)
+            .where(User.id >= first_id, User.id <= last_id)
+            .values(total_orders=0, total_spent=0.0, last_order_date=None)
+            .execution_options(synchronize_session=False)
+        )
+
+        stats = self._stats_subquery(first_id, last_id)
+        result = db.session.execute(
+            update(User)
+            .where(User.id == stats.c.user_id)
+            .values(
+                total_orders=stats.c.total_orders,
+                total_spent=stats.c.total_spent,
+                last_order_date=stats.c.last_order_date
+            )
+            .execution_options(synchronize_session=False)
+        )
+        return result.rowcount
+
+    def recalculate_all(self, chunk_size=1000, progress=None):
+        """Recalcula todos los usuarios por rangos de id, con un commit por rango.
+        Devuelve (usuarios procesados, usuarios con órdenes)."""
+        if chunk_size < 1:
+            raise ValueError('chunk_size must be >= 1')
+        min_id, max_id = db.session.query(func.min(User.id), func.max(User.id)).one()
+        if min_id is None:
+            return 0, 0
+
+        processed = 0
+        with_orders = 0
+        first_id = min_id
+
+        while first_id <= max_id:
+            last_id = first_id + chunk_size - 1
+
+            with_orders += self._recalculate_range(first_id, last_id)
+            processed += db.session.query(func.count(User.id))\
+                .filter(User.id >= first_id, User.id <= last_id)\
+                .scalar()
+            db.session.commit()
+
+            if progress:
+                progress(first_id, min(last_id, max_id), processed)
+
+            first_id = last_id + 1
+
+        db.session.expire_all()
+        return processed, with_orders
+
+    def recalculate_user(self, user_id):
+        """Recalcula un solo usuario; el commit lo hace quien llama"""
+        self._recalculate_range(user_id, user_id)
+        user = db.session.get(User, user_id)
+        if user:
+            db.session.refresh(user)
+        return user
+
+    # =========================================================================
+    # ACTUALIZACIÓN INCREMENTAL (hot path de órdenes)
+    # =========================================================================
+
+    def apply_order_delta(self, order, sign):
+        """Suma (sign=1) o resta (sign=-1) una orden completada a las estadísticas
+        del usuario con un UPDATE atómico; no depende del historial del cliente.
+        La idempotencia la garantiza order_service (solo se llama en transiciones reales)."""
+        if not order.user_id:
+            return
+
+        db.session.execute(
+            update(User)
+            .where(User.id == order.user_id)
+            .values(
+                total_orders=func.coalesce(User.total_orders, 0) + sign,
+                total_spent=func.coalesce(User.total_spent, 0.0) + sign * (order.total or 0.0)
+            )
+            .execution_options(synchronize_session=False)
+        )
+
+    def register_new_order(self, order):
+        """Al crear una orden solo cambia last_order_date (nace PENDING, no cuenta como completada)"""
+        if not order.user_id:
+            return
+
+        db.session.execute(
+            update(User)
+            .where(User.id == order.user_id)
+            .values(last_order_date=func.now())
+            .execution_options(synchronize_session=False)
+        )
+
+
+user_stats_service = UserStatsService()
@@ -2,7 +2,12 @@ from flask import jsonify, url_for, request
 from functools import wraps
 import jwt
 import datetime
+import hashlib
 import os
+import time
+import logging
+
+logger = logging.getLogger(__name__)
 
 class APIException(Exception):
     status_code = 400
@@ -48,23 +53,22 @@ def generate_sitemap(app):
 # AUTHENTICATION UTILITIES 
 # =============================================================================
 
+# La clave se lee una sola vez por proceso (antes se leía y se imprimía en cada request)
+_jwt_secret = None
+
 def get_jwt_secret():
     """
     Obtiene la clave secreta JWT de forma consistente
     ✅ Prioriza JWT_SECRET_KEY, fallback a FLASK_APP_KEY para compatibilidad
     """
-    secret = os.getenv('JWT_SECRET_KEY') or os.getenv('FLASK_APP_KEY')
-
-     # ✅ DEBUG TEMPORAL
-    print(f"🔑 DEBUG JWT SECRET:")
-    print(f"   - JWT_SECRET_KEY: {os.getenv('JWT_SECRET_KEY')}")
-    print(f"   - FLASK_APP_KEY: {os.getenv('FLASK_APP_KEY')}")
-    print(f"   - Secret usado: {secret[:10]}...")  # Solo primeros 10 chars por seguridad
-
-    if not secret:
-        print("⚠️ WARNING: No JWT secret key found in environment variables")
-        return 'peregrinos-super-secret-key-2025-dev'  # Fallback solo para desarrollo
-    return secret
+    global _jwt_secret
+    if _jwt_secret is None:
+        secret = os.getenv('JWT_SECRET_KEY') or os.getenv('FLASK_APP_KEY')
+        if not secret:
+            logger.warning("⚠️ WARNING: No JWT secret key found in environment variables")
+            secret = 'peregrinos-super-secret-key-2025-dev'  # Fallback solo para desarrollo
+        _jwt_secret = secret
+    return _jwt_secret
 
 def generate_token(user_id, role='user'):
     """
@@ -101,245 +105,175 @@ def generate_token(user_id, role='user'):
             algorithm='HS256'
         )
         
-        print(f"✅ Token generado exitosamente para user_id={user_id}, role={role}")
-        print(f"   - sub como string: '{user_id_str}'")
+        logger.debug("✅ Token generado exitosamente para user_id=%s, role=%s", user_id, role)
         return token
         
     except Exception as e:
-        print(f"❌ Error generando token: {str(e)}")
+        logger.error("❌ Error generando token: %s", e)
         raise e
 
-def token_required(f):
+# =============================================================================
+# CACHÉS DE AUTENTICACIÓN
+# =============================================================================
+
+# Roles con acceso al panel de administración
+ADMIN_ROLES = ('superadmin', 'admin', 'editor', 'content_manager')
+
+# Tiempo máximo que se confía en el estado/rol de un AdminUser leído de la base
+ADMIN_PRINCIPAL_TTL = int(os.getenv('ADMIN_PRINCIPAL_TTL', '30'))
+
+
+def _token_cache():
+    from api.cache import get_cache
+    return get_cache('auth_tokens', maxsize=int(os.getenv('AUTH_TOKEN_CACHE_SIZE', '4096')), ttl=3600)
+
+
+def _principal_cache():
+    from api.cache import get_cache
+    return get_cache('admin_principals', maxsize=1024, ttl=ADMIN_PRINCIPAL_TTL)
+
+
+def decode_claims(token):
     """
-    Decorador para verificar token JWT en rutas protegidas
-    ✅ Mejorado con logging y soporte para CORS OPTIONS
-    
-    Usage:
-        @api.route('/protected', methods=['GET'])
-        @token_required
-        def protected_route(current_user_id, current_user_role):
-            return jsonify({'message': 'Access granted'})
+    Verifica un token HS256 y devuelve sus claims.
+    Los claims verificados se guardan (LRU acotado) con clave = SHA-256 del token y
+    vencen junto con 'exp', así un mismo token no se vuelve a verificar en cada request.
+    Lanza jwt.ExpiredSignatureError / jwt.InvalidTokenError como jwt.decode.
     """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        # ✅ Permitir OPTIONS sin autenticación (CORS preflight)
-        if request.method == 'OPTIONS':
-            print("✅ OPTIONS request - permitiendo sin autenticación")
-            return '', 200
-        
-        print(f"🔐 token_required: Verificando {request.method} {request.path}")
-        
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            print("❌ Token faltante en headers")
-            return jsonify({
-                'success': False,
-                'message': 'Token is missing',
-                'error': 'Authorization header required'
-            }), 401
-        
-        try:
-            # Extraer token del formato "Bearer <token>"
-            if token.startswith('Bearer '):
-                token = token[7:]
-            elif token.startswith('bearer '):
-                token = token[7:]
-            
-            secret_key = get_jwt_secret()
-            
-            # Decodificar token
-            data = jwt.decode(token, secret_key, algorithms=['HS256'])
-            
+    cache = _token_cache()
+    digest = hashlib.sha256(token.encode('utf-8')).digest()
+
+    claims = cache.get(digest)
+    if claims is not None:
+        return claims
+
+    claims = jwt.decode(token, get_jwt_secret(), algorithms=['HS256'])
+
+    expires_in = claims.get('exp', time.time() + cache.ttl) - time.time()
+    if expires_in > 0:
+        cache.set(digest, claims, ttl=min(expires_in, cache.ttl))
+    return claims
+
+
+def get_admin_principal(admin_user_id):
+    """(is_active, role) del AdminUser o None si no existe; cacheado ADMIN_PRINCIPAL_TTL segundos"""
+    admin_user_id = str(admin_user_id)
+    cache = _principal_cache()
+    principal = cache.get(admin_user_id)
+    if principal is None:
+        from api.models import db, AdminUser
+        row = db.session.query(AdminUser.is_active, AdminUser.role).filter(AdminUser.id == admin_user_id).first()
+        principal = (bool(row.is_active), row.role) if row else False
+        cache.set(admin_user_id, principal)
+    return principal or None
+
+
+def invalidate_admin_principal(admin_user_id):
+    """Llamar después de cambiar rol/estado o eliminar un AdminUser"""
+    _principal_cache().delete(str(admin_user_id))
+
+
+def _bearer_token():
+    token = request.headers.get('Authorization')
+    if not token:
+        return None
+    if token[:7].lower() == 'bearer ':
+        token = token[7:]
+    return token
+
+
+# =============================================================================
+# DECORADORES DE AUTENTICACIÓN
+# =============================================================================
+
+def auth_required(roles=None, verify_admin_user=False, pass_identity=True):
+    """
+    Decorador parametrizable en el que se basan token_required, admin_required y
+    superadmin_required.
+
+    Args:
+        roles (tuple): Roles permitidos (None = cualquier token válido)
+        verify_admin_user (bool): Además exige que el AdminUser exista, esté activo y
+            que su rol actual (en la base, no el del token) esté en roles
+        pass_identity (bool): Pasa current_user_id y current_user_role a la vista
+    """
+    allowed_roles = tuple(role.lower() for role in roles) if roles else None
+
+    def decorator(f):
+        @wraps(f)
+        def decorated(*args, **kwargs):
+            # ✅ Permitir OPTIONS sin autenticación (CORS preflight)
+            if request.method == 'OPTIONS':
+                return '', 200
+
+            token = _bearer_token()
+            if not token:
+                return jsonify({
+                    'success': False,
+                    'message': 'Token is missing',
+                    'error': 'Authorization header required'
+                }), 401
+
+            try:
+                data = decode_claims(token)
+            except jwt.ExpiredSignatureError:
+                return jsonify({
+                    'success': False,
+                    'message': 'Token has expired',
+                    'error': 'Please login again'
+                }), 401
+            except jwt.InvalidTokenError as e:
+                logger.info("❌ Token inválido en %s %s: %s", request.method, request.path, e)
+                return jsonify({
+                    'success': False,
+                    'message': 'Token is invalid',
+                    'error': str(e)
+                }), 401
+
             # ✅ Extraer user_id (puede estar como 'sub' o 'user_id')
             current_user_id = data.get('user_id') or data.get('sub')
             current_user_role = data.get('role', 'user')
-            
+
             if not current_user_id:
-                print("❌ Token no contiene user_id ni sub")
                 return jsonify({
                     'success': False,
                     'message': 'Invalid token structure',
                     'error': 'Token must contain user_id or sub'
                 }), 401
-            
-            print(f"✅ Token válido - user_id: {current_user_id}, role: {current_user_role}")
-
-        except jwt.ExpiredSignatureError:
-            print("⏰ Token expirado")
-            return jsonify({
-                'success': False,
-                'message': 'Token has expired',
-                'error': 'Please login again'
-            }), 401
-        except jwt.InvalidTokenError as e:
-            print(f"❌ Token inválido: {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': 'Token is invalid',
-                'error': str(e)
-            }), 401
-        except Exception as e:
-            print(f"❌ Error inesperado validando token: {str(e)}")
-            import traceback
-            traceback.print_exc()
-            return jsonify({
-                'success': False,
-                'message': 'Error validating token',
-                'error': str(e)
-            }), 401
-        
-        # Ejecutar la función protegida pasando user_id y role
-        return f(current_user_id, current_user_role, *args, **kwargs)
-    
-    return decorated
 
-def admin_required(f):
-    """
-    Decorador para verificar que el usuario tiene rol de administrador
-    ✅ Verifica roles: superadmin, admin, editor, content_manager
-    
-    Usage:
-        @api.route('/admin/dashboard', methods=['GET'])
-        @admin_required
-        def admin_dashboard(current_user_id, current_user_role):
-            return jsonify({'message': 'Admin area'})
-    """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        # ✅ Permitir OPTIONS sin autenticación
-        if request.method == 'OPTIONS':
-            return '', 200
-        
-        print(f"🔐 admin_required: Verificando {request.method} {request.path}")
-        
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            print("❌ Token faltante")
-            return jsonify({
-                'success': False,
-                'message': 'Token is missing',
-                'error': 'Authorization required'
-            }), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            secret_key = get_jwt_secret()
-            data = jwt.decode(token, secret_key, algorithms=['HS256'])
-            
-            current_user_id = data.get('user_id') or data.get('sub')
-            current_user_role = data.get('role', 'user')
-            
-            # ✅ Verificar rol de admin
-            admin_roles = ['superadmin', 'admin', 'editor', 'content_manager']
-            if current_user_role.lower() not in admin_roles:
-                print(f"⛔ Acceso denegado - role: {current_user_role} no es admin")
-                return jsonify({
-                    'success': False,
-                    'message': 'Admin access required',
-                    'error': f'Your role ({current_user_role}) does not have admin privileges'
-                }), 403
-            
-            print(f"✅ Admin verificado - user_id: {current_user_id}, role: {current_user_role}")
-            
-        except jwt.ExpiredSignatureError:
-            print("⏰ Token expirado")
-            return jsonify({
-                'success': False,
-                'message': 'Token has expired'
-            }), 401
-        except jwt.InvalidTokenError as e:
-            print(f"❌ Token inválido: {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': 'Token is invalid'
-            }), 401
-        except Exception as e:
-            print(f"❌ Error validando admin: {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': 'Error validating credentials'
-            }), 401
-        
-        return f(current_user_id, current_user_role, *args, **kwargs)
-    
-    return decorated
+            if verify_admin_user:
+                principal = get_admin_principal(data.get('sub') or current_user_id)
+                if not principal or not principal[0]:
+                    return jsonify({'success': False, 'error': 'Admin user not found or inactive'}), 401
+                current_user_role = principal[1]
 
-def superadmin_required(f):
-    """
-    Decorador para verificar que el usuario es superadmin
-    ✅ Solo permite acceso a usuarios con rol 'superadmin'
-    
-    Usage:
-        @api.route('/superadmin/settings', methods=['GET'])
-        @superadmin_required
-        def superadmin_settings(current_user_id, current_user_role):
-            return jsonify({'message': 'Superadmin area'})
-    """
-    @wraps(f)
-    def decorated(*args, **kwargs):
-        # ✅ Permitir OPTIONS sin autenticación
-        if request.method == 'OPTIONS':
-            return '', 200
-        
-        print(f"🔐 superadmin_required: Verificando {request.method} {request.path}")
-        
-        token = request.headers.get('Authorization')
-        
-        if not token:
-            print("❌ Token faltante")
-            return jsonify({
-                'success': False,
-                'message': 'Token is missing',
-                'error': 'Authorization required'
-            }), 401
-        
-        try:
-            if token.startswith('Bearer '):
-                token = token[7:]
-            
-            secret_key = get_jwt_secret()
-            data = jwt.decode(token, secret_key, algorithms=['HS256'])
-            
-            current_user_id = data.get('user_id') or data.get('sub')
-            current_user_role = data.get('role', 'user')
-            
-            # ✅ Verificar rol de superadmin
-            if current_user_role.lower() != 'superadmin':
-                print(f"⛔ Acceso denegado - role: {current_user_role} no es superadmin")
+            if allowed_roles and (current_user_role or '').lower() not in allowed_roles:
+                logger.warning("⛔ Acceso denegado a %s - role: %s", request.path, current_user_role)
                 return jsonify({
                     'success': False,
-                    'message': 'Superadmin access required',
-                    'error': f'Your role ({current_user_role}) does not have superadmin privileges'
+                    'message': 'Superadmin access required' if allowed_roles == ('superadmin',) else 'Admin access required',
+                    'error': f'Your role ({current_user_role}) does not have the required privileges'
                 }), 403
-            
-            print(f"✅ Superadmin verificado - user_id: {current_user_id}")
-            
-        except jwt.ExpiredSignatureError:
-            print("⏰ Token expirado")
-            return jsonify({
-                'success': False,
-                'message': 'Token has expired'
-            }), 401
-        except jwt.InvalidTokenError as e:
-            print(f"❌ Token inválido: {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': 'Token is invalid'
-            }), 401
-        except Exception as e:
-            print(f"❌ Error validando superadmin: {str(e)}")
-            return jsonify({
-                'success': False,
-                'message': 'Error validating credentials'
-            }), 401
-        
-        return f(current_user_id, current_user_role, *args, **kwargs)
-    
-    return decorated
+
+            if pass_identity:
+                return f(current_user_id, current_user_role, *args, **kwargs)
+            return f(*args, **kwargs)
+        return decorated
+    return decorator
+
+
+# Usage:
+#     @api.route('/protected', methods=['GET'])
+#     @token_required
+#     def protected_route(current_user_id, current_user_role):
+#         return jsonify({'message': 'Access granted'})
+token_required = auth_required()
+
+# ✅ Verifica roles: superadmin, admin, editor, content_manager
+admin_required = auth_required(roles=ADMIN_ROLES)
+
+# ✅ Solo permite acceso a usuarios con rol 'superadmin' (según el token)
+superadmin_required = auth_required(roles=('superadmin',))
 
 # =============================================================================
 # UTILIDADES ADICIONALES JWT
@@ -368,7 +302,7 @@ def decode_token(token):
         )
         return data
     except Exception as e:
-        print(f"❌ Error decodificando token: {str(e)}")
+        logger.warning("❌ Error decodificando token: %s", e)
         return None
 
 def refresh_token(old_token):
@@ -394,7 +328,7 @@ def refresh_token(old_token):
         
         return generate_token(user_id, role)
     except Exception as e:
-        print(f"❌ Error refrescando token: {str(e)}")
+        logger.warning("❌ Error refrescando token: %s", e)
         return None
 
 def verify_token_without_request(token):
@@ -412,8 +346,7 @@ def verify_token_without_request(token):
         if token.startswith('Bearer '):
             token = token[7:]
         
-        secret_key = get_jwt_secret()
-        data = jwt.decode(token, secret_key, algorithms=['HS256'])
+        data = decode_claims(token)
         
         user_id = data.get('user_id') or data.get('sub')
         role = data.get('role', 'user')
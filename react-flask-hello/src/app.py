@@ -2,6 +2,7 @@
 This module takes care of starting the API Server, Loading the DB and Adding the endpoints
 """
 import os
+import logging
 from flask import Flask, request, jsonify, url_for, send_from_directory
 from flask_migrate import Migrate
 from flask_swagger import swagger
@@ -11,6 +12,9 @@ from api.models import db
 from api.routes import api
 from api.admin import setup_admin
 from api.commands import setup_commands
+from api.json_provider import FastJSONProvider
+from api.logging_setup import setup_logging
+from api.services.activity_log_service import activity_log_writer
 from flask_jwt_extended import JWTManager
 
 ENV = "development" if os.getenv("FLASK_DEBUG") == "1" else "production"
@@ -19,6 +23,13 @@ static_file_dir = os.path.join(os.path.dirname(
 app = Flask(__name__)
 app.url_map.strict_slashes = False
 
+# JSON de las respuestas: orjson si está instalado (ver api/json_provider.py)
+app.json = FastJSONProvider(app)
+
+# Logging: niveles por entorno (LOG_LEVEL), JSON con request id, escritura en otro hilo
+setup_logging(app, ENV)
+logger = logging.getLogger('api.app')
+
 # =============================================================================
 # ✅ CORS CONFIGURATION - SEGURA PARA DESARROLLO Y PRODUCCIÓN
 # =============================================================================
@@ -32,7 +43,7 @@ if ENV == "development":
         "http://localhost:3001",
         "http://127.0.0.1:3001"
     ]
-    print("🔧 Modo DESARROLLO - CORS configurado para localhost")
+    logger.info("🔧 Modo DESARROLLO - CORS configurado para localhost")
 else:
     # Producción: solo tu dominio real
     allowed_origins = [
@@ -40,7 +51,7 @@ else:
         "https://www.tudominio.com",
         os.getenv("FRONTEND_URL", "https://tudominio.com")  # Usar variable de entorno
     ]
-    print(f"🔒 Modo PRODUCCIÓN - CORS configurado para: {allowed_origins}")
+    logger.info("🔒 Modo PRODUCCIÓN - CORS configurado para: %s", allowed_origins)
 
 CORS(app, 
      resources={
@@ -48,7 +59,7 @@ CORS(app,
              "origins": allowed_origins,
              "methods": ["GET", "POST", "PUT", "DELETE", "OPTIONS", "PATCH"],
              "allow_headers": ["Content-Type", "Authorization", "Accept"],
-             "expose_headers": ["Content-Type", "Authorization"],
+             "expose_headers": ["Content-Type", "Authorization", "X-Request-ID"],
              "supports_credentials": True,
              "max_age": 3600
          }
@@ -113,6 +124,9 @@ def expired_token_callback(jwt_header, jwt_payload):
 setup_admin(app)
 setup_commands(app)
 
+# Log de actividad de admins: escritura por lotes en un hilo aparte
+activity_log_writer.init_app(app)
+
 # ✅ IMPORTANTE: Registrar blueprint DESPUÉS de configurar CORS
 app.register_blueprint(api, url_prefix='/api')
 
@@ -172,7 +186,7 @@ def serve_uploaded_file(folder, filename):
         file_path = os.path.abspath(file_path)
         
         if not os.path.exists(file_path):
-            print(f"❌ File not found: {file_path}")
+            logger.warning("❌ File not found: %s", file_path)
             return jsonify({'error': 'File not found'}), 404
         
         return send_from_directory(
@@ -181,7 +195,7 @@ def serve_uploaded_file(folder, filename):
         )
         
     except Exception as e:
-        print(f"❌ Error serving file: {e}")
+        logger.error("❌ Error serving file: %s", e)
         return jsonify({'error': str(e)}), 500
 
 # =============================================================================
@@ -0,0 +1,129 @@
+"""
+Micro-benchmark de serialización JSON: respuesta de N órdenes (con items y producto)
+con el encoder estándar de Flask vs. FastJSONProvider (orjson si está instalado).
+No usa la base de datos: las órdenes se construyen en memoria.
+Ejecutar: python src/bench_json_serialization.py --orders 10000 --repeat 5
+"""
+
+import argparse
+import json
+import random
+import time
+from datetime import datetime, timedelta
+from flask.json.provider import DefaultJSONProvider
+
+from api.models import Order, OrderItem, Product, UserAddress, OrderStatusEnum
+from api.json_provider import FastJSONProvider
+from app import app
+
+
+def build_orders(count):
+    """Órdenes transitorias con 1-4 items y dirección, como las que devuelve /api/orders"""
+    random.seed(42)
+    products = [
+        Product(id=f'product-{i}', name=f'Camiseta San José {i}', price=45000 + i * 1000, category_id='cat')
+        for i in range(50)
+    ]
+    statuses = list(OrderStatusEnum)
+    now = datetime.now()
+
+    orders = []
+    for i in range(count):
+        order = Order(
+            id=f'order-{i:06d}',
+            user_id=i % 500,
+            customer_name=f'Cliente Peregrino {i}',
+            customer_email=f'cliente{i}@peregrinos.shop',
+            customer_phone='3001234567',
+            customer_address='Calle 123 # 45-67, Apto 801',
+            customer_city='Bogotá',
+            customer_department='Cundinamarca',
+            customer_postal_code='110111',
+            subtotal=0,
+            shipping=10000,
+            total=0,
+            status=statuses[i % len(statuses)],
+            created_at=now - timedelta(minutes=i),
+            updated_at=now,
+            user_address_id=f'address-{i % 500}'
+        )
+        order.user_address = UserAddress(
+            id=f'address-{i % 500}', user_id=i % 500, alias='Casa', phone='3001234567',
+            address='Calle 123 # 45-67', city='Bogotá', department='Cundinamarca',
+            is_primary=True, created_at=now, updated_at=now
+        )
+        subtotal = 0
+        for j in range(random.randint(1, 4)):
+            product = random.choice(products)
+            quantity = random.randint(1, 3)
+            order.items.append(OrderItem(
+                id=f'item-{i}-{j}', product_id=product.id, quantity=quantity,
+                size=random.choice(['S', 'M', 'L', 'XL']), price=product.price
+            ))
+            order.items[-1].product = product
+            subtotal += quantity * product.price
+        order.subtotal = subtotal
+        order.total = subtotal + order.shipping
+        orders.append(order)
+    return orders
+
+
+def measure(function, repeat):
+    """Mejor tiempo de repeat ejecuciones (en segundos) y el último resultado"""
+    best, result = None, None
+    for _ in range(repeat):
+        started = time.perf_counter()
+        result = function()
+        elapsed = time.perf_counter() - started
+        best = elapsed if best is None else min(best, elapsed)
+    return best, result
+
+
+def run_benchmark(order_count, repeat):
+    orders = build_orders(order_count)
+    standard = DefaultJSONProvider(app)
+    fast = FastJSONProvider(app)
+
+    print(f"🚀 {order_count} órdenes, mejor de {repeat} ejecuciones (backend rápido: {fast.backend})")
+
+    with app.app_context():
+        serialize_time, payload = measure(lambda: {
+            'orders': [order.serialize() for order in orders],
+            'total': len(orders)
+        }, repeat)
+
+        standard_time, standard_response = measure(lambda: standard.response(payload), repeat)
+        fast_time, fast_response = measure(lambda: fast.response(payload), repeat)
+
+        # Mismo contenido (el formato de espacios/escapes puede diferir)
+        same = json.loads(standard_response.get_data()) == json.loads(fast_response.get_data())
+
+        # Objetos sin pre-formatear (datetime y Enum tal cual): lo maneja el provider
+        raw = [{
+            'id': order.id,
+            'status': order.status,
+            'created_at': order.created_at,
+            'total': order.total
+        } for order in orders]
+        raw_time, _ = measure(lambda: fast.response(raw), repeat)
+
+    standard_size = len(standard_response.get_data())
+    fast_size = len(fast_response.get_data())
+
+    print(f"   serialize() de los modelos: {serialize_time * 1000:.1f}ms")
+    print(f"   json estándar (jsonify):    {standard_time * 1000:.1f}ms ({standard_size / 1024:.0f} KB)")
+    print(f"   FastJSONProvider:           {fast_time * 1000:.1f}ms ({fast_size / 1024:.0f} KB)")
+    print(f"   aceleración del encoding:   {standard_time / fast_time:.1f}x")
+    print(f"   datetime/Enum nativos:      {raw_time * 1000:.1f}ms")
+    print(f"   {'✅ Mismo contenido' if same else '❌ El contenido difiere'}")
+    return same
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de serialización JSON')
+    parser.add_argument('--orders', type=int, default=10000)
+    parser.add_argument('--repeat', type=int, default=5)
+    args = parser.parse_args()
+
+    ok = run_benchmark(args.orders, args.repeat)
+    raise SystemExit(0 if ok else 1)
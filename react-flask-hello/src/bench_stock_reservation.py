@@ -0,0 +1,103 @@
+"""
+Benchmark de concurrencia de la reserva de stock: muchos checkouts en paralelo
+contra un mismo producto. Verifica que nunca se venda más de lo que hay en stock.
+Ejecutar: python src/bench_stock_reservation.py --stock 50 --checkouts 300 --workers 32
+(usar contra PostgreSQL; SQLite serializa las escrituras y reportará bloqueos)
+"""
+
+import argparse
+import time
+from concurrent.futures import ThreadPoolExecutor
+from collections import Counter
+
+from api.models import db, Product, Category, Order, OrderItem, StockReservation
+from app import app
+
+
+def checkout(product_id, index):
+    """Un checkout de 1 unidad usando el endpoint real"""
+    client = app.test_client()
+    started = time.perf_counter()
+    response = client.post('/api/orders', json={
+        'customer_info': {
+            'name': f'Bench {index}',
+            'email': f'bench{index}@bench.peregrinos.shop',
+            'phone': '3000000000'
+        },
+        'items': [{'productId': product_id, 'quantity': 1, 'size': 'M'}],
+        'shipping': 0
+    })
+    return response.status_code, time.perf_counter() - started
+
+
+def run_benchmark(stock, checkouts, workers):
+    with app.app_context():
+        # Producto temporal solo para el benchmark
+        category = Category(name=f'Bench {int(time.time())}', description='Benchmark de stock')
+        db.session.add(category)
+        db.session.flush()
+
+        product = Product(
+            name='Bench SKU',
+            price=1000,
+            category_id=category.id,
+            stock_quantity=stock,
+            in_stock=True,
+            sizes=['M']
+        )
+        db.session.add(product)
+        db.session.commit()
+        product_id, category_id = product.id, category.id
+
+    print(f"🚀 {checkouts} checkouts en paralelo ({workers} hilos) contra un SKU con stock {stock}")
+
+    started = time.perf_counter()
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        results = list(pool.map(lambda i: checkout(product_id, i), range(checkouts)))
+    elapsed = time.perf_counter() - started
+
+    statuses = Counter(status for status, _ in results)
+    latencies = sorted(latency for _, latency in results)
+
+    with app.app_context():
+        product = db.session.get(Product, product_id)
+        reserved = db.session.query(db.func.coalesce(db.func.sum(StockReservation.quantity), 0))\
+            .filter(StockReservation.product_id == product_id, StockReservation.status == 'active')\
+            .scalar()
+
+        print(f"✅ Completado en {elapsed:.2f}s ({checkouts / elapsed:.1f} checkouts/s)")
+        print(f"   201 creadas: {statuses.get(201, 0)}")
+        print(f"   409 sin stock: {statuses.get(409, 0)}")
+        print(f"   otros: {sum(count for code, count in statuses.items() if code not in (201, 409))}")
+        print(f"   latencia p50: {latencies[len(latencies) // 2] * 1000:.1f}ms, "
+              f"p95: {latencies[int(len(latencies) * 0.95)] * 1000:.1f}ms")
+        print(f"   stock final: {product.stock_quantity} (in_stock={product.in_stock}), reservado: {reserved}")
+
+        oversold = statuses.get(201, 0) > stock or product.stock_quantity < 0
+        consistent = product.stock_quantity + reserved == stock
+        print(f"   {'❌ SOBREVENTA' if oversold else '✅ Sin sobreventa'}, "
+              f"{'✅ stock consistente' if consistent else '❌ stock inconsistente'}")
+
+        # Limpiar los datos del benchmark
+        order_ids = [order_id for (order_id,) in db.session.query(StockReservation.order_id)
+                     .filter(StockReservation.product_id == product_id)]
+        StockReservation.query.filter(StockReservation.product_id == product_id).delete()
+        OrderItem.query.filter(OrderItem.product_id == product_id).delete()
+        Order.query.filter(Order.id.in_(order_ids)).delete(synchronize_session=False)
+        Product.query.filter_by(id=product_id).delete()
+        Category.query.filter_by(id=category_id).delete()
+        db.session.commit()
+        print("🧹 Datos del benchmark eliminados")
+
+        return not oversold and consistent
+
+
+if __name__ == '__main__':
+    parser = argparse.ArgumentParser(description='Benchmark de reserva de stock concurrente')
+    parser.add_argument('--stock', type=int, default=50)
+    parser.add_argument('--checkouts', type=int, default=300)
+    parser.add_argument('--workers', type=int, default=32)
+    args = parser.parse_args()
+
+    ok = run_benchmark(args.stock, args.checkouts, args.workers)
+    raise SystemExit(0 if ok else 1)
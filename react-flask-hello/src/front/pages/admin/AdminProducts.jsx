@@ -35,7 +35,7 @@ const fetchData = async () => {
     setLoading(true);
     
     // ✅ Obtener productos
-    const productsRes = await productService.getProducts();
+    const productsRes = await productService.getAdminProducts();
     const productsData = productsRes.products || [];
     
     // ✅ Obtener categorías con debug completo
@@ -92,7 +92,7 @@ const handleSave = async (productData) => {
       savedProductResponse = await productService.updateProduct(editingProduct.id, productData);
       
       // ✅ Obtener el producto actualizado del servidor
-      const refreshedProduct = await productService.getProductById(editingProduct.id);
+      const refreshedProduct = await productService.getAdminProductById(editingProduct.id);
       const updatedProduct = refreshedProduct.product;
       
       // ✅ ACTUALIZAR editingProduct con los datos más recientes
@@ -200,7 +200,7 @@ const handleSave = async (productData) => {
               // Pequeño delay para asegurar que el servidor procese la eliminación
               await new Promise(resolve => setTimeout(resolve, 500));
 
-              const response = await productService.getProductById(updatedProduct.id);
+              const response = await productService.getAdminProductById(updatedProduct.id);
               const freshProduct = response.product;
 
               setEditingProduct(freshProduct);
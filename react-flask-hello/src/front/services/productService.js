@@ -36,6 +36,40 @@ export const productService = {
     return await response.json();
   },
 
+  // Vista del panel: costo_prenda (view=admin) solo lo recibe un superadmin
+  getAdminView() {
+    const adminUser = JSON.parse(localStorage.getItem('admin_user') || 'null');
+    return adminUser?.role === 'superadmin' ? 'admin' : 'detail';
+  },
+
+  // Obtener todos los productos (admin)
+  async getAdminProducts() {
+    const token = localStorage.getItem('admin_token');
+    if (!token) throw new Error('No authentication token found');
+
+    const response = await fetch(`${API_BASE_URL}/api/products?view=${this.getAdminView()}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`
+      }
+    });
+    if (!response.ok) throw new Error('Error fetching products');
+    return await response.json();
+  },
+
+  // Obtener producto por ID (admin)
+  async getAdminProductById(id) {
+    const token = localStorage.getItem('admin_token');
+    if (!token) throw new Error('No authentication token found');
+
+    const response = await fetch(`${API_BASE_URL}/api/products/${id}?view=${this.getAdminView()}`, {
+      headers: {
+        'Authorization': `Bearer ${token}`
+      }
+    });
+    if (!response.ok) throw new Error('Error fetching product');
+    return await response.json();
+  },
+
   // Crear producto (admin) - SIN parámetro token
   async createProduct(productData) {
     const token = localStorage.getItem('admin_token');
@@ -0,0 +1,64 @@
+import os
+import tempfile
+
+import pytest
+from sqlalchemy import event
+
+# La app lee la configuración al importarse: base SQLite temporal y claves de prueba
+_db_dir = tempfile.mkdtemp(prefix='peregrinos-tests-')
+os.environ['DATABASE_URL'] = f"sqlite:///{os.path.join(_db_dir, 'test.db')}"
+os.environ.setdefault('FLASK_APP_KEY', 'test-app-key-' + 'x' * 32)
+os.environ.setdefault('JWT_SECRET_KEY', 'test-jwt-key-' + 'x' * 32)
+os.environ.setdefault('MERCADOPAGO_ACCESS_TOKEN', 'TEST-0000000000000000')
+
+from app import app as flask_app  # noqa: E402
+from api.models import db as _db  # noqa: E402
+
+
+@pytest.fixture
+def app():
+    """App con tablas nuevas en cada test"""
+    flask_app.config['TESTING'] = True
+    with flask_app.app_context():
+        _db.drop_all()
+        _db.create_all()
+        yield flask_app
+        _db.session.remove()
+
+
+@pytest.fixture
+def db(app):
+    return _db
+
+
+@pytest.fixture
+def client(app):
+    return app.test_client()
+
+
+class QueryCounter:
+    """Cuenta las sentencias SQL ejecutadas dentro del bloque with"""
+
+    def __init__(self, engine):
+        self.engine = engine
+        self.statements = []
+
+    def _on_execute(self, conn, cursor, statement, parameters, context, executemany):
+        self.statements.append(statement)
+
+    def __enter__(self):
+        event.listen(self.engine, 'before_cursor_execute', self._on_execute)
+        return self
+
+    def __exit__(self, *exc):
+        event.remove(self.engine, 'before_cursor_execute', self._on_execute)
+
+    @property
+    def count(self):
+        return len(self.statements)
+
+
+@pytest.fixture
+def count_queries(db):
+    """Uso: with count_queries() as queries: ...; queries.count"""
+    return lambda: QueryCounter(db.engine)
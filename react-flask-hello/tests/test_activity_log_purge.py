@@ -0,0 +1,40 @@
+"""Purga del log de actividad por lotes (flask activity-logs-purge)."""
+
+import gzip
+import json
+from datetime import datetime, timedelta
+
+from api.models import AdminUser, UserActivityLog
+from api.services.activity_log_service import activity_log_service
+
+
+def test_purge_deletes_old_logs_in_several_batches(db, tmp_path):
+    admin = AdminUser(email='admin@test.com', first_name='Admin', last_name='Test', role='superadmin')
+    admin.set_password('secret')
+    db.session.add(admin)
+    db.session.flush()
+
+    now = datetime.utcnow()
+    cutoff = now - timedelta(days=30)
+    old_dates = [cutoff - timedelta(days=day) for day in range(7, 0, -1)]
+    db.session.add_all(
+        [UserActivityLog(admin_user_id=admin.id, action='old', description='old', created_at=created_at)
+         for created_at in old_dates]
+        + [UserActivityLog(admin_user_id=admin.id, action='recent', description='recent', created_at=now)]
+    )
+    db.session.commit()
+
+    batches = []
+    archive_path = str(tmp_path / 'activity.jsonl.gz')
+    purged = activity_log_service.purge(
+        cutoff, batch_size=3, archive_path=archive_path,
+        progress=lambda last_created_at, total: batches.append((last_created_at, total))
+    )
+
+    assert purged == 7
+    assert batches == [(old_dates[2], 3), (old_dates[5], 6), (old_dates[6], 7)]
+    assert [log.action for log in UserActivityLog.query.all()] == ['recent']
+
+    with gzip.open(archive_path, 'rt', encoding='utf-8') as archive:
+        archived = [json.loads(line) for line in archive]
+    assert [row['created_at'] for row in archived] == [created_at.isoformat() for created_at in old_dates]
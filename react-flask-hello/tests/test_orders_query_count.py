@@ -0,0 +1,82 @@
+"""El número de consultas de los listados de órdenes no depende de cuántas órdenes
+o items haya (items, productos y dirección se cargan con Order.serialize_options())."""
+
+import pytest
+
+from api.models import AdminUser, Category, Order, OrderItem, OrderStatusEnum, Product, User, UserAddress
+from api.utils import generate_token
+
+ITEMS_PER_ORDER = 6
+
+
+@pytest.fixture
+def shop(db):
+    admin = AdminUser(email='admin@test.com', first_name='Admin', last_name='Test', role='superadmin')
+    admin.set_password('secret')
+    category = Category(name='Rosarios')
+    user = User(email='cliente@test.com', name='Cliente')
+    db.session.add_all([admin, category, user])
+    db.session.flush()
+
+    products = [Product(name=f'Rosario {i}', price=10000 + i, category_id=category.id, stock_quantity=100)
+                for i in range(ITEMS_PER_ORDER)]
+    address = UserAddress(user_id=user.id, alias='Casa', phone='3000000000', address='Calle 1',
+                          city='Bogotá', department='Cundinamarca')
+    db.session.add_all(products + [address])
+    db.session.commit()
+    return {
+        'admin_id': admin.id,
+        'user_id': user.id,
+        'address_id': address.id,
+        'products': [(product.id, product.price) for product in products],
+    }
+
+
+def add_orders(db, shop, count):
+    for _ in range(count):
+        order = Order(user_id=shop['user_id'], user_address_id=shop['address_id'],
+                      customer_name='Cliente', customer_email='cliente@test.com',
+                      subtotal=0, shipping=10000, total=10000, status=OrderStatusEnum.PENDING)
+        db.session.add(order)
+        db.session.flush()
+        db.session.add_all([
+            OrderItem(order_id=order.id, product_id=product_id, quantity=1, size='M', price=price)
+            for product_id, price in shop['products']
+        ])
+    db.session.commit()
+    db.session.expunge_all()
+
+
+def auth_header(user_id, role):
+    return {'Authorization': f'Bearer {generate_token(user_id, role)}'}
+
+
+@pytest.mark.parametrize('endpoint', ['admin_orders', 'user_orders', 'client_user_orders'])
+def test_order_listing_query_count_is_constant(db, client, shop, count_queries, endpoint):
+    admin_headers = auth_header(shop['admin_id'], 'superadmin')
+    if endpoint == 'admin_orders':
+        url, headers, key = '/api/orders', admin_headers, 'orders'
+    elif endpoint == 'user_orders':
+        url, headers, key = '/api/user/orders', auth_header(shop['user_id'], 'user'), 'orders'
+    else:
+        url, headers, key = f"/api/admin/client-users/{shop['user_id']}/orders", admin_headers, 'orders'
+
+    def fetch(expected_orders):
+        with count_queries() as queries:
+            response = client.get(url, headers=headers)
+        assert response.status_code == 200
+        orders = response.get_json()[key]
+        assert len(orders) == expected_orders
+        assert all(len(order['items']) == ITEMS_PER_ORDER for order in orders)
+        assert all(order['items'][0]['product_name'] for order in orders)
+        return queries.count
+
+    add_orders(db, shop, 1)
+    # Primera llamada aparte: calienta cachés (p. ej. el principal del admin)
+    fetch(1)
+    single = fetch(1)
+
+    add_orders(db, shop, 24)
+    many = fetch(25)
+
+    assert many == single